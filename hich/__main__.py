@@ -9,9 +9,11 @@ def hich():
 def view(): pass
 
 hich.add_command(compartments)
+hich.add_command(convert)
 hich.add_command(create_scool)
 hich.add_command(downsample)
 hich.add_command(digest)
+hich.add_command(digest_cache)
 hich.add_command(fragtag)
 hich.add_command(gather)
 #hich.add_command(organize)
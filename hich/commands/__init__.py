@@ -1,6 +1,8 @@
 from hich.commands.compartments import compartments
+from hich.commands.convert import convert
 from hich.commands.create import create_scool
 from hich.commands.digest import digest
+from hich.commands.digest_cache import digest_cache
 from hich.commands.downsample import downsample
 from hich.commands.fragtag import fragtag
 from hich.commands.gather import gather
@@ -15,4 +17,4 @@ from hich.commands.stats import stats
 
 
 
-__all__ = ['compartments', 'create_scool', 'digest', 'downsample', 'fragtag', 'gather', 'hicrep_comparisons', 'hicrep', 'organize', 'reshape', 'stats_aggregate', 'stats']
\ No newline at end of file
+__all__ = ['compartments', 'convert', 'create_scool', 'digest', 'digest_cache', 'downsample', 'fragtag', 'gather', 'hicrep_comparisons', 'hicrep', 'organize', 'reshape', 'stats_aggregate', 'stats']
\ No newline at end of file
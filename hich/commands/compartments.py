@@ -8,15 +8,23 @@ from hich.compartments import write_compartment_scores
 @click.option("--exclude-chroms", type = StrList, default = None)
 @click.option("--keep-chroms-when", type = str, default = None)
 @click.option("--n_eigs", type = int, default = 1)
+@click.option("--sparse/--dense", default = True, show_default = True,
+              help = "Compute eigenvectors from the sparse matrix, rather than a dense per-chromosome matrix that needs memory quadratic in the number of bins")
+@click.option("--balance", is_flag = True, default = False,
+              help = "Use balanced contacts (.mcool weight column, .hic KR normalization) rather than raw counts")
+@click.option("--cache-dir", default = None,
+              help = "Cache the reference's GC content track in this directory, keyed by the reference's path, size and modification time (or its .fai index) and the resolution, so repeat runs skip reading the reference")
+@click.option("--threads", type = int, default = 1, show_default = True,
+              help = "Processes computing GC content and eigenvectors of chromosomes in parallel")
 @click.argument("reference")
 @click.argument("matrix")
 @click.argument("resolution", type = int)
-def compartments(chroms, exclude_chroms, keep_chroms_when, n_eigs, reference, matrix, resolution):
+def compartments(chroms, exclude_chroms, keep_chroms_when, n_eigs, sparse, balance, cache_dir, threads, reference, matrix, resolution):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
     
     matrix = Path(matrix)
     reference = Path(reference)
     final_suffix = matrix.suffixes[-1]
-    prefix = matrix.name.rstrip(final_suffix)
+    prefix = matrix.name[:-len(final_suffix)]
 
-    write_compartment_scores(prefix, matrix, reference, resolution, chroms, exclude_chroms, keep_chroms_when, n_eigs)
\ No newline at end of file
+    write_compartment_scores(prefix, matrix, reference, resolution, chroms, exclude_chroms, keep_chroms_when, n_eigs, sparse, balance, cache_dir, threads)
\ No newline at end of file
@@ -0,0 +1,29 @@
+import click
+from hich.pairs import pairs_to_parquet as convert_pairs_to_parquet
+
+@click.group
+def convert():
+    """Convert between file formats"""
+    pass
+
+@convert.command("pairs-to-parquet")
+@click.option("--row-group-size",
+    type = int,
+    default = 1000000,
+    show_default = True,
+    help = "Number of records per Parquet row group")
+@click.option("--verbose", is_flag = True, default = False, help = "Report per-batch read throughput to stderr")
+@click.argument("input_pairs_path", type = str)
+@click.argument("output_parquet_path", type = str)
+def pairs_to_parquet(row_group_size, verbose, input_pairs_path, output_parquet_path):
+    """Convert INPUT_PAIRS_PATH to a typed Parquet copy at OUTPUT_PARQUET_PATH
+
+    chrom1/chrom2, strand1/strand2 and pair_type are stored as categoricals,
+    pos1/pos2 as Int64 and other columns as strings. The .pairs header is kept
+    in the Parquet metadata.
+
+    hich stats, downsample, fragtag and reshape accept the Parquet copy in place of
+    the .pairs file, reading only the columns they need from it.
+    """
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    convert_pairs_to_parquet(input_pairs_path, output_parquet_path, row_group_size, verbose)
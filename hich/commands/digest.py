@@ -6,9 +6,13 @@ from hich.digest import make_fragment_index
 @click.option("--startshift", default = 0, show_default = True, help = "Fixed distance to shift start of each fragment")
 @click.option("--endshift", default = 0, show_default = True, help = "Fixed distance to shift end of each fragment")
 @click.option("--cutshift", default = 1, show_default = True, help = "Fixed distance to shift cutsites")
+@click.option("--index", default = None, show_default = True, help = "Also write the fragments to this path as a binary .npz index, which hich fragtag memory-maps for fast startup")
+@click.option("--threads", default = 1, show_default = True, help = "Number of processes digesting chromosomes in parallel")
+@click.option("--cache-dir", default = None, help = "Cache fragment indexes in this directory, keyed by the reference's contents, enzymes and shifts, and reuse them on repeat calls")
+@click.option("--cache-size", default = 10.0, show_default = True, help = "Maximum size of the cache in GB. Least recently used entries are evicted beyond this.")
 @click.argument("reference")
 @click.argument("digest", nargs = -1)
-def digest(output, startshift, endshift, cutshift, reference, digest):
+def digest(output, startshift, endshift, cutshift, index, threads, cache_dir, cache_size, reference, digest):
     """
     In silico digestion of a FASTA format reference genome into a
     BED format fragment index.
@@ -33,8 +37,21 @@ def digest(output, startshift, endshift, cutshift, reference, digest):
 
     The startshift param is added to all values in column 1.
     The endshift param is added to all values in column 2.
+
+    The .npz index written with --index can be passed to hich fragtag in
+    place of the BED file.
+
+    Chromosomes are digested and written one at a time, in reference order.
+    With --threads, they are digested in parallel. If the reference has a
+    samtools faidx index (.fai, plus .gzi if bgzipped), each process reads
+    its own chromosome from the reference.
+
+    With --cache-dir, a repeat digest of the same reference (identified by
+    its .fai index, size and modification time if indexed, and otherwise by
+    its SHA-256), enzymes and shifts is copied from the cache. Use
+    hich digest-cache to list and purge cached digests.
     """
     # We aim to support specification of digests by kit name
     # (potentially versioned), so this converts the kit names to the enzymes
     # used in that kit.
-    make_fragment_index(output, startshift, endshift, cutshift, reference, digest)
\ No newline at end of file
+    make_fragment_index(output, startshift, endshift, cutshift, reference, digest, index, threads, cache_dir, int(cache_size * (1 << 30)))
\ No newline at end of file
@@ -0,0 +1,31 @@
+import click
+import datetime
+from hich.digest.digest_cache import DigestCache
+
+@click.group("digest-cache")
+def digest_cache():
+    """List and purge digests cached by hich digest --cache-dir"""
+    pass
+
+@digest_cache.command("list")
+@click.argument("cache_dir", type = click.Path(exists = True, file_okay = False))
+def list_entries(cache_dir):
+    """List cached digests in CACHE_DIR, most recently used first"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    cache = DigestCache(cache_dir)
+    click.echo("\t".join(["key", "last_used", "bytes", "enzymes", "startshift", "endshift", "cutshift", "reference_path"]))
+    for entry in cache.entries():
+        last_used = datetime.datetime.fromtimestamp(entry["last_used"]).isoformat(timespec = "seconds")
+        click.echo("\t".join(str(field) for field in [
+            entry["key"], last_used, entry["bytes"], ",".join(entry.get("enzymes", [])),
+            entry.get("startshift"), entry.get("endshift"), entry.get("cutshift"), entry.get("reference_path")
+        ]))
+
+@digest_cache.command("purge")
+@click.argument("cache_dir", type = click.Path(exists = True, file_okay = False))
+@click.argument("keys", nargs = -1)
+def purge(cache_dir, keys):
+    """Remove the cached digests with the given KEYS from CACHE_DIR, or all of them if no keys are given"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    removed = DigestCache(cache_dir).purge(keys or None)
+    click.echo(f"Removed {len(removed)} cached digests", err = True)
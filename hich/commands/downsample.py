@@ -1,16 +1,19 @@
 from hich.stats import DiscreteDistribution, PairsClassifier, compute_pairs_stats_on_path, load_stats_and_classifier_from_file, aggregate_classifier
-from hich.pairs import PairsFile
-from hich.sample import SelectionSampler
+from hich.cli import _IntList, _StrList
+from hich.pairs import PairsBatchReader, PairsFile, PairsHeader, PairsSegment
+from hich.sample import ReservoirSampler, SelectionSampler
 import click
+import polars as pl
+import smart_open_with_pbgzip
 
 @click.command
 @click.option("--conjuncts",
-    type = str,
+    type = _StrList(separator = " "),
     default = "record.chr1 record.chr2 record.pair_type stratum",
     show_default = True,
     help = "PairsSegment traits that define the category for each record (space-separated string list)")
 @click.option("--cis-strata",
-    type = str,
+    type = _IntList(separator = " "),
     default = "10 20 50 100 200 500 1000 2000 5000 10000 20000 50000 100000 200000 500000 1000000 2000000 5000000",
     show_default = True,
     help = "PairsSegment cis distance strata boundaries (space-separated string list)")
@@ -31,9 +34,28 @@ import click
     show_default = True,
     help = ("Float on [0.0, 1.0] for fraction of records to sample, or positive integer number of counts to sample. "
             "If a target stats file is supplied, further downsamples it to the given count."))
+@click.option("--batch-size",
+    type = int,
+    default = 1000000,
+    show_default = True,
+    help = "Number of records per batch when conjuncts can be classified columnwise")
+@click.option("--verbose", is_flag = True, default = False, help = "Report per-batch read throughput to stderr")
 @click.argument("input_pairs_path", type = str)
 @click.argument("output_pairs_path", type = str)
-def downsample(conjuncts, cis_strata, orig_stats, target_stats, to_size, input_pairs_path, output_pairs_path):
+def downsample(conjuncts, cis_strata, orig_stats, target_stats, to_size, batch_size, verbose, input_pairs_path, output_pairs_path):
+    """Downsample INPUT_PAIRS_PATH to a target distribution of outcomes, writing OUTPUT_PAIRS_PATH
+
+    Supplying --orig-stats (from hich stats with the same conjuncts and strata)
+    skips the pass over the input that would otherwise count the original distribution.
+    If neither stats file is given and --to-size is an integer count, the input is
+    instead sampled in one pass with a reservoir per outcome class, holding up to about
+    2 * --to-size records per class, plus one batch, in memory. Output records stay in input order.
+
+    If all conjuncts are columns or the properties is_cis, is_trans, intrachr, interchr,
+    distance, is_ur or stratum, each batch is classified columnwise and the records kept
+    for each outcome are drawn at once. Otherwise, records are classified and sampled one at a time.
+    The input can be a .pairs file or a Parquet file from hich convert pairs-to-parquet.
+    """
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
     orig_classifier, orig_distribution = load_stats_and_classifier_from_file(orig_stats) if orig_stats else (None, None)
     target_classifier, target_distribution = load_stats_and_classifier_from_file(target_stats) if target_stats else (None, None)
@@ -45,8 +67,10 @@ def downsample(conjuncts, cis_strata, orig_stats, target_stats, to_size, input_p
             cis_strata = list(set(orig_classifier.cis_strata + target_classifier.cis_strata))        
     elif orig_classifier:
         conjuncts = orig_classifier.conjuncts
+        cis_strata = orig_classifier.cis_strata
     elif target_classifier:
         conjuncts = target_classifier.conjuncts
+        cis_strata = target_classifier.cis_strata
     
     classifier = PairsClassifier(conjuncts, cis_strata)
     
@@ -58,18 +82,40 @@ def downsample(conjuncts, cis_strata, orig_stats, target_stats, to_size, input_p
         except ValueError:
             to_size = None
     
+    reader = PairsBatchReader(input_pairs_path, batch_size = batch_size, report_throughput = verbose)
+    columnar = classifier.can_count_batch(reader.columns)
+
+    if columnar and not orig_distribution and not target_distribution and isinstance(to_size, int):
+        # Sample to a fixed size in one pass with a reservoir per outcome class
+        sampler = ReservoirSampler(size = to_size)
+        for df in reader:
+            sampler.add_batch(classifier.outcome_groups(df), df)
+        reader.close()
+        sampled = sampler.sample()
+        output_pairs_file = PairsFile(output_pairs_path, mode = "w", header = PairsHeader(text = reader.header()))
+        if sampled is not None:
+            output_pairs_file.write_batch(sampled)
+        output_pairs_file.close()
+        return
+
     if not orig_distribution:
-        _, orig_distribution = compute_pairs_stats_on_path((classifier, pairs_path))
+        _, orig_distribution = compute_pairs_stats_on_path((classifier, input_pairs_path), batch_size, verbose)
     if not target_distribution:
         assert to_size is not None, "No target distribution or count supplied for downsampling."
         target_distribution = orig_distribution.to_size(to_size)
-    if to_size:
+    elif to_size:
         target_distribution = target_distribution.to_size(to_size)
     sampler = SelectionSampler(full = orig_distribution, target = target_distribution)
-    input_pairs_file = PairsFile(input_pairs_path)
-    output_pairs_file = PairsFile(output_pairs_path, mode = "w", header = input_pairs_file.header)
 
-    for record in input_pairs_file:
-        outcome = classifier.classify(record)
-        if sampler.sample(outcome):
-            output_pairs_file.write(record)
\ No newline at end of file
+    output_pairs_file = PairsFile(output_pairs_path, mode = "w", header = PairsHeader(text = reader.header()))
+    with reader:
+        columns = tuple(reader.columns)
+        for df in reader:
+            if columnar:
+                keep = sampler.sample_batch(classifier.outcome_groups(df), len(df))
+            else:
+                # Classify and sample the rows of the batch one at a time, as PairsSegments
+                keep = [sampler.sample(classifier.classify(PairsSegment.from_fields(columns, list(row))))
+                        for row in df.iter_rows()]
+            output_pairs_file.write_batch(df.filter(pl.Series(keep, dtype = pl.Boolean)))
+    output_pairs_file.close()
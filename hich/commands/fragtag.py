@@ -3,8 +3,11 @@ from hich.fragtag import tag_restriction_fragments
 
 @click.command
 @click.option("--batch_size", default = 1000000)
+@click.option("--threads", type = int, default = 1, show_default = True, help = "Number of threads tagging batches while another reads them and output is written in input order. Also used to compress bgzipped (.gz) output.")
+@click.option("--index", is_flag = True, default = False, help = "Index the bgzipped output with pairix or tabix. Input must be sorted by chrom1 and pos1.")
+@click.option("--verbose", is_flag = True, default = False, help = "Report per-batch read throughput to stderr")
 @click.argument("fragfile")
 @click.argument("out_pairs")
 @click.argument("in_pairs")
-def fragtag(batch_size, fragfile, out_pairs, in_pairs):
-    tag_restriction_fragments(fragfile, in_pairs, out_pairs, batch_size)
\ No newline at end of file
+def fragtag(batch_size, threads, index, verbose, fragfile, out_pairs, in_pairs):
+    tag_restriction_fragments(fragfile, in_pairs, out_pairs, batch_size, verbose, threads, index)
\ No newline at end of file
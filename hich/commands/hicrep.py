@@ -11,10 +11,19 @@ from hich.hicrep_combos import hicrep_combos
 @click.option("--d-bp-max", type = IntList, default = "-1")
 @click.option("--b-downsample", type = BooleanList, default = False)
 @click.option("--nproc", type=int, default=None)
-@click.option("--output", type=str, default = None)
+@click.option("--output", type=str, default = None,
+              help = "Output file, written as results are computed. Parquet if it ends in .parquet, otherwise TSV.")
+@click.option("--prepared-dir", type=str, default = None,
+              help = "Directory in which to keep temporary prepared (trimmed and smoothed) chromosome matrices, e.g. /dev/shm for shared memory. Defaults to the system temporary directory.")
+@click.option("--all-vs-all-fast", is_flag = True, default = False,
+              help = "Compare all files with the same parameters at once with one matrix product per diagonal, which scales much better with the number of files. Gives the same SCC up to floating point rounding. Downsampled comparisons are computed pairwise.")
+@click.option("--store", type=str, default = None,
+              help = "TSV of previously computed comparisons, keyed by each file's path, size and modification time and the hicrep parameters. Only comparisons missing from the store are computed, and are appended to it. The output contains all requested comparisons.")
+@click.option("--chunksize", type=int, default = None,
+              help = "Groups of comparisons sharing both files and the resolution to send to a worker at once. Defaults to about 4 chunks per worker, up to 32 groups.")
 @click.argument("paths", type=str, nargs = -1)
-def hicrep(resolutions, chroms, exclude, chrom_filter, h, d_bp_max, b_downsample, nproc, output, paths):
+def hicrep(resolutions, chroms, exclude, chrom_filter, h, d_bp_max, b_downsample, nproc, output, prepared_dir, all_vs_all_fast, store, chunksize, paths):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
-    result = hicrep_combos(resolutions, chroms, exclude, chrom_filter, h, d_bp_max, b_downsample, nproc, output, paths)
+    result = hicrep_combos(resolutions, chroms, exclude, chrom_filter, h, d_bp_max, b_downsample, nproc, output, paths, prepared_dir, all_vs_all_fast, store, chunksize)
     if result is not None:
         click.echo(result)
\ No newline at end of file
@@ -1,7 +1,8 @@
 import click
 import smart_open_with_pbgzip
 from smart_open import smart_open
-from hich.pairs import read_pairs
+from hich.pairs import PairsBatchReader
+from hich.parse.pairs_output import PairsOutput
 import polars as pl
 import sys
 import io
@@ -15,12 +16,14 @@ import io
 @click.option("--drop", type=str, multiple=True, default=[], help="Column to drop")
 @click.option("--select", type=str, default = "", help="Space-separated list of output column names to output in the order specified")
 @click.option("--batch-size", type=int, default=10000, help="Number of records per batch")
-def reshape(read_from, output_to, parse, placeholder, regex, drop, select, batch_size):
+@click.option("--threads", type=int, default=1, help="Compression threads when output_to is bgzipped (.gz)")
+@click.option("--index", is_flag=True, default=False, help="Index the bgzipped output with pairix or tabix. Output must be sorted by chrom1 and pos1.")
+@click.option("--verbose", is_flag=True, default=False, help="Report per-batch read throughput to stderr")
+def reshape(read_from, output_to, parse, placeholder, regex, drop, select, batch_size, threads, index, verbose):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
-    read_from = smart_open(read_from, "rt") if read_from else sys.stdin
-    reader = read_pairs(read_from, yield_columns_line=False, batch_size=batch_size)
-    header = next(reader)
-    output = smart_open(output_to, "wt") if output_to else None
+    reader = PairsBatchReader(read_from or sys.stdin.buffer, batch_size=batch_size, report_throughput=verbose)
+    header = reader.header(include_columns_line=False)
+    output = PairsOutput(output_to, threads, index) if output_to else None
     parse_cols = [
         (pl.col(from_col)
            .map_elements(lambda x: _parse(pattern, x)[to_col], return_dtype=pl.String)
@@ -52,8 +55,7 @@ def reshape(read_from, output_to, parse, placeholder, regex, drop, select, batch
             if not header_written:
                 output.write("#columns: " + " ".join(df.columns) + "\n")
                 header_written = True
-            df = df.to_pandas()
-            df.to_csv(output, sep="\t", header=False, index=False)
+            output.write_frame(df)
         else:
             df = df.to_pandas()
             buffer = io.StringIO()
@@ -62,4 +64,7 @@ def reshape(read_from, output_to, parse, placeholder, regex, drop, select, batch
                 header_written = True
 
             df.to_csv(buffer, sep="\t", header=False, index=False)
-            click.echo(buffer.getvalue(), nl=False)
\ No newline at end of file
+            click.echo(buffer.getvalue(), nl=False)
+    if output:
+        output.close()
+    reader.close()
@@ -1,5 +1,5 @@
 import click
-from hich.stats import DiscreteDistribution
+from hich.stats import DiscreteDistribution, compute_pairs_stats_on_path
 from hich.pairs import PairsClassifier, PairsFile, PairsSegment
 from hich.cli import IntList, StrList
 from hich.io import df_to_disk_or_stdout
@@ -31,8 +31,22 @@ def count_pairs_stats(classifier: PairsClassifier, pairs_file: PairsFile) -> Dis
     default = "",
     show_default = True,
     help = "Output file for tab-separated stats file. If not given, outputs to stdout.")
+@click.option("--batch-size",
+    type = int,
+    default = 1000000,
+    show_default = True,
+    help = "Number of records per batch when conjuncts are classified columnwise")
+@click.option("--threads",
+    type = int,
+    default = 1,
+    show_default = True,
+    help = "Number of processes. Plaintext and bgzipped .pairs are split into record-aligned byte ranges classified in parallel.")
+@click.option("--verbose",
+    is_flag = True,
+    default = False,
+    help = "Report per-batch read throughput to stderr")
 @click.argument("pairs", type = click.Path(exists=True, dir_okay=False))
-def stats(conjuncts: str, cis_strata: IntList, output: click.Path, pairs: click.Path) -> None:
+def stats(conjuncts: str, cis_strata: IntList, output: click.Path, batch_size: int, threads: int, verbose: bool, pairs: click.Path) -> None:
     """
     Classify pairs and count the events.
 
@@ -40,13 +54,16 @@ def stats(conjuncts: str, cis_strata: IntList, output: click.Path, pairs: click.
 
     Can read 4DN .pairs format from plaintext or from a variety of compressed formats with Python's smart_open package.
 
+    Conjuncts that are .pairs columns, is_cis, is_trans, distance, is_ur or stratum are
+    classified in batches with Polars expressions. Other conjuncts are evaluated on each
+    record as a PairsSegment.
+
     Example:
         hich stats --conjuncts "chr1 chr2" --cis-strata "10000 20000" my_pairs_file.pairs.gz
     """
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
 
     classifier = PairsClassifier(conjuncts, cis_strata)
-    pairs_file = PairsFile(pairs)
-    distribution = count_pairs_stats(classifier, pairs_file)
+    _, distribution = compute_pairs_stats_on_path((classifier, pairs), batch_size, verbose, threads)
     df = classifier.to_polars(distribution)
     df_to_disk_or_stdout(df, output, include_header=True, separator = "\t")
\ No newline at end of file
@@ -0,0 +1,214 @@
+from dataclasses import dataclass
+from pathlib import Path
+from smart_open import smart_open
+from typing import List, Tuple, Union
+from hich.digest import has_faidx
+from hich.digest.cut_sites import read_fasta
+from hich.digest.digest_cache import reference_fingerprint
+from hich.parallel import ordered_bounded_map
+import hashlib
+import json
+import numpy as np
+import os
+import tempfile
+
+# See tests/test_gc_track.py for unit tests
+
+# Sequences are counted in chunks of about this many bases to bound memory on long chromosomes
+chunk_size = 1 << 24
+
+gc_table = np.zeros(256, dtype = bool)
+gc_table[np.frombuffer(b"GCgc", dtype = np.uint8)] = True
+acgt_table = np.zeros(256, dtype = bool)
+acgt_table[np.frombuffer(b"ACGTacgt", dtype = np.uint8)] = True
+
+def window_counts(seq: np.ndarray, table: np.ndarray, resolution: int) -> np.ndarray:
+    """Number of bases in each window of resolution bases for which table is True, including a final partial window"""
+    n_full = len(seq) // resolution
+    counts = table[seq[:n_full * resolution]].reshape(n_full, resolution).sum(axis = 1, dtype = np.int64)
+    if len(seq) > n_full * resolution:
+        counts = np.append(counts, np.count_nonzero(table[seq[n_full * resolution:]]))
+    return counts
+
+def gc_fractions(sequence: bytes, resolution: int) -> np.ndarray:
+    """Fraction of G or C among A, C, G and T in consecutive windows of a sequence
+
+    N and other ambiguous bases are excluded from each window's count, so
+    they don't dilute its GC content, and a window with no A, C, G or T is
+    NaN. Soft-masked (lowercase) bases are counted.
+
+    Args:
+        sequence (bytes): DNA sequence
+        resolution (int): Window size in bp
+
+    Returns:
+        np.ndarray: GC fraction of each window, with the final window covering the remainder of the sequence
+    """
+    seq = np.frombuffer(sequence, dtype = np.uint8)
+    step = max(chunk_size // resolution, 1) * resolution
+    gc = []
+    acgt = []
+    for start in range(0, len(seq), step):
+        chunk = seq[start:start + step]
+        gc.append(window_counts(chunk, gc_table, resolution))
+        acgt.append(window_counts(chunk, acgt_table, resolution))
+    if not gc:
+        return np.array([], dtype = np.float64)
+    gc = np.concatenate(gc)
+    acgt = np.concatenate(acgt)
+    fractions = np.full(len(gc), np.nan)
+    np.divide(gc, acgt, out = fractions, where = acgt > 0)
+    return fractions
+
+# Open reference per worker process, reused for each chromosome it counts
+_worker_references = {}
+
+def chrom_gc_fractions(task) -> Tuple[str, int, np.ndarray]:
+    """Chromosome, size and GC fractions from a task of (chrom, sequence, reference, resolution)
+
+    If sequence is None, the chromosome is fetched from the faidx-indexed reference.
+    """
+    chrom, sequence, reference, resolution = task
+    if sequence is None:
+        import pysam
+        if reference not in _worker_references:
+            _worker_references[reference] = pysam.FastaFile(reference)
+        sequence = _worker_references[reference].fetch(chrom).encode("ascii")
+    return chrom, len(sequence), gc_fractions(sequence, resolution)
+
+def gc_tasks(reference: str, resolution: int, fetch: bool):
+    """Yield a chrom_gc_fractions task for each chromosome in reference order
+
+    If fetch is True, the reference must have a faidx index, and workers
+    fetch sequences themselves. Otherwise the FASTA is streamed one
+    chromosome at a time and sequences are passed with the tasks.
+    """
+    if fetch:
+        import pysam
+        with pysam.FastaFile(reference) as fasta:
+            chroms = list(fasta.references)
+        for chrom in chroms:
+            yield (chrom, None, reference, resolution)
+    else:
+        with smart_open(reference, "rb") as handle:
+            for chrom, sequence in read_fasta(handle):
+                yield (chrom, sequence, reference, resolution)
+
+def chroms_gc_fractions(reference: str, resolution: int, threads: int = 1):
+    """Yield chrom_gc_fractions results for each chromosome in reference order, in a process pool if threads > 1"""
+    if threads <= 1:
+        for task in gc_tasks(reference, resolution, fetch = False):
+            yield chrom_gc_fractions(task)
+        return
+
+    tasks = gc_tasks(reference, resolution, fetch = has_faidx(reference))
+    yield from ordered_bounded_map(chrom_gc_fractions, tasks, threads)
+
+def track_fingerprint(reference: Union[str, Path]) -> str:
+    """Identify a reference without reading its sequence
+
+    With a samtools faidx index, this is reference_fingerprint, from the .fai
+    and the reference's size and modification time. Otherwise it is the hash
+    of the reference's absolute path, size and modification time, so a moved
+    or modified reference gets a new track.
+    """
+    if Path(str(reference) + ".fai").exists():
+        return reference_fingerprint(reference)
+    path = Path(reference).resolve()
+    stat = path.stat()
+    return "stat:" + hashlib.sha256(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+@dataclass
+class GCTrack:
+    """GC fractions of every chromosome of a reference at one resolution
+
+    Fractions of all chromosomes are concatenated in reference order, with
+    those of the chromosome at index i in fractions[offsets[i]:offsets[i + 1]].
+    Tracks are saved as .npz files, and GCTrack.cached keeps them in a
+    directory keyed by the reference (see track_fingerprint) and the
+    resolution so that repeat runs don't read the reference.
+    """
+    resolution: int
+    chroms: List[str]
+    sizes: np.ndarray
+    offsets: np.ndarray
+    fractions: np.ndarray
+
+    def __post_init__(self):
+        # Index of each chromosome in chroms, for constant time lookup by name
+        self.chrom_index = {chrom: i for i, chrom in enumerate(self.chroms)}
+
+    @classmethod
+    def from_fasta(cls, reference: Union[str, Path], resolution: int, threads: int = 1) -> "GCTrack":
+        """Compute the track of a FASTA file one chromosome at a time, in a process pool if threads > 1"""
+        chroms = []
+        sizes = []
+        fractions = []
+        for chrom, size, chrom_fractions in chroms_gc_fractions(str(reference), resolution, threads):
+            chroms.append(chrom)
+            sizes.append(size)
+            fractions.append(chrom_fractions)
+        offsets = np.concatenate([[0], np.cumsum([len(f) for f in fractions])]).astype(np.int64)
+        fractions = np.concatenate(fractions) if fractions else np.array([], dtype = np.float64)
+        return cls(resolution, chroms, np.array(sizes, dtype = np.int64), offsets, fractions)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "GCTrack":
+        with np.load(path) as npz:
+            return cls(int(npz["resolution"]),
+                       npz["chroms"].tolist(),
+                       npz["sizes"],
+                       npz["offsets"],
+                       npz["fractions"])
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Save as an .npz file, writing through a temporary file so readers never see a partial track"""
+        path = Path(path)
+        handle, temp = tempfile.mkstemp(suffix = ".npz.tmp", dir = path.parent)
+        with os.fdopen(handle, "wb") as file:
+            np.savez(file,
+                     resolution = self.resolution,
+                     chroms = np.array(self.chroms, dtype = str),
+                     sizes = self.sizes,
+                     offsets = self.offsets,
+                     fractions = self.fractions)
+        os.replace(temp, path)
+
+    @staticmethod
+    def cache_path(reference: Union[str, Path], resolution: int, cache_dir: Union[str, Path]) -> Path:
+        """Path of the cached track for a reference and resolution, named by a hash of the reference's fingerprint"""
+        description = {"reference": track_fingerprint(reference), "resolution": resolution}
+        key = hashlib.sha256(json.dumps(description, sort_keys = True).encode()).hexdigest()
+        return Path(cache_dir) / f"gc_{key}.npz"
+
+    @classmethod
+    def cached(cls, reference: Union[str, Path], resolution: int, cache_dir: Union[str, Path] = None, threads: int = 1) -> "GCTrack":
+        """Load the track from cache_dir, or compute it from the reference and add it to cache_dir
+
+        Args:
+            reference (Union[str, Path]): FASTA file, optionally compressed
+            resolution (int): Window size in bp
+            cache_dir (Union[str, Path], optional): Cache directory, or None to compute the track without caching. Defaults to None.
+            threads (int, optional): Processes computing the track if it isn't cached. Defaults to 1.
+        """
+        if cache_dir is None:
+            return cls.from_fasta(reference, resolution, threads)
+        Path(cache_dir).mkdir(parents = True, exist_ok = True)
+        path = GCTrack.cache_path(reference, resolution, cache_dir)
+        if path.exists():
+            return cls.load(path)
+        track = cls.from_fasta(reference, resolution, threads)
+        track.save(path)
+        return track
+
+    def chromsizes(self) -> List[Tuple[str, int]]:
+        """(chrom, size) in reference order"""
+        return list(zip(self.chroms, self.sizes.tolist()))
+
+    def __getitem__(self, chrom: str) -> np.ndarray:
+        """GC fractions of a chromosome's windows"""
+        i = self.chrom_index[chrom]
+        return self.fractions[self.offsets[i]:self.offsets[i + 1]]
+
+    def __contains__(self, chrom: str) -> bool:
+        return chrom in self.chrom_index
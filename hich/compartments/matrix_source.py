@@ -0,0 +1,132 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from scipy.sparse import coo_matrix
+from typing import Dict, List, Union
+import cooler
+import h5py
+import hicstraw
+import itertools
+import numpy as np
+
+def flex_chromname(real_chromnames: List[str], chromname: str, flexible: List[str] = ["chr"]):
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    for real_chromname, flex in itertools.product(real_chromnames, flexible):
+        if chromname == real_chromname or chromname.replace(flex, "") == real_chromname.replace(flex, ""):
+            return real_chromname
+    return None
+
+def symmetric_coo_matrix(row: np.ndarray, col: np.ndarray, data: np.ndarray, n_bins: int) -> coo_matrix:
+    """Mirror upper or lower triangle pixels into a symmetric matrix, without doubling the diagonal"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    off_diagonal = row != col
+    return coo_matrix((np.concatenate([data, data[off_diagonal]]),
+                       (np.concatenate([row, col[off_diagonal]]), np.concatenate([col, row[off_diagonal]]))),
+                      shape = (n_bins, n_bins))
+
+def open_matrix(filename: Union[str, Path], resolution: int) -> "MatrixSource":
+    """Open the MatrixSource for one resolution of a .mcool or .hic file, chosen by its extension"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    path = Path(filename)
+    assert path.exists(), f"{filename} not found at {path.resolve()}"
+
+    suffix = path.suffix
+    if suffix == ".mcool":
+        return McoolSource(path, resolution)
+    elif suffix == ".hic":
+        return HicSource(path, resolution)
+    raise Exception(f"Extension {suffix} not supported by hich compartments called on {path.resolve()}")
+
+class MatrixSource(ABC):
+    """Cis contact matrices of one resolution of a .mcool or .hic file, opened once
+
+    The file is opened and its chromosome sizes and resolutions are read when
+    the source is created. Each chromosome's matrix is then fetched from the
+    open file, so a run over many chromosomes pays those costs once rather
+    than once per chromosome. Use open_matrix to create the source matching
+    a file's extension, and close it (or use it as a context manager) when
+    done.
+    """
+    def __init__(self, path: Path, resolution: int, chromsizes: Dict[str, int], resolutions: List[int]):
+        self.path = path
+        self.resolution = resolution
+        self.chromsizes = chromsizes
+        self.resolutions = resolutions
+
+    def chrom_name(self, chrom: str, flex: bool = True) -> str:
+        """Name of a chromosome in the file, allowing for a differing 'chr' prefix if flex is True"""
+        found = flex_chromname(self.chromsizes.keys(), chrom) if flex else chrom
+        assert found in self.chromsizes, f"Chrom {chrom} not found in {self.path}. Available options are: {list(self.chromsizes.keys())}"
+        return found
+
+    def n_bins(self, chrom: str) -> int:
+        return -(-self.chromsizes[chrom] // self.resolution)
+
+    @abstractmethod
+    def sparse(self, chrom: str, balance: bool = False) -> coo_matrix:
+        """Symmetric sparse cis contact matrix of a chromosome with both triangles stored
+
+        Args:
+            chrom (str): Chromosome name as stored in the file, e.g. from chrom_name
+            balance (bool, optional): Use balanced rather than raw counts. Defaults to False.
+        """
+
+    def dense(self, chrom: str, balance: bool = False) -> np.ndarray:
+        # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+        return self.sparse(chrom, balance).toarray()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "MatrixSource":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+class McoolSource(MatrixSource):
+    """One resolution of a multires cooler, with balanced counts from its weight column"""
+    def __init__(self, path: Path, resolution: int):
+        # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+        abs_path = str(path.resolve())
+        cooler_collections = cooler.fileops.list_coolers(abs_path)
+        cooler_collection = f"/resolutions/{resolution}"
+        assert cooler.fileops.is_multires_file(abs_path), f"{abs_path} is not a cooler multires file"
+        assert cooler_collection in cooler_collections, f"{cooler_collection} is not a data collection in {abs_path}. Available collections are {cooler_collections}."
+        resolutions = [int(collection.split("/")[-1]) for collection in cooler_collections if collection.startswith("/resolutions/")]
+
+        # Passing an open group rather than a URI keeps cooler from reopening the file for each query
+        self.h5 = h5py.File(abs_path, "r")
+        self.cooler = cooler.Cooler(self.h5[cooler_collection])
+        super().__init__(path, resolution, self.cooler.chromsizes.to_dict(), resolutions)
+
+    def sparse(self, chrom: str, balance: bool = False) -> coo_matrix:
+        # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+        return self.cooler.matrix(sparse = True, balance = balance).fetch(chrom)
+
+    def dense(self, chrom: str, balance: bool = False) -> np.ndarray:
+        # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+        return self.cooler.matrix(sparse = False, balance = balance).fetch(chrom)
+
+    def close(self) -> None:
+        self.h5.close()
+
+class HicSource(MatrixSource):
+    """One resolution of a .hic file, with balanced counts from its KR normalization"""
+    def __init__(self, path: Path, resolution: int):
+        # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+        self.hic = hicstraw.HiCFile(str(path.resolve()))
+        resolutions = self.hic.getResolutions()
+        assert resolution in resolutions, f"Resolution {resolution} not found in {path.resolve()}. Available options are: {resolutions}"
+        super().__init__(path, resolution, {c.name: c.length for c in self.hic.getChromosomes()}, resolutions)
+
+    def sparse(self, chrom: str, balance: bool = False) -> coo_matrix:
+        # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+        end = self.chromsizes[chrom]
+        normalization = "KR" if balance else "NONE"
+        mzd = self.hic.getMatrixZoomData(chrom, chrom, "observed", normalization, "BP", self.resolution)
+        records = mzd.getRecords(0, end, 0, end)
+        count = len(records)
+        return symmetric_coo_matrix(np.fromiter((r.binX for r in records), dtype = np.int64, count = count) // self.resolution,
+                                    np.fromiter((r.binY for r in records), dtype = np.int64, count = count) // self.resolution,
+                                    np.fromiter((r.counts for r in records), dtype = np.float64, count = count),
+                                    self.n_bins(chrom))
@@ -0,0 +1,133 @@
+from scipy.signal import fftconvolve
+from scipy.sparse.linalg import LinearOperator, eigsh
+from typing import Tuple
+import numpy as np
+import scipy.sparse
+
+# See tests/test_sparse_eig.py for unit tests
+
+def valid_pair_counts(mask: np.ndarray) -> np.ndarray:
+    """Number of pairs of valid bins at each diagonal offset 0..len(mask) - 1"""
+    mask = mask.astype(np.float64)
+    counts = fftconvolve(mask, mask[::-1])[len(mask) - 1:]
+    return np.rint(counts).astype(np.int64)
+
+def sparse_observed_over_expected(A: scipy.sparse.spmatrix,
+                                  ignore_diags: int = 2,
+                                  dist_bin_edge_ratio: float = 1.03) -> Tuple[scipy.sparse.csr_matrix, np.ndarray]:
+    """Observed/expected among valid bins of a sparse symmetric cis matrix, as computed by cooltools.cis_eig
+
+    Matches the dense steps of cis_eig: non-finite pixels are zeroed, bins
+    with no contacts are invalid, diagonals closer than ignore_diags are set
+    to 1, and each exponentially growing bin of diagonals is divided by its
+    mean over pixels between valid bins. Pixels that are zero in A are zero
+    in the result, so it stays as sparse as A.
+
+    Args:
+        A (scipy.sparse.spmatrix): Symmetric contact matrix with both triangles stored
+        ignore_diags (int, optional): Number of diagonals to ignore. Defaults to 2.
+        dist_bin_edge_ratio (float, optional): Ratio of the largest to shortest distance in each bin of diagonals. Defaults to 1.03.
+
+    Returns:
+        Tuple[scipy.sparse.csr_matrix, np.ndarray]: Observed/expected among valid bins, indexed by position in the valid bins, and the valid bin mask
+    """
+    A = scipy.sparse.coo_matrix(A, dtype = np.float64)
+    A.sum_duplicates()
+    A.data[~np.isfinite(A.data)] = 0
+    A.eliminate_zeros()
+    N = A.shape[0]
+
+    mask = np.asarray(A.sum(axis = 0)).ravel() > 0
+    valid = mask[A.row] & mask[A.col]
+    offset = np.abs(A.row - A.col)
+
+    # Ignored diagonals are set to 1, so their pixels come from the mask rather than A
+    keep = valid & (offset >= ignore_diags)
+    row, col, data, offset = A.row[keep], A.col[keep], A.data[keep], offset[keep]
+    band_rows, band_cols, band_offsets = [], [], []
+    valid_bins = np.flatnonzero(mask)
+    for d in range(min(ignore_diags, N)):
+        lower = valid_bins[valid_bins + d < N]
+        lower = lower[mask[lower + d]]
+        band_rows.extend([lower, lower + d] if d else [lower])
+        band_cols.extend([lower + d, lower] if d else [lower])
+        band_offsets.extend([np.full(len(lower), d)] * (2 if d else 1))
+    band_rows = np.concatenate(band_rows) if band_rows else np.array([], dtype = np.int64)
+    band_cols = np.concatenate(band_cols) if band_cols else np.array([], dtype = np.int64)
+    band_offsets = np.concatenate(band_offsets) if band_offsets else np.array([], dtype = np.int64)
+    row = np.concatenate([row, band_rows])
+    col = np.concatenate([col, band_cols])
+    offset = np.concatenate([offset, band_offsets])
+    data = np.concatenate([data, np.ones(len(band_rows))])
+
+    # Mean pixel in each bin of diagonals, over the lower triangle's valid pixels
+    lower = row >= col
+    offset_sums = np.bincount(offset[lower], weights = data[lower], minlength = N)
+    offset_pixels = valid_pair_counts(mask)
+    # Same distance bins as cooltools' observed_over_expected: log-spaced edges from 1 to N, rounded and deduplicated
+    if N > 1:
+        n_edges = max(2, int(np.log(N) / np.log(dist_bin_edge_ratio)))
+        dist_bins = np.concatenate([[0], np.unique(np.rint(np.geomspace(1, N, n_edges))).astype(np.int64)])
+    else:
+        dist_bins = np.array([0, 1])
+    bin_sums = np.add.reduceat(offset_sums, dist_bins[:-1])
+    bin_pixels = np.add.reduceat(offset_pixels, dist_bins[:-1])
+    expected = np.ones(len(bin_sums))
+    divide = (bin_pixels > 0) & (bin_sums != 0)
+    expected[divide] = bin_sums[divide] / bin_pixels[divide]
+    offset_expected = np.repeat(expected, np.diff(dist_bins))
+
+    # Index pixels by position among the valid bins
+    collapsed = np.cumsum(mask) - 1
+    n_valid = int(mask.sum())
+    OE = scipy.sparse.csr_matrix((data / offset_expected[offset], (collapsed[row], collapsed[col])),
+                                 shape = (n_valid, n_valid))
+    return OE, mask
+
+def sparse_cis_eig(A: scipy.sparse.spmatrix,
+                   n_eigs: int = 3,
+                   ignore_diags: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """Compartment eigenvectors of a sparse cis matrix, matching cooltools.cis_eig on the dense matrix
+
+    cis_eig decomposes the dense observed/expected matrix minus 1 over the
+    valid bins. Here that matrix is applied as a linear operator: the sparse
+    observed/expected matrix times x, minus the sum of x in every entry,
+    and the leading eigenvectors are found by Lanczos iteration (eigsh), so
+    memory grows with the number of nonzero pixels rather than the square of
+    the number of bins.
+
+    Eigenvectors are normalized and scaled by the square root of their
+    eigenvalue's magnitude like cis_eig's, but not phased, and their sign is
+    arbitrary.
+
+    Args:
+        A (scipy.sparse.spmatrix): Symmetric contact matrix with both triangles stored
+        n_eigs (int, optional): Number of eigenvectors to compute. Defaults to 3.
+        ignore_diags (int, optional): Number of diagonals to ignore. Defaults to 2.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Eigenvalues by decreasing magnitude, and eigenvectors in rows, NaN at invalid bins
+    """
+    N = A.shape[0]
+    eigvals = np.full(n_eigs, np.nan)
+    eigvecs = np.full((n_eigs, N), np.nan)
+
+    OE, mask = sparse_observed_over_expected(A, ignore_diags)
+    n_valid = OE.shape[0]
+    if N <= ignore_diags + 3 or n_valid <= ignore_diags + 3:
+        return eigvals, eigvecs
+
+    def matvec(x):
+        x = np.ravel(x)
+        return OE @ x - x.sum()
+
+    operator = LinearOperator((n_valid, n_valid), matvec = matvec, rmatvec = matvec, dtype = np.float64)
+    k = n_eigs if n_eigs < n_valid else n_valid - 1
+    vals, vecs = eigsh(operator, k)
+
+    order = np.argsort(-np.abs(vals))
+    eigvals[:k] = vals[order]
+    eigvecs[:k, mask] = vecs.T[order]
+    eigvecs /= np.sqrt(np.nansum(eigvecs ** 2, axis = 1))[:, None]
+    eigvecs *= np.sqrt(np.abs(eigvals))[:, None]
+    return eigvals, eigvecs
@@ -1,68 +1,143 @@
 import click
-from Bio import SeqIO
 from Bio.Restriction import RestrictionBatch
 from Bio.Seq import Seq
+import os
+import shutil
 import sys
-from itertools import chain
 from smart_open import smart_open
+from hich.digest.cut_sites import cut_sites, read_fasta
+from hich.digest.digest_cache import DigestCache
+from hich.fragtag.frag_index import FragIndex
+from hich.parallel import ordered_bounded_map
 import polars as pl
 
-def sorted_unique_cut_sites(seq_record, enzymes, cutshift = 1):
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
-    df = {"chrom":[], "start":[], "end":[]}
-    digest = enzymes.search(seq_record.seq)
-    digest = [digest[enzyme] for enzyme in digest]
-    cut_sites = sorted(list(set(chain(*digest))))
-    if cut_sites:
-        cut_sites = (pl.Series(cut_sites) + cutshift).to_list()
-    return cut_sites
-
-def chrom_frags_df(seq_record, enzymes, cutshift = 1):
+def sorted_unique_cut_sites(sequence, enzymes, cutshift = 1):
+    """Sorted unique positions of the first base after each cut, shifted by cutshift
+
+    Args:
+        sequence (bytes | SeqRecord): Chromosome sequence
+        enzymes (RestrictionBatch): Enzymes to digest with
+        cutshift (int, optional): Distance to shift cutsites. Defaults to 1.
+    """
+    if not isinstance(sequence, bytes):
+        sequence = bytes(sequence.seq)
+    return (cut_sites(sequence, enzymes) + cutshift).tolist()
+
+def chrom_frags_df(chrom, sequence, enzymes, cutshift = 1):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
     start = [0]
-    end = [len(seq_record.seq)]
-    frag_ends = start + sorted_unique_cut_sites(seq_record, enzymes, cutshift) + end
+    end = [len(sequence)]
+    frag_ends = start + sorted_unique_cut_sites(sequence, enzymes, cutshift) + end
     
-    chrom = seq_record.id
     frag_count = len(frag_ends)-1
 
     chrom_col = [chrom]*frag_count
     start_col = frag_ends[:-1]
     end_col = frag_ends[1:]
     df = {"chrom":chrom_col, "start":start_col, "end":end_col}
-    return pl.DataFrame(df)
+    return pl.DataFrame(df, schema = {"chrom": pl.String, "start": pl.Int64, "end": pl.Int64})
 
-def write_bed_file(frag_index, output_file):
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
-    handle = smart_open(output_file, "w") if output_file else sys.stdout
-    frag_index.write_csv(handle, include_header=False, separator="\t")
+def has_faidx(reference_filename):
+    """Whether the reference has a samtools faidx index (and a .gzi index if bgzipped)"""
+    reference_filename = str(reference_filename)
+    if not os.path.exists(reference_filename + ".fai"):
+        return False
+    return not reference_filename.endswith((".gz", ".bgz")) or os.path.exists(reference_filename + ".gzi")
+
+# Open reference per worker process, reused for each chromosome it digests
+_worker_references = {}
+
+def digest_chrom(task):
+    """Digest one chromosome into a DataFrame of fragments
+
+    task is (chrom, sequence, reference_filename, enzyme_names, cutshift).
+    If sequence is None, the chromosome is fetched from the faidx-indexed
+    reference, so only one chromosome is held in memory by the worker.
+    """
+    # See tests/test_digest.py for unit tests
+    chrom, sequence, reference_filename, enzyme_names, cutshift = task
+    if sequence is None:
+        import pysam
+        if reference_filename not in _worker_references:
+            _worker_references[reference_filename] = pysam.FastaFile(reference_filename)
+        sequence = _worker_references[reference_filename].fetch(chrom).encode("ascii")
+    return chrom_frags_df(chrom, sequence, RestrictionBatch(enzyme_names), cutshift)
+
+def digest_tasks(reference_filename, enzyme_names, cutshift, fetch):
+    """Yield a digest_chrom task for each chromosome in reference order
+
+    If fetch is True, the reference must have a faidx index, and workers
+    fetch sequences themselves. Otherwise the FASTA is streamed one
+    chromosome at a time and sequences are passed with the tasks.
+    """
+    # See tests/test_digest.py for unit tests
+    if fetch:
+        import pysam
+        with pysam.FastaFile(reference_filename) as reference:
+            chroms = list(reference.references)
+        for chrom in chroms:
+            yield (chrom, None, reference_filename, enzyme_names, cutshift)
+    else:
+        with smart_open(reference_filename, "rb") as reference_file:
+            for chrom, sequence in read_fasta(reference_file):
+                yield (chrom, sequence, reference_filename, enzyme_names, cutshift)
+
+def digest_chroms(reference_filename, enzyme_names, cutshift = 1, threads = 1):
+    """Yield a DataFrame of fragments for each chromosome, in reference order
+
+    With threads > 1, chromosomes are digested in a process pool. At most
+    threads chromosomes are in flight at once, and each one's fragments are
+    yielded as soon as it and all chromosomes before it are finished. For
+    faidx-indexed references (plain or bgzipped FASTA with .fai, plus .gzi
+    if bgzipped), workers fetch their own chromosome, so the main process
+    never holds a sequence.
+    """
+    # See tests/test_digest.py for unit tests
+    enzyme_names = sorted(enzyme_names)
+    if threads <= 1:
+        for task in digest_tasks(reference_filename, enzyme_names, cutshift, fetch = False):
+            yield digest_chrom(task)
+        return
+
+    tasks = digest_tasks(reference_filename, enzyme_names, cutshift, fetch = has_faidx(reference_filename))
+    yield from ordered_bounded_map(digest_chrom, tasks, threads)
 
 def make_frag_index(reference_filename,
                     enzyme_names,
                     output_file,
                     startshift = 0,
                     endshift = 0,
-                    cutshift = 1):
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
-    # Load the reference genome
-    reference_file = smart_open(reference_filename, "rt")
-    seq_record = SeqIO.parse(reference_file, "fasta")
-    genome = SeqIO.to_dict(seq_record)
+                    cutshift = 1,
+                    index_file = None,
+                    threads = 1):
+    # See tests/test_digest.py for unit tests
+    handle = smart_open(output_file, "w") if output_file else sys.stdout
 
-    enzymes = RestrictionBatch(enzyme_names)
-    
-    # Process each sequence record in the genome
+    # Write each chromosome's fragments as soon as they are digested
     chrom_frag_indexes = []
-    for seq_record in genome.values():
-        chrom_frag_index = chrom_frags_df(seq_record, enzymes, cutshift)
-        chrom_frag_indexes.append(chrom_frag_index)
+    for chrom_frag_index in digest_chroms(reference_filename, enzyme_names, cutshift, threads):
+        chrom_frag_index = chrom_frag_index.with_columns(pl.col('start') + startshift,
+                                                         pl.col('end') + endshift)
+        chrom_frag_index.write_csv(handle, include_header=False, separator="\t")
 
-    frag_index = pl.concat(chrom_frag_indexes)
-    frag_index = frag_index.with_columns(pl.col('start') + startshift)
-    frag_index = frag_index.with_columns(pl.col('end') + endshift)
+        if index_file:
+            chrom_frag_indexes.append(chrom_frag_index)
 
-    # Write to BED file
-    write_bed_file(frag_index, output_file)
+    if output_file:
+        handle.close()
+    else:
+        handle.flush()
+
+    if index_file:
+        # Write binary index that hich fragtag can memory-map
+        frag_index = pl.concat(chrom_frag_indexes) if chrom_frag_indexes else pl.DataFrame(schema = {"chrom": pl.String, "start": pl.Int64, "end": pl.Int64})
+        write_npz_index(frag_index, index_file)
+
+def write_npz_index(frag_index, index_file):
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    index = FragIndex()
+    index.load_frame(frag_index)
+    index.save_npz(index_file)
 
 def kit_names_to_enzymes(digest):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
@@ -94,13 +169,41 @@ def kit_names_to_enzymes(digest):
     print(enzymes)
     return enzymes
 
-def make_fragment_index(output, startshift, endshift, cutshift, reference, digest):
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+def make_fragment_index(output, startshift, endshift, cutshift, reference, digest, index = None, threads = 1, cache_dir = None, cache_bytes = 10 << 30):
+    # See tests/test_digest_cache.py for unit tests
     enzyme_names = kit_names_to_enzymes(digest)
 
-    return make_frag_index(reference,
-                    enzyme_names,
-                    output,
-                    startshift,
-                    endshift,
-                    cutshift)
\ No newline at end of file
+    if not cache_dir:
+        return make_frag_index(reference,
+                        enzyme_names,
+                        output,
+                        startshift,
+                        endshift,
+                        cutshift,
+                        index,
+                        threads)
+
+    # Digest only if the same reference, enzymes and shifts aren't already cached
+    cache = DigestCache(cache_dir, cache_bytes)
+    description = cache.describe(reference, enzyme_names, startshift, endshift, cutshift)
+    key = DigestCache.key(description)
+    cached = cache.get(key)
+    if cached is None:
+        digested = cache.temp_path()
+        make_frag_index(reference, enzyme_names, digested, startshift, endshift, cutshift, threads = threads)
+        cached = cache.put(key, digested, dict(description, reference_path = str(reference)))
+
+    copy_bed_file(cached, output)
+    if index:
+        # Write binary index that hich fragtag can memory-map
+        FragIndex(cached).save_npz(index)
+
+def copy_bed_file(bed_filename, output_file):
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    with open(bed_filename, "rb") as bed:
+        if output_file:
+            with smart_open(output_file, "wb") as handle:
+                shutil.copyfileobj(bed, handle)
+        else:
+            shutil.copyfileobj(bed, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,171 @@
+from Bio.Restriction.Restriction import FormattedSeq, NotDefined, Palindromic
+from Bio.Seq import Seq
+from typing import Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import re
+
+# See tests/test_cut_sites.py for unit tests
+
+# Bases are matched in windows of this many positions to bound memory on long chromosomes
+window_size = 1 << 24
+
+fasta_header = re.compile(rb"^>[^\n]*", re.MULTILINE)
+fasta_whitespace = b" \t\r\n\v\f"
+
+def site_tokens(pattern: str) -> List[Optional[bytes]]:
+    """Bytes matched at each position of a recognition site regex, or None for any byte
+
+    Biopython compiles each recognition site to a regex of literal bases, '.'
+    and character classes such as [CT], e.g. AC....GTA[CT]C for BaeI.
+    """
+    return [None if token == "." else token.strip("[]").encode("ascii")
+            for token in re.findall(r"\[[A-Z]+\]|[A-Z.]", pattern)]
+
+def enzyme_site_tokens(enzyme) -> Tuple[List[Optional[bytes]], Optional[List[Optional[bytes]]]]:
+    """Site tokens for the top strand and, for non-palindromic enzymes, the bottom strand"""
+    groups = dict(re.findall(r"\(\?P<(\w+)>([^)]*)\)", enzyme.compsite.pattern))
+    forward = site_tokens(groups[str(enzyme)])
+    reverse = site_tokens(groups[f"{enzyme}_as"]) if f"{enzyme}_as" in groups else None
+    return forward, reverse
+
+def site_starts(seq: np.ndarray, tokens: List[Optional[bytes]]) -> np.ndarray:
+    """0-based positions where a site starts, allowing overlapping matches
+
+    Candidate positions are found by a vectorized comparison against the
+    site's first specified base, then narrowed by checking each remaining
+    base of the site only at the surviving candidates, so the sequence is
+    scanned about once in compiled code rather than once per match in Python.
+    Windows of window_size positions are processed at a time to bound memory.
+    """
+    n_starts = len(seq) - len(tokens) + 1
+    specified = [(i, np.frombuffer(allowed, dtype = np.uint8))
+                 for i, allowed in enumerate(tokens) if allowed is not None]
+    if n_starts <= 0:
+        return np.array([], dtype = np.int64)
+    if not specified:
+        return np.arange(n_starts, dtype = np.int64)
+
+    # Check single bases first, as they leave the fewest candidates
+    specified.sort(key = lambda token: len(token[1]))
+    tables = []
+    for i, allowed in specified:
+        table = np.zeros(256, dtype = bool)
+        table[allowed] = True
+        tables.append((i, allowed, table))
+
+    starts = []
+    for window_start in range(0, n_starts, window_size):
+        window_end = min(window_start + window_size, n_starts)
+        first, allowed, table = tables[0]
+        window = seq[window_start + first:window_end + first]
+        matches = window == allowed[0] if len(allowed) == 1 else table[window]
+        candidates = np.flatnonzero(matches) + window_start
+        for i, _, table in tables[1:]:
+            candidates = candidates[table[seq[candidates + i]]]
+        starts.append(candidates)
+    return np.concatenate(starts)
+
+def format_sequence(sequence: bytes) -> bytes:
+    """Uppercase sequence with whitespace and digits removed, as searched by Biopython
+
+    Raises TypeError on non-alphabetic characters, like Bio.Restriction.
+    """
+    data = sequence.translate(FormattedSeq._table, delete = FormattedSeq._remove_chars)
+    if 0 in data:
+        raise TypeError("Invalid character found in sequence")
+    return data
+
+def enzyme_cut_sites(seq: np.ndarray, enzyme) -> np.ndarray:
+    """Positions of the first base after each cut, as returned by enzyme.search on a linear sequence
+
+    Args:
+        seq (np.ndarray): uint8 array of a sequence formatted by format_sequence
+        enzyme: Bio.Restriction enzyme
+
+    Returns:
+        np.ndarray: 1-based cut positions, unsorted and possibly with duplicates
+    """
+    if issubclass(enzyme, NotDefined):
+        # Cuts are not characterized, so defer to Biopython
+        return np.array(enzyme.search(Seq(seq.tobytes())), dtype = np.int64)
+
+    forward, reverse = enzyme_site_tokens(enzyme)
+
+    # 1-based positions where the site starts on the top strand
+    forward_starts = site_starts(seq, forward) + 1
+    cuts = [forward_starts + enzyme.fst5]
+    if enzyme.cut_twice():
+        cuts.append(forward_starts + enzyme.scd5)
+
+    if not issubclass(enzyme, Palindromic) and reverse is not None:
+        # Bottom strand sites, where the top strand site didn't match first
+        reverse_starts = site_starts(seq, reverse) + 1
+        reverse_starts = reverse_starts[~np.isin(reverse_starts, forward_starts, assume_unique = True)]
+        cuts.append(reverse_starts - enzyme.fst3)
+        if enzyme.cut_twice():
+            cuts.append(reverse_starts - enzyme.scd3)
+
+    cuts = np.concatenate(cuts).astype(np.int64)
+
+    # Drop cuts outside the linear sequence on either strand
+    length = len(seq)
+    on_crick = cuts - enzyme.ovhg
+    return cuts[(1 < cuts) & (cuts <= length) & (1 < on_crick) & (on_crick <= length)]
+
+def cut_sites(sequence: bytes, enzymes: Iterable) -> np.ndarray:
+    """Sorted unique cut positions of all enzymes in a linear sequence
+
+    Gives the same positions as merging RestrictionBatch(enzymes).search(Seq(sequence)).
+
+    Args:
+        sequence (bytes): DNA sequence
+        enzymes (Iterable): Bio.Restriction enzymes, e.g. a RestrictionBatch
+
+    Returns:
+        np.ndarray: 1-based positions of the first base after each cut
+    """
+    seq = np.frombuffer(format_sequence(sequence), dtype = np.uint8)
+    cuts = [enzyme_cut_sites(seq, enzyme) for enzyme in enzymes]
+    return np.unique(np.concatenate(cuts)) if cuts else np.array([], dtype = np.int64)
+
+def read_fasta(handle, block_size: int = 1 << 24) -> Iterator[Tuple[str, bytes]]:
+    """Yield (id, sequence) for each record of a FASTA file, one record at a time
+
+    The id is the first word of the description line, as for Bio.SeqIO
+    records. The file is read in blocks of block_size characters, and
+    sequence lines are joined with whitespace removed in bulk rather than
+    line by line.
+
+    Args:
+        handle: FASTA file opened in text or binary mode
+        block_size (int, optional): Characters to read at a time. Defaults to 1 << 24.
+    """
+    chrom = None
+    parts = []
+    remainder = b""
+    while True:
+        block = handle.read(block_size)
+        if isinstance(block, str):
+            block = block.encode("ascii")
+        text = remainder + block
+        if block:
+            # Keep any partial final line for the next block
+            complete = text.rfind(b"\n") + 1
+            text, remainder = text[:complete], text[complete:]
+
+        position = 0
+        for header in fasta_header.finditer(text):
+            if chrom is not None:
+                parts.append(text[position:header.start()])
+                yield chrom, b"".join(parts).translate(None, fasta_whitespace)
+            words = header.group()[1:].split()
+            chrom = words[0].decode("ascii") if words else ""
+            parts = []
+            position = header.end()
+        if chrom is not None:
+            parts.append(text[position:])
+
+        if not block:
+            break
+    if chrom is not None:
+        yield chrom, b"".join(parts).translate(None, fasta_whitespace)
@@ -0,0 +1,166 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# See tests/test_digest_cache.py for unit tests
+
+def reference_fingerprint(reference_filename: Union[str, Path]) -> str:
+    """Identify the contents of a reference genome
+
+    If the reference has a samtools faidx index, this is the hash of the
+    .fai (sequence names, lengths and layout) with the reference's size and
+    modification time, which avoids reading the genome. Otherwise it is
+    the SHA-256 of the reference file.
+    """
+    reference_filename = Path(reference_filename)
+    fai = Path(str(reference_filename) + ".fai")
+    sha256 = hashlib.sha256()
+    if fai.exists():
+        stat = reference_filename.stat()
+        sha256.update(fai.read_bytes())
+        sha256.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return "fai:" + sha256.hexdigest()
+
+    with open(reference_filename, "rb") as file:
+        while block := file.read(1 << 24):
+            sha256.update(block)
+    return "sha256:" + sha256.hexdigest()
+
+@dataclass
+class DigestCache:
+    """Content-addressed local cache of hich digest fragment indexes
+
+    Each entry is a BED file of fragments, named by a hash of the reference's
+    fingerprint (see reference_fingerprint), the enzyme set and the
+    startshift, endshift and cutshift parameters, with a .json file
+    describing it. Reading an entry updates its modification time, and
+    once the entries exceed max_bytes the least recently used are evicted.
+    """
+    cache_dir: Union[str, Path]
+    max_bytes: int = 10 << 30
+
+    def __post_init__(self):
+        self.cache_dir = Path(self.cache_dir)
+        self.cache_dir.mkdir(parents = True, exist_ok = True)
+
+    def describe(self,
+                 reference_filename: Union[str, Path],
+                 enzyme_names: Iterable[str],
+                 startshift: int = 0,
+                 endshift: int = 0,
+                 cutshift: int = 1) -> Dict:
+        """Parameters that determine a digest's fragments, identifying the reference by its contents"""
+        return {"reference": reference_fingerprint(reference_filename),
+                "enzymes": sorted(enzyme_names),
+                "startshift": startshift,
+                "endshift": endshift,
+                "cutshift": cutshift}
+
+    @staticmethod
+    def key(description: Dict) -> str:
+        """Cache key for a digest described by describe"""
+        return hashlib.sha256(json.dumps(description, sort_keys = True).encode()).hexdigest()
+
+    def bed_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.bed"
+
+    def metadata_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Path | None:
+        """Path to the cached BED file for a key, marking it as recently used, or None if not cached"""
+        path = self.bed_path(key)
+        if not path.exists() or not self.metadata_path(key).exists():
+            return None
+        os.utime(path)
+        return path
+
+    def put(self, key: str, bed_filename: Union[str, Path], metadata: Dict = None) -> Path:
+        """Move a BED file into the cache under a key, then evict entries beyond max_bytes
+
+        Args:
+            key (str): Cache key from DigestCache.key
+            bed_filename (Union[str, Path]): BED file to move into the cache, ideally in cache_dir so the move is atomic
+            metadata (Dict, optional): Description of the entry, e.g. from describe. Defaults to None.
+
+        Returns:
+            Path: Path to the cached BED file
+        """
+        path = self.bed_path(key)
+        metadata = dict(metadata or {}, key = key, created = time.time())
+        metadata_temp = self.temp_path(".json")
+        metadata_temp.write_text(json.dumps(metadata, sort_keys = True))
+        shutil.move(str(bed_filename), path)
+        os.replace(metadata_temp, self.metadata_path(key))
+        self.evict(keep = key)
+        return path
+
+    def temp_path(self, suffix: str = ".bed") -> Path:
+        """New temporary file path in the cache directory"""
+        handle, name = tempfile.mkstemp(suffix = suffix + ".tmp", dir = self.cache_dir)
+        os.close(handle)
+        return Path(name)
+
+    def entries(self) -> List[Dict]:
+        """Metadata for each entry with its size and last use time, most recently used first"""
+        entries = []
+        for metadata_path in self.cache_dir.glob("*.json"):
+            key = metadata_path.stem
+            bed_path = self.bed_path(key)
+            if not bed_path.exists():
+                continue
+            metadata = json.loads(metadata_path.read_text())
+            stat = bed_path.stat()
+            metadata.update(key = key, bytes = stat.st_size, last_used = stat.st_mtime)
+            entries.append(metadata)
+        return sorted(entries, key = lambda entry: entry["last_used"], reverse = True)
+
+    def total_bytes(self) -> int:
+        return sum(entry["bytes"] for entry in self.entries())
+
+    def evict(self, keep: str = None) -> List[str]:
+        """Remove least recently used entries until the cache fits in max_bytes
+
+        Args:
+            keep (str, optional): Key never to evict, such as one just added. Defaults to None.
+
+        Returns:
+            List[str]: Evicted keys
+        """
+        entries = self.entries()
+        total = sum(entry["bytes"] for entry in entries)
+        evicted = []
+        for entry in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if entry["key"] == keep:
+                continue
+            self.remove(entry["key"])
+            total -= entry["bytes"]
+            evicted.append(entry["key"])
+        return evicted
+
+    def remove(self, key: str) -> None:
+        for path in [self.bed_path(key), self.metadata_path(key)]:
+            path.unlink(missing_ok = True)
+
+    def purge(self, keys: Iterable[str] = None) -> List[str]:
+        """Remove the given entries, or all entries and leftover temporary files if keys is None
+
+        Returns:
+            List[str]: Removed keys
+        """
+        if keys is None:
+            keys = [entry["key"] for entry in self.entries()]
+            for temp in self.cache_dir.glob("*.tmp"):
+                temp.unlink(missing_ok = True)
+        keys = list(keys)
+        for key in keys:
+            self.remove(key)
+        return keys
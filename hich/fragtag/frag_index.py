@@ -1,37 +1,205 @@
+from pathlib import PurePath
+from typing import Dict, Tuple, Union
 import numpy as np
 import polars as pl
+import struct
+import zipfile
 
-# !Warning: this class has no specific unit test as of 2024/10/20 - Ben Skubi
+# See tests/test_frag_index.py for unit tests
+
+def memmap_npz(filename: Union[str, PurePath]) -> Dict[str, np.ndarray]:
+    """Memory-map the arrays stored in an uncompressed .npz file
+
+    np.load reads .npz members into memory, even with mmap_mode. Members
+    written by np.savez are stored without compression, so each one is an
+    .npy file at a fixed offset in the archive and can be mapped directly.
+    Compressed members are read into memory instead.
+
+    Args:
+        filename (Union[str, PurePath]): Path to the .npz file
+
+    Returns:
+        Dict[str, np.ndarray]: Array for each member, keyed by name without the .npy suffix
+    """
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, "rb") as file:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+
+            # Skip the local file header, whose extra field can differ from the central directory's
+            file.seek(info.header_offset)
+            local_header = file.read(30)
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            file.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+
+            if dtype.hasobject or int(np.prod(shape)) == 0:
+                # np.memmap can't map object arrays or empty ranges
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle = False)
+            else:
+                arrays[name] = np.memmap(filename,
+                                         dtype = dtype,
+                                         mode = "r",
+                                         offset = file.tell(),
+                                         shape = shape,
+                                         order = "F" if fortran_order else "C")
+    return arrays
 
 class FragIndex:
+    """Restriction fragments of each chromosome, for mapping positions to fragments
+
+    Fragments are held as two contiguous int64 arrays of starts and ends,
+    sorted by chromosome then start, and an offsets table giving the range
+    of each chromosome's fragments in them. A FragIndex can be loaded from
+    a BED file or from the .npz format written by save_npz, which is
+    memory-mapped so that loading takes milliseconds and the pages are
+    shared between processes reading the same index.
+    """
     def __init__(self, filename = None):
         if filename:
-            self.load_bed(filename)
+            if FragIndex.is_npz(filename):
+                self.load_npz(filename)
+            else:
+                self.load_bed(filename)
+
+    @staticmethod
+    def is_npz(filename) -> bool:
+        """Whether the file is an .npz (zip) archive rather than a BED file"""
+        try:
+            with open(filename, "rb") as file:
+                return file.read(4) == b"PK\x03\x04"
+        except (OSError, TypeError):
+            return False
 
     def load_bed(self, filename):
         bedcols = ['chrom', 'start', 'end']
-        self.chrom_intervals = pl.read_csv(filename,
-                                            separator = '\t',
-                                            has_header = False,
-                                            new_columns = bedcols) \
-                                 .sort(by=['chrom', 'start', 'end']) \
-                                 .partition_by(['chrom'],
-                                               as_dict = True,
-                                               include_key = False)
-
-        self.chrom_ends_sorted = {chrom:
-                                  sorted(self.ends(chrom).to_list())
-                                  for chrom
-                                  in self.chrom_intervals}
-    
+        df = pl.read_csv(filename,
+                         separator = '\t',
+                         has_header = False,
+                         new_columns = bedcols,
+                         schema_overrides = {'chrom': pl.String, 'start': pl.Int64, 'end': pl.Int64})
+        self.load_frame(df)
+
+    def load_frame(self, df: pl.DataFrame):
+        """Load fragments from a DataFrame with chrom, start and end columns"""
+        df = df.sort(by = ['chrom', 'start', 'end'])
+        counts = df.group_by('chrom', maintain_order = True).len()
+
+        self.chrom_names = counts['chrom'].to_numpy().astype(str)
+        self.offsets = np.concatenate([[0], np.cumsum(counts['len'].to_numpy())]).astype(np.int64)
+        self.start_array = df['start'].cast(pl.Int64).to_numpy()
+        self.end_array = df['end'].cast(pl.Int64).to_numpy()
+        self.build_chrom_ranges()
+
+    def load_npz(self, filename):
+        """Memory-map an index written by save_npz"""
+        arrays = memmap_npz(filename)
+        self.chrom_names = np.asarray(arrays['chroms'])
+        self.offsets = np.asarray(arrays['offsets'])
+        self.start_array = arrays['starts']
+        self.end_array = arrays['ends']
+        self.build_chrom_ranges()
+
+    def save_npz(self, filename):
+        """Write the index as an uncompressed .npz file that load_npz can memory-map
+
+        Members are chroms (chromosome names), offsets (the fragments of
+        chroms[i] are at offsets[i]:offsets[i+1]), starts and ends.
+        """
+        # np.savez appends .npz to names without it, so write through a handle
+        with open(filename, "wb") as file:
+            np.savez(file,
+                     chroms = self.chrom_names,
+                     offsets = self.offsets,
+                     starts = np.asarray(self.start_array, dtype = np.int64),
+                     ends = np.asarray(self.end_array, dtype = np.int64))
+
+    def build_chrom_ranges(self):
+        self.chrom_ranges = {str(chrom): (int(self.offsets[i]), int(self.offsets[i + 1]))
+                             for i, chrom in enumerate(self.chrom_names)}
+        self.chrom_ids = {chrom: i for i, chrom in enumerate(self.chrom_ranges)}
+        self._genome_ends = None
+
+    def genome_ends(self) -> np.ndarray:
+        """Fragment ends shifted by a per-chromosome offset so they are sorted genome-wide
+
+        Each chromosome's offset (self.chrom_shifts) is one more than the
+        shifted end of the previous chromosome's last fragment, so shifting a
+        position on a chromosome by its offset and searching genome_ends finds
+        the same fragment as searching that chromosome's ends alone.
+        """
+        if self._genome_ends is None:
+            counts = np.diff(self.offsets)
+            last_ends = np.array([self.end_array[hi - 1] if hi > lo else 0
+                                  for lo, hi in zip(self.offsets[:-1], self.offsets[1:])],
+                                 dtype = np.int64)
+            self.chrom_shifts = np.cumsum(last_ends + 1) - (last_ends + 1)
+            self._genome_ends = self.end_array + np.repeat(self.chrom_shifts, counts)
+        return self._genome_ends
+
+    def fragments(self, chroms: pl.Series, positions: pl.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Map positions to restriction fragments with one search over the genome
+
+        Positions are shifted by their chromosome's offset (see genome_ends),
+        so a batch is mapped by a single np.searchsorted in its original row
+        order, without partitioning, sorting or joining.
+
+        Args:
+            chroms (pl.Series): Chromosome of each position
+            positions (pl.Series): Positions to map
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Index of each position's
+            fragment within its chromosome, and the fragment's start and end,
+            with -1, 0, 0 for positions on chromosomes not in the index or
+            past the chromosome's last fragment
+        """
+        genome_ends = self.genome_ends()
+        if len(genome_ends) == 0:
+            return np.full(len(positions), -1), np.zeros(len(positions), dtype = np.int64), np.zeros(len(positions), dtype = np.int64)
+        chrom_ids = chroms.cast(pl.String) \
+                          .replace_strict(self.chrom_ids, default = -1, return_dtype = pl.Int64) \
+                          .to_numpy()
+        positions = positions.cast(pl.Int64).to_numpy()
+
+        known = chrom_ids >= 0
+        chrom_ids = np.where(known, chrom_ids, 0)
+        lo = self.offsets[chrom_ids]
+        hi = self.offsets[chrom_ids + 1]
+
+        indices = np.searchsorted(genome_ends, positions + self.chrom_shifts[chrom_ids])
+        mapped = known & (indices >= lo) & (indices < hi)
+        indices = np.where(mapped, indices, 0)
+
+        rfrag = np.where(mapped, indices - lo, -1)
+        return rfrag, np.where(mapped, self.start_array[indices], 0), np.where(mapped, self.end_array[indices], 0)
+
+    @staticmethod
+    def chrom_key(chrom) -> str:
+        # partition_by(..., as_dict = True) gives keys as 1-tuples
+        return chrom[0] if isinstance(chrom, tuple) else chrom
+
+    def chrom_slice(self, chrom) -> slice:
+        return slice(*self.chrom_ranges[FragIndex.chrom_key(chrom)])
+
     def search(self, chrom, positions):
-        return np.searchsorted(self.chrom_ends_sorted[chrom], positions)
-    
+        return np.searchsorted(self.end_array[self.chrom_slice(chrom)], positions)
+
     def starts(self, chrom):
-        return self.chrom_intervals[chrom]['start']
-    
+        return pl.Series('start', self.start_array[self.chrom_slice(chrom)])
+
     def ends(self, chrom):
-        return self.chrom_intervals[chrom]['end']
-    
+        return pl.Series('end', self.end_array[self.chrom_slice(chrom)])
+
     def __contains__(self, chrom):
-        return chrom in self.chrom_intervals
\ No newline at end of file
+        return FragIndex.chrom_key(chrom) in self.chrom_ranges
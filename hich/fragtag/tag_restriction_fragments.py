@@ -1,6 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 import click
 import numpy as np
 import polars as pl
+import queue
+import threading
 import time
 import warnings
 import sys
@@ -12,19 +15,82 @@ from hich.fragtag.samheader_fragtag import SamheaderFragtag
 def tag_restriction_fragments(frags_filename: str,
                               input_pairs_filename: str,
                               output_pairs_filename: str,
-                              batch_size: int = 1000000):
+                              batch_size: int = 1000000,
+                              report_throughput: bool = False,
+                              threads: int = 1,
+                              index: bool = False):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
-    
+
     frag_index = FragIndex(frags_filename)
     pairs_parser = PairsParser(input_pairs_filename)
+    batches = pairs_parser.batch_iter(batch_size, report_throughput)
 
-    for df in pairs_parser.batch_iter(batch_size):  
-        df = BedpePairs(df).fragtag(frag_index)
+    if threads > 1:
+        tagged = tag_batches_threaded(batches, frag_index, threads)
+    else:
+        tagged = (BedpePairs(df).fragtag(frag_index) for df in batches)
 
+    for df in tagged:
         pairs_parser.write_append(output_pairs_filename,
                                   df,
-                                  header_end = SamheaderFragtag())
+                                  header_end = SamheaderFragtag(),
+                                  threads = threads,
+                                  index = index)
 
 
     pairs_parser.close()
 
+def tag_batches_threaded(batches, frag_index, threads: int):
+    """Tag batches on a thread pool, yielding them in input order
+
+    A reader thread pulls batches from the batches iterator and submits each
+    to a pool of threads tagging them against the shared frag_index. Polars
+    parsing and NumPy searches release the GIL, so reading, tagging and the
+    caller's writing of yielded batches overlap. The reader places each
+    batch's future in a bounded queue, so at most 2 * threads batches are in
+    flight at once and memory use doesn't grow with the input size.
+
+    Args:
+        batches (Iterator[pl.DataFrame]): .pairs batches, e.g. from PairsParser.batch_iter
+        frag_index (FragIndex): Restriction fragment index
+        threads (int): Number of tagging threads
+
+    Yields:
+        pl.DataFrame: Tagged batches in the order they were read
+    """
+    # See tests/test_bedpe_pairs.py for unit tests
+    futures = queue.Queue(maxsize = 2 * threads)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has stopped, rather than block forever on a full queue
+        while not stop.is_set():
+            try:
+                futures.put(item, timeout = 0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read(pool):
+        try:
+            for df in batches:
+                if stop.is_set():
+                    break
+                put(pool.submit(BedpePairs(df).fragtag, frag_index))
+        except BaseException as e:
+            # Raise reader errors in the consumer, after the batches read before them
+            put(e)
+        put(done)
+
+    with ThreadPoolExecutor(threads) as pool:
+        reader = threading.Thread(target = read, args = (pool,), daemon = True)
+        reader.start()
+        try:
+            while (item := futures.get()) is not done:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item.result()
+        finally:
+            stop.set()
+            reader.join()
@@ -4,12 +4,17 @@ import click
 import numpy as np
 from hicrep.utils import readMcool
 from .hicrep_wrapper import hicrepSCC
+from .hicrep_store import HicrepStore
+from .hicrep_engine import MatrixKey, all_vs_all_scc_task, prepared_scc_batch, save_prepared_matrix
 import os
 import glob
 import cooler
 from cooler import Cooler
 from dataclasses import *
 import h5py
+import sys
+import tempfile
+import time
 
 import warnings
 from pathlib import Path
@@ -19,7 +24,7 @@ import polars as pl
 from itertools import combinations, combinations_with_replacement, product, chain
 
 from collections.abc import Iterable
-import concurrent.futures
+from hich.parallel import ordered_bounded_map
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 """
@@ -68,14 +73,186 @@ def run_hicrep(call):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
     return call.run_hicrep()
 
-def parallel_hicrep(callers, max_workers = None):
+def matrix_keys(call: HicrepCall) -> Tuple[MatrixKey, MatrixKey]:
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
-    with concurrent.futures.ProcessPoolExecutor(max_workers = max_workers) as executor:
-        results = executor.map(run_hicrep, callers)
-    if results:
-        columns = list(HicrepCall.__dataclass_fields__.keys())
-        rows = [astuple(result) for result in results]
-        return pl.DataFrame(rows, orient='row', schema=columns)
+    params = (call.resolution, call.chrom, call.h, call.dBPMax, call.bDownSample)
+    return MatrixKey(str(call.file1), *params), MatrixKey(str(call.file2), *params)
+
+def parallel_hicrep(callers, max_workers = None, prepared_dir = None, chunksize = None):
+    """Compute SCC for each HicrepCall in a process pool, returning a DataFrame of the results"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    for _ in iter_parallel_hicrep(callers, max_workers, prepared_dir, chunksize):
+        pass
+    return hicrep_frame(callers)
+
+def iter_parallel_hicrep(callers, max_workers = None, prepared_dir = None, chunksize = None):
+    """Compute SCC for each HicrepCall in a process pool, yielding lists of finished calls in order
+
+    Each distinct (file, resolution, chrom, h, dBPMax, bDownSample) matrix is
+    loaded, trimmed, normalized and smoothed once, by one worker, and saved
+    to a temporary directory, created in prepared_dir if given (e.g. /dev/shm
+    to keep them in shared memory). Comparisons then load the prepared
+    matrices, which each worker keeps in a small in-memory cache, and compute
+    only the per-diagonal correlation. This replaces reloading and smoothing
+    both matrices for every comparison with HicrepCall.run_hicrep, which
+    gives the same SCC.
+
+    Comparisons are scheduled in groups sharing (file1, file2, resolution),
+    so a worker reuses the files' prepared matrices across a group, and only
+    prepared matrix paths are sent to workers. Groups are sent chunksize at
+    a time (by default, enough for about 4 chunks per worker, up to 32
+    groups), and each group's calls are yielded as soon as it and all groups
+    before it are finished, so results can be written as they arrive. Only
+    2 chunks per worker are submitted ahead of the results yielded, so
+    memory for pending tasks and results doesn't grow with the number of
+    comparisons.
+    """
+    # See tests/test_hicrep_engine.py for unit tests
+    pair_keys = [matrix_keys(call) for call in callers]
+    keys = list(dict.fromkeys(chain.from_iterable(pair_keys)))
+
+    groups = defaultdict(list)
+    for call, pair_key in zip(callers, pair_keys):
+        groups[(str(call.file1), str(call.file2), call.resolution)].append((call, pair_key))
+    groups = list(groups.values())
+
+    workers = max_workers or os.cpu_count()
+    with tempfile.TemporaryDirectory(dir = prepared_dir) as temp_dir:
+        prepared = dict(zip(keys, ordered_bounded_map(save_prepared_matrix,
+                                                      ((key, temp_dir) for key in keys),
+                                                      workers,
+                                                      2 * workers,
+                                                      task_chunksize(len(keys), workers, chunksize))))
+        tasks = ([(prepared[key1], prepared[key2], call.h) for call, (key1, key2) in group] for group in groups)
+        results = ordered_bounded_map(prepared_scc_batch,
+                                      tasks,
+                                      workers,
+                                      2 * workers,
+                                      task_chunksize(len(groups), workers, chunksize))
+        for group, sccs in zip(groups, results):
+            for (call, _), scc in zip(group, sccs):
+                call.scc = SCC(scc)
+            yield [call for call, _ in group]
+
+def task_chunksize(n_tasks: int, workers: int, chunksize: int = None) -> int:
+    """Tasks to send to a worker at once: chunksize if given, or enough for about 4 chunks per worker, up to 32"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    return chunksize or max(1, min(32, n_tasks // (4 * workers)))
+
+def all_vs_all_hicrep(callers, max_workers = None, prepared_dir = None, chunksize = None):
+    """Compute SCC for each HicrepCall with all_vs_all_scc, returning a DataFrame of the results"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    for _ in iter_all_vs_all_hicrep(callers, max_workers, prepared_dir, chunksize):
+        pass
+    return hicrep_frame(callers)
+
+def iter_all_vs_all_hicrep(callers, max_workers = None, prepared_dir = None, chunksize = None):
+    """Compute SCC for each HicrepCall, comparing all files with the same parameters at once
+
+    Callers are grouped by (resolution, chrom, h, dBPMax). Each group's
+    prepared matrices are compared all-vs-all by all_vs_all_scc in one
+    task, which scales much better in the number of files than comparing
+    each pair separately and gives the same SCC as parallel_hicrep up to
+    floating point rounding. Each group's calls are yielded when finished.
+    Downsampled comparisons depend on the pair, so they are computed
+    afterwards by iter_parallel_hicrep.
+    """
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    groups = defaultdict(list)
+    downsampled = []
+    for call in callers:
+        if call.bDownSample:
+            downsampled.append(call)
+        else:
+            groups[(call.resolution, call.chrom, call.h, call.dBPMax)].append(call)
+
+    group_files = {params: list(dict.fromkeys(chain.from_iterable((str(call.file1), str(call.file2)) for call in group)))
+                   for params, group in groups.items()}
+    keys = [MatrixKey(file, *params, False) for params, files in group_files.items() for file in files]
+
+    workers = max_workers or os.cpu_count()
+    with tempfile.TemporaryDirectory(dir = prepared_dir) as temp_dir:
+        prepared = dict(zip(keys, ordered_bounded_map(save_prepared_matrix,
+                                                      ((key, temp_dir) for key in keys),
+                                                      workers,
+                                                      2 * workers,
+                                                      task_chunksize(len(keys), workers, chunksize))))
+        tasks = ([prepared[MatrixKey(file, *params, False)] for file in files] for params, files in group_files.items())
+        for (params, files), scc in zip(group_files.items(), ordered_bounded_map(all_vs_all_scc_task, tasks, workers, 2 * workers)):
+            index = {file: i for i, file in enumerate(files)}
+            for call in groups[params]:
+                call.scc = SCC(scc[index[str(call.file1)], index[str(call.file2)]])
+            yield groups[params]
+
+    if downsampled:
+        yield from iter_parallel_hicrep(downsampled, max_workers, prepared_dir, chunksize)
+
+hicrep_schema = {"file1": pl.String,
+                 "file2": pl.String,
+                 "resolution": pl.Int64,
+                 "h": pl.Int64,
+                 "dBPMax": pl.Int64,
+                 "bDownSample": pl.Boolean,
+                 "chrom": pl.String,
+                 "scc": pl.Float64}
+
+def hicrep_frame(callers):
+    # See tests/test_hicrep_engine.py for unit tests
+    if callers:
+        rows = [tuple(str(value) if isinstance(value, Path) else value for value in astuple(call)) for call in callers]
+        return pl.DataFrame(rows, orient='row', schema=hicrep_schema)
+
+class HicrepWriter:
+    """Write hicrep results as they are computed, as Parquet if the filename ends in .parquet and otherwise as TSV"""
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.parquet = filename.endswith(".parquet")
+        self.writer = None
+        self.handle = None
+
+    def write(self, df: pl.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow.parquet as pq
+            table = df.to_arrow()
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.filename, table.schema)
+            self.writer.write_table(table)
+        else:
+            header = self.handle is None
+            if header:
+                self.handle = open(self.filename, "wb")
+            df.write_csv(self.handle, separator = "\t", include_header = header)
+            self.handle.flush()
+
+    def close(self) -> None:
+        if self.writer is None and self.handle is None:
+            # No results, but keep the columns
+            self.write(pl.DataFrame(schema = hicrep_schema))
+        if self.writer is not None:
+            self.writer.close()
+        if self.handle is not None:
+            self.handle.close()
+
+class HicrepProgress:
+    """Report comparisons finished, elapsed time and estimated time remaining to stderr at most every interval seconds"""
+    def __init__(self, total: int, interval: float = 10.0):
+        # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last_report = self.start
+
+    def update(self, finished: int) -> None:
+        self.done += finished
+        now = time.perf_counter()
+        if now - self.last_report < self.interval and self.done < self.total:
+            return
+        elapsed = now - self.start
+        eta = elapsed / self.done * (self.total - self.done) if self.done else float('inf')
+        print(f"hicrep: {self.done}/{self.total} comparisons ({self.done / self.total:.1%}) in {elapsed:.0f}s, ETA {eta:.0f}s",
+              file = sys.stderr)
+        self.last_report = now
 
 def shared_chroms(filenames: List[str], filter = lambda chrom, size: chrom):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
@@ -108,7 +285,7 @@ def hicrep_callers(matrices: List,
                    bDownSample: List[bool],
                    matrix_pair_function = combinations_with_replacement,
                    param_set_function = product):
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    # See tests/test_hicrep_store.py for unit tests
     
     def asiterable(arg):
         return arg if isinstance(arg, Iterable) else [arg]
@@ -126,15 +303,38 @@ def hicrep_callers(matrices: List,
     
     return [HicrepCall(combo[0][0], combo[0][1], *combo[1]) for combo in combos]
     
-def hicrep_combos(resolutions, chroms, exclude, chromFilter, h, d_bp_max, b_downsample, nproc, output, paths):
+def hicrep_combos(resolutions, chroms, exclude, chromFilter, h, d_bp_max, b_downsample, nproc, output, paths, prepared_dir = None, all_vs_all_fast = False, store = None, chunksize = None):
     # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
     assert paths, "No paths specified in hich hicrep"
     chroms = chroms or shared_chroms(paths, lambda chrom, size: eval(chromFilter))
     chroms = set(chroms) - set(exclude) if exclude else chroms
     assert chroms, "No chromosomes specified or no universally overlapping chromosomes found in hich hicrep"
     callers = hicrep_callers(paths, resolutions, chroms, h = h, dBPMax = d_bp_max, bDownSample = b_downsample)
-    result = parallel_hicrep(callers, max_workers = nproc)
-    if output:
-        result.write_csv(output, separator = "\t")
-    else:
-        return result
+    compare = iter_all_vs_all_hicrep if all_vs_all_fast else iter_parallel_hicrep
+
+    # Compute only comparisons not already in the store, then report all requested comparisons
+    store = HicrepStore(store) if store else None
+    missing = store.fill(callers) if store else callers
+
+    # Without a store, results go straight to the output as they are computed;
+    # with one, they are added to the store as computed and the output holds all requested comparisons
+    writer = HicrepWriter(output) if output and not store else None
+    progress = HicrepProgress(len(missing))
+    try:
+        if missing:
+            for finished in compare(missing, max_workers = nproc, prepared_dir = prepared_dir, chunksize = chunksize):
+                if store:
+                    store.append(finished)
+                if writer:
+                    writer.write(hicrep_frame(finished))
+                progress.update(len(finished))
+    finally:
+        if writer:
+            writer.close()
+
+    if output and store:
+        writer = HicrepWriter(output)
+        writer.write(hicrep_frame(callers))
+        writer.close()
+    elif not output:
+        return hicrep_frame(callers)
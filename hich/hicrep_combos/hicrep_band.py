@@ -0,0 +1,141 @@
+"""Banded mean filter and downsampling for hicrep, touching only the diagonals SCC compares"""
+
+import numpy as np
+import scipy.sparse as sp
+
+# See tests/test_hicrep_band.py for unit tests
+
+# Dense cells per strip of rows smoothed at once, so memory grows with band width rather than chromosome size
+strip_cells = 1 << 22
+
+def box_sums(values: np.ndarray, h: int) -> np.ndarray:
+    """Sum of each (2h + 1) x (2h + 1) window of a 2D array, from its cumulative sums
+
+    Args:
+        values (np.ndarray): Array padded by h on each side
+        h (int): Half-size of the window
+
+    Returns:
+        np.ndarray: Window sums, h smaller than values on each side
+    """
+    size = 2 * h + 1
+    cumulative = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype = values.dtype)
+    np.cumsum(values, axis = 0, out = cumulative[1:, 1:])
+    np.cumsum(cumulative[1:, 1:], axis = 1, out = cumulative[1:, 1:])
+    sums = cumulative[size:, size:] - cumulative[:-size, size:]
+    sums -= cumulative[size:, :-size]
+    sums += cumulative[:-size, :-size]
+    return sums
+
+def neighbor_counts(n_bins: int, h: int) -> np.ndarray:
+    """Number of bins averaged along each dimension at each position, as meanFilterSparse counts them near the edges"""
+    positions = np.arange(n_bins)
+    return h + 1 + np.minimum(np.minimum(positions, n_bins - 1 - positions), h)
+
+def band_mean_filter(a: sp.coo_matrix, h: int, nDiags: int) -> sp.coo_matrix:
+    """Mean filter of an upper triangular contact matrix on diagonals 1 to nDiags - 1
+
+    Gives the same values as hicrep's meanFilterSparse on the diagonals
+    sccByDiag compares, including its reduced neighbor counts near the
+    edges of the matrix, for input with no entries outside those diagonals
+    (as trimDiags leaves it). Rather than filtering the whole matrix with
+    sparse products, strips of rows are filtered with 2D cumulative sums
+    over the band of columns they can reach, so memory grows with
+    band width rather than chromosome size. Windows with no nonzero
+    input are left out, as in meanFilterSparse, so floating point
+    residue from the cumulative sums of non-integer input does not add
+    positions to sccByDiag.
+
+    Args:
+        a (sp.coo_matrix): Square upper triangular matrix with entries only on diagonals 1 to nDiags - 1
+        h (int): Half-size of the filter
+        nDiags (int): Smooth diagonals with index in the range [1, nDiags)
+
+    Returns:
+        sp.coo_matrix: Filtered matrix, with entries only on diagonals 1 to nDiags - 1
+    """
+    assert h > 0, "band_mean_filter half-size must be greater than 0"
+    assert a.shape[0] == a.shape[1], "band_mean_filter cannot handle non-square matrix"
+    n_bins = a.shape[0]
+    csr = sp.csr_matrix(a, dtype = np.float64)
+    csr.sum_duplicates()
+    finite = np.isfinite(csr.data).all()
+    counts = neighbor_counts(n_bins, h)
+    csr_rows = np.repeat(np.arange(n_bins), np.diff(csr.indptr))
+    index_dtype = np.int32 if n_bins < 2**31 else np.int64
+
+    # Sums of integer counts are exact, so windows with no nonzero input sum to exactly 0
+    exact = finite and np.array_equal(csr.data, np.round(csr.data)) and np.abs(csr.data).sum() < 2**53
+
+    # A strip of rows reaches (strip + nDiags) columns, of which each row uses nDiags,
+    # so strips are short relative to the band but long relative to their 2h rows of padding
+    strip = max(1, min(n_bins, max(8 * h, nDiags // 4), strip_cells // (nDiags + 4 * h)))
+    # Strip positions (row, column) on diagonals 1 to nDiags - 1, for columns starting one past the strip's first row
+    offsets = np.arange(strip + nDiags)[None, :] - np.arange(strip)[:, None]
+    band = (offsets >= 0) & (offsets < nDiags - 1)
+    rows, cols, data = [], [], []
+    for row_start in range(0, n_bins, strip):
+        row_end = min(n_bins, row_start + strip)
+        col_start = row_start + 1
+        col_end = min(n_bins, row_end + nDiags - 1)
+        if col_start >= col_end:
+            continue
+
+        # Input within h of the strip's output rows and columns, placed in zero padding
+        start, end = csr.indptr[max(0, row_start - h)], csr.indptr[min(n_bins, row_end + h)]
+        entry_rows = csr_rows[start:end]
+        entry_cols = csr.indices[start:end]
+        entry_data = csr.data[start:end]
+        near = (entry_cols >= col_start - h) & (entry_cols < col_end + h)
+        entry_rows, entry_cols, entry_data = entry_rows[near], entry_cols[near], entry_data[near]
+
+        shape = (row_end - row_start + 2 * h, col_end - col_start + 2 * h)
+        local = (entry_rows - row_start + h, entry_cols - col_start + h)
+        values = np.zeros(shape)
+        values[local] = entry_data if finite else np.nan_to_num(entry_data, nan = 0.0, posinf = 0.0, neginf = 0.0)
+        sums = box_sums(values, h)
+        if exact:
+            support = sums
+        else:
+            nonzero = np.zeros(shape, dtype = np.int64)
+            nonzero[local] = entry_data != 0
+            support = box_sums(nonzero, h)
+        if not finite:
+            # Non-finite input makes its windows non-finite, which sccByDiag scores as for meanFilterSparse
+            nonfinite = np.zeros(shape, dtype = np.int64)
+            nonfinite[local] = ~np.isfinite(entry_data)
+            sums[box_sums(nonfinite, h) > 0] = np.nan
+
+        keep = band[:sums.shape[0], :sums.shape[1]] & (support != 0)
+        i, j = np.nonzero(keep)
+        i += row_start
+        j += col_start
+        values = sums[keep]
+        values /= counts[i] * counts[j]
+        rows.append(i.astype(index_dtype))
+        cols.append(j.astype(index_dtype))
+        data.append(values)
+
+    if not rows:
+        return sp.coo_matrix(a.shape, dtype = np.float64)
+    return sp.coo_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape = a.shape)
+
+def downsample(m: sp.coo_matrix, size: int) -> sp.coo_matrix:
+    """Resample contacts with replacement so that they sum to size, as hicrep's resample does
+
+    Draws the new counts as one multinomial over the matrix entries rather
+    than drawing each contact separately, which gives the same distribution
+    without allocating an array of size contacts.
+
+    Args:
+        m (sp.coo_matrix): Input matrix
+        size (int): Resulting matrix sums to this number
+
+    Returns:
+        sp.coo_matrix: Resampled matrix
+    """
+    p = m.data / m.data.sum()
+    sampled = np.random.multinomial(size, p)
+    ans = sp.coo_matrix((sampled, (m.row, m.col)), shape = m.shape)
+    ans.eliminate_zeros()
+    return ans
@@ -0,0 +1,214 @@
+"""Compute hicrep SCC for many comparisons, preparing each chromosome matrix once"""
+
+from dataclasses import dataclass, astuple
+from functools import lru_cache
+from hicrep.hicrep import sccByDiag
+from hicrep.utils import coolerInfo, trimDiags, upperDiagCsr, varVstran
+from .hicrep_band import band_mean_filter, downsample
+from pathlib import Path
+from typing import List, Tuple
+import cooler
+import h5py
+import hashlib
+import numpy as np
+import scipy.sparse as sp
+
+# Prepared matrices each worker process keeps in memory, most recently used first
+prepared_cache_size = 16
+
+@dataclass(frozen = True)
+class MatrixKey:
+    """Identifies a chromosome matrix as prepared for hicrep comparisons with the given parameters"""
+    file: str
+    resolution: int
+    chrom: str
+    h: int
+    dBPMax: int
+    bDownSample: bool
+
+    def filename(self) -> str:
+        """Name for the prepared matrix, a hash of the key"""
+        return hashlib.sha256(repr(astuple(self)).encode()).hexdigest() + ".npz"
+
+@dataclass
+class PreparedMatrix:
+    """Chromosome matrix trimmed to the diagonals hicrep compares
+
+    Without downsampling, the matrix is normalized by the file's total
+    contacts and smoothed, exactly as computeSCC does for each comparison,
+    so comparisons only compute the per-diagonal correlation. With
+    downsampling, the matrix to downsample depends on the pair, so the
+    trimmed raw counts are kept and computeSCC's remaining steps run per
+    comparison.
+    """
+    matrix: sp.coo_matrix
+    nDiags: int
+    smoothed: bool
+
+    def save(self, path: Path) -> None:
+        np.savez(path,
+                 row = self.matrix.row,
+                 col = self.matrix.col,
+                 data = self.matrix.data,
+                 shape = np.array(self.matrix.shape),
+                 nDiags = self.nDiags,
+                 smoothed = self.smoothed)
+
+    @classmethod
+    def load(cls, path: Path) -> "PreparedMatrix":
+        with np.load(path) as npz:
+            matrix = sp.coo_matrix((npz["data"], (npz["row"], npz["col"])), shape = tuple(npz["shape"]))
+            return cls(matrix, int(npz["nDiags"]), bool(npz["smoothed"]))
+
+def chrom_coo(file: str, resolution: int, chrom: str) -> Tuple[sp.coo_matrix, float, int, int]:
+    """Upper triangle of a chromosome's raw contact matrix from an .mcool
+
+    Returns:
+        Tuple[sp.coo_matrix, float, int, int]: Chromosome matrix, total contacts in the file, bin size and number of bins in the file
+    """
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    with h5py.File(file, "r") as h5:
+        cool = cooler.Cooler(h5["resolutions"][str(resolution)]) if resolution > 0 else cooler.Cooler(h5)
+        pixels = cool.matrix(as_pixels = True, balance = False, sparse = True).fetch(chrom)
+        offset = cool.offset(chrom)
+        n_bins = cool.extent(chrom)[1] - offset
+        matrix = sp.coo_matrix((pixels["count"].to_numpy(),
+                                (pixels["bin1_id"].to_numpy() - offset, pixels["bin2_id"].to_numpy() - offset)),
+                               shape = (n_bins, n_bins))
+        return matrix, coolerInfo(cool, "sum"), cool.binsize, coolerInfo(cool, "nbins")
+
+def prepare_matrix(key: MatrixKey) -> PreparedMatrix:
+    """Load, trim, normalize and smooth a chromosome matrix as computeSCC does
+
+    Args:
+        key (MatrixKey): File, resolution, chromosome and hicrep parameters
+
+    Returns:
+        PreparedMatrix: Matrix ready for comparison with others prepared with the same parameters
+    """
+    # See tests/test_hicrep_engine.py for unit tests
+    matrix, total, bin_size, n_bins = chrom_coo(key.file, key.resolution, key.chrom)
+    assert matrix.size > 0, f"Contact matrix of chromosome {key.chrom} in {key.file} is empty"
+
+    dMax = n_bins if key.dBPMax == -1 else key.dBPMax // bin_size + 1
+    assert dMax > 1, f"Input dBPmax is smaller than binSize"
+    nDiags = matrix.shape[0] if dMax < 0 else min(dMax, matrix.shape[0])
+
+    matrix = trimDiags(matrix, nDiags, False)
+    if key.bDownSample:
+        return PreparedMatrix(matrix, nDiags, False)
+
+    # Smoothing the raw counts before normalizing lets band_mean_filter sum them exactly
+    if key.h > 0:
+        matrix = band_mean_filter(matrix, key.h, nDiags)
+    matrix = matrix.astype(float) / total
+    return PreparedMatrix(matrix, nDiags, True)
+
+def save_prepared_matrix(task: Tuple[MatrixKey, str]) -> str:
+    """Prepare the matrix for a key and save it in a directory, unless it is already there"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    key, prepared_dir = task
+    path = Path(prepared_dir) / key.filename()
+    if not path.exists():
+        temp = path.with_suffix(".tmp.npz")
+        prepare_matrix(key).save(temp)
+        temp.replace(path)
+    return str(path)
+
+@lru_cache(maxsize = prepared_cache_size)
+def load_prepared_matrix(path: str) -> PreparedMatrix:
+    return PreparedMatrix.load(path)
+
+def prepared_scc(m1: PreparedMatrix, m2: PreparedMatrix, h: int) -> float:
+    """hicrep SCC between two chromosome matrices prepared with the same parameters
+
+    Gives the same result as hicrepSCC for the chromosome, including -2 if
+    the comparison fails.
+    """
+    # See tests/test_hicrep_engine.py for unit tests
+    assert m1.matrix.shape == m2.matrix.shape, \
+        f"Contact matrices have different input shape"
+    try:
+        if m1.smoothed:
+            return sccByDiag(m1.matrix, m2.matrix, m1.nDiags)
+
+        matrix1, matrix2 = m1.matrix, m2.matrix
+        size1 = matrix1.sum()
+        size2 = matrix2.sum()
+        if size1 > size2:
+            matrix1 = downsample(matrix1, size2).astype(float)
+        elif size2 > size1:
+            matrix2 = downsample(matrix2, size1).astype(float)
+        if h > 0:
+            matrix1 = band_mean_filter(matrix1, h, m1.nDiags)
+            matrix2 = band_mean_filter(matrix2, h, m1.nDiags)
+        return sccByDiag(matrix1, matrix2, m1.nDiags)
+    except Exception as e:
+        print(e)
+        return -2.0
+
+def prepared_scc_batch(tasks: List[Tuple[str, str, int]]) -> List[float]:
+    """SCC for each task of (prepared matrix 1 path, prepared matrix 2 path, h)"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    return [prepared_scc(load_prepared_matrix(path1), load_prepared_matrix(path2), h) for path1, path2, h in tasks]
+
+def all_vs_all_scc(prepared: List[PreparedMatrix]) -> np.ndarray:
+    """hicrep SCC between every pair of smoothed chromosome matrices prepared with the same parameters
+
+    For each diagonal, the samples' values are gathered into a dense
+    (samples x diagonal length) block X. sccByDiag's sums for all pairs at
+    once are then X @ X.T (sums of products), and B @ B.T for B = X != 0,
+    which gives the number of positions where both samples are nonzero and
+    so the number nonzero in either. These give each pair's per-diagonal
+    correlation and variance-stabilized weight exactly as in sccByDiag, with
+    one matrix product per diagonal rather than a sparse computation per
+    pair.
+
+    Args:
+        prepared (List[PreparedMatrix]): Smoothed (not downsampled) matrices of the same shape and nDiags
+
+    Returns:
+        np.ndarray: Symmetric (samples x samples) SCC matrix
+    """
+    # See tests/test_hicrep_engine.py for unit tests
+    assert all(p.smoothed for p in prepared), "All-vs-all SCC does not support downsampling"
+    assert len({p.matrix.shape for p in prepared}) == 1, "Contact matrices have different input shape"
+    nDiags = prepared[0].nDiags
+    n_bins = prepared[0].matrix.shape[0]
+    n_samples = len(prepared)
+
+    diagonals = [upperDiagCsr(p.matrix, nDiags) for p in prepared]
+    weighted_rho = np.zeros((n_samples, n_samples))
+    total_weight = np.zeros((n_samples, n_samples))
+    for d in range(nDiags - 1):
+        # Row d holds diagonal d + 1, which has n_bins - d - 1 positions
+        X = np.zeros((n_samples, n_bins - d - 1))
+        for sample, m in enumerate(diagonals):
+            start, end = m.indptr[d], m.indptr[d + 1]
+            X[sample, m.indices[start:end]] = m.data[start:end]
+
+        products = X @ X.T
+        nonzero = (X != 0).astype(np.float64)
+        nnz = nonzero.sum(axis = 1)
+        n = nnz[:, None] + nnz[None, :] - nonzero @ nonzero.T
+        sums = X.sum(axis = 1)
+        squares = np.diag(products)
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            cov = products - np.outer(sums, sums) / n
+            var1 = squares[:, None] - np.square(sums)[:, None] / n
+            var2 = squares[None, :] - np.square(sums)[None, :] / n
+            rho = cov / np.sqrt(var1 * var2)
+            ws = n * varVstran(n)
+        ws = np.nan_to_num(ws, copy = False, posinf = 0.0, neginf = 0.0)
+        rho = np.nan_to_num(rho, copy = False, posinf = 0.0, neginf = 0.0)
+        weighted_rho += rho * ws
+        total_weight += ws
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return weighted_rho / total_weight
+
+def all_vs_all_scc_task(paths: List[str]) -> np.ndarray:
+    """SCC matrix from a task of prepared matrix paths"""
+    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    return all_vs_all_scc([load_prepared_matrix(path) for path in paths])
@@ -0,0 +1,95 @@
+"""Persistent store of hicrep SCC results, so repeat runs only compute new comparisons"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+import hashlib
+import polars as pl
+
+# See tests/test_hicrep_store.py for unit tests
+
+store_schema = {"fingerprint1": pl.String,
+                "fingerprint2": pl.String,
+                "resolution": pl.Int64,
+                "h": pl.Int64,
+                "dBPMax": pl.Int64,
+                "bDownSample": pl.Boolean,
+                "chrom": pl.String,
+                "file1": pl.String,
+                "file2": pl.String,
+                "scc": pl.Float64}
+
+def matrix_fingerprint(filename: Union[str, Path]) -> str:
+    """Identify a matrix file by its absolute path, size and modification time, without reading it"""
+    path = Path(filename).resolve()
+    stat = path.stat()
+    return hashlib.sha256(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+@dataclass
+class HicrepStore:
+    """Tab-separated table of computed SCC scores, appended to as comparisons are computed
+
+    Each row is keyed by the fingerprints of both files (see
+    matrix_fingerprint) with the resolution, h, dBPMax, bDownSample and
+    chrom, so a file that is modified or replaced gets new comparisons. SCC
+    is symmetric, so a comparison of file2 with file1 is found under file1
+    with file2.
+    """
+    path: Union[str, Path]
+
+    def __post_init__(self):
+        self.path = Path(self.path)
+        self.fingerprints = {}
+
+    def fingerprint(self, filename) -> str:
+        filename = str(filename)
+        if filename not in self.fingerprints:
+            self.fingerprints[filename] = matrix_fingerprint(filename)
+        return self.fingerprints[filename]
+
+    def key(self, call) -> Tuple:
+        """Store key of a HicrepCall, with the fingerprints in sorted order"""
+        fingerprint1, fingerprint2 = sorted([self.fingerprint(call.file1), self.fingerprint(call.file2)])
+        return (fingerprint1, fingerprint2, call.resolution, call.h, call.dBPMax, call.bDownSample, call.chrom)
+
+    def read(self) -> pl.DataFrame:
+        if not self.path.exists():
+            return pl.DataFrame(schema = store_schema)
+        return pl.read_csv(self.path, separator = "\t", schema = store_schema)
+
+    def results(self) -> Dict[Tuple, float]:
+        """SCC by store key"""
+        key_columns = list(store_schema)[:7]
+        df = self.read()
+        return {row[:7]: row[-1] for row in df.select(key_columns + ["scc"]).iter_rows()}
+
+    def fill(self, callers: List) -> List:
+        """Set the SCC of callers found in the store, returning those that are not
+
+        Args:
+            callers (List[HicrepCall]): Comparisons to look up
+
+        Returns:
+            List[HicrepCall]: Comparisons not in the store, still to compute
+        """
+        # Imported here as hich.hicrep_combos imports this module
+        from hich.hicrep_combos import SCC
+
+        results = self.results()
+        missing = []
+        for call in callers:
+            key = self.key(call)
+            if key in results:
+                call.scc = SCC(results[key])
+            else:
+                missing.append(call)
+        return missing
+
+    def append(self, callers: List) -> None:
+        """Add computed comparisons to the store"""
+        rows = [self.key(call) + (str(call.file1), str(call.file2), call.scc) for call in callers]
+        df = pl.DataFrame(rows, orient = "row", schema = store_schema)
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        new = not self.path.exists()
+        with open(self.path, "ab") as file:
+            df.write_csv(file, separator = "\t", include_header = new)
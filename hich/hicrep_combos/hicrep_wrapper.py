@@ -1,5 +1,6 @@
 from hicrep.hicrep import sccByDiag
 from hicrep.utils import *
+from .hicrep_band import band_mean_filter, downsample
 import scipy.sparse as sp
 
 def cool2pixels(cool: cooler.api.Cooler):
@@ -148,7 +149,7 @@ def computeSCC(mS1: sp.coo_matrix,
                dMax: int,
                h: float,
                bDownSample: bool) -> float:
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    # See tests/test_hicrep_engine.py for unit tests
     # Compute scc score
     nDiags = mS1.shape[0] if dMax < 0 else min(dMax, mS1.shape[0])
     rho = np.full(nDiags, np.nan)
@@ -164,16 +165,16 @@ def computeSCC(mS1: sp.coo_matrix,
         size1 = m1.sum()
         size2 = m2.sum()
         if size1 > size2:
-            m1 = resample(m1, size2).astype(float)
+            m1 = downsample(m1, size2).astype(float)
         elif size2 > size1:
-            m2 = resample(m2, size1).astype(float)
+            m2 = downsample(m2, size1).astype(float)
     else:
         # just normalize by total contacts
         m1 = m1.astype(float) / n1
         m2 = m2.astype(float) / n2
     if h > 0:
         # apply smoothing
-        m1 = meanFilterSparse(m1, h)
-        m2 = meanFilterSparse(m2, h)
+        m1 = band_mean_filter(m1, h, nDiags)
+        m2 = band_mean_filter(m2, h, nDiags)
 
     return sccByDiag(m1, m2, nDiags)
\ No newline at end of file
@@ -63,4 +63,5 @@ def organize(fmt: str,
             if record2: splitter.write(output, record2)
         if i >= head:
             break
+    splitter.close()
 
@@ -1,5 +1,7 @@
+from hich.parse.pairs_batch_reader import PairsBatchReader
 from hich.parse.pairs_file import PairsFile
 from hich.parse.pairs_header import PairsHeader
+from hich.parse.pairs_parquet import pairs_to_parquet
 from hich.parse.pairs_parser import PairsParser, read_pairs
 from hich.parse.pairs_segment import PairsSegment
 from hich.parse.pairs_splitter import PairsSplitter
@@ -8,5 +10,5 @@ from hich.stats.compute_pairs_stats import compute_pairs_stats_on_path, compute_
 
 # Facilitates importing anything pairs-related
 
-__all__ = ['PairsFile', 'PairsHeader', 'PairsParser', 'read_pairs', 'PairsSegment', 'PairsSplitter', 'PairsClassifier',
+__all__ = ['PairsBatchReader', 'PairsFile', 'PairsHeader', 'pairs_to_parquet', 'PairsParser', 'read_pairs', 'PairsSegment', 'PairsSplitter', 'PairsClassifier',
            'compute_pairs_stats_on_path', 'compute_pairs_stats_on_path_list']
\ No newline at end of file
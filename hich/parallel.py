@@ -0,0 +1,59 @@
+"""Process pool helpers shared by hich commands"""
+
+from collections import deque
+from itertools import batched
+from multiprocessing import get_context
+from typing import Callable, Iterable, Iterator
+
+# See tests/test_parallel.py for unit tests
+
+def ordered_bounded_map(fn: Callable, tasks: Iterable, threads: int, window: int = None, chunksize: int = 1) -> Iterator:
+    """Yield fn(task) for each task in order, computed in a process pool with a bounded number of tasks in flight
+
+    Tasks are drawn from the iterable only as earlier results are yielded,
+    so at most window tasks (and their results) are held at once however
+    many tasks there are, and a task generator that reads its input lazily
+    (e.g. one chromosome sequence at a time) is never read far ahead of the
+    consumer. With chunksize > 1, tasks are sent to workers chunksize at a
+    time, and window counts chunks rather than tasks.
+
+    Workers are spawned rather than forked. A forked worker inherits a copy
+    of every lock in the parent, including those of the thread pools run by
+    Polars, BLAS and HDF5, and one held by another parent thread at the fork
+    is never released in the child, which can deadlock it. Spawned workers
+    start from a fresh interpreter, so fn and the tasks must be picklable.
+
+    Args:
+        fn (Callable): Function of one task, defined at module level
+        tasks (Iterable): Tasks, consumed lazily
+        threads (int): Worker processes. With 1 or fewer, tasks are run in this process.
+        window (int, optional): Maximum tasks (or chunks) in flight. Defaults to threads.
+        chunksize (int, optional): Tasks sent to a worker at once. Defaults to 1.
+
+    Returns:
+        Iterator: Results in the order of tasks
+    """
+    if threads <= 1:
+        yield from map(fn, tasks)
+        return
+
+    if chunksize > 1:
+        chunks = ((fn, chunk) for chunk in batched(tasks, chunksize))
+        for results in ordered_bounded_map(map_chunk, chunks, threads, window):
+            yield from results
+        return
+
+    window = window or threads
+    pending = deque()
+    with get_context("spawn").Pool(threads) as pool:
+        for task in tasks:
+            pending.append(pool.apply_async(fn, (task,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def map_chunk(task) -> list:
+    """Results of fn for each task in a (fn, chunk) tuple"""
+    fn, chunk = task
+    return [fn(t) for t in chunk]
@@ -16,6 +16,12 @@ class FileSplitter:
     def write(self, filename: str, record: object): ...
     """Write a record"""
 
+    def close(self):
+        """Close all handles, writing any records they buffer"""
+        for handle in self.handles.values():
+            if hasattr(handle, "close"):
+                handle.close()
+
     def __del__(self):
         """Remove a given file after the FileSplitter is destroyed"""
         if self.remove and Path(self.remove).exists():
@@ -0,0 +1,201 @@
+from hich.parse.pairs_parquet import is_pairs_parquet, read_pairs_parquet_header
+from itertools import islice
+from pathlib import PurePath
+from typing import Dict, Iterator, List, Union
+import polars as pl
+import smart_open
+import smart_open_with_pbgzip
+import sys
+import time
+
+# See tests/test_pairs_batch_reader.py for unit tests
+
+def read_pairs_buffer(buffer: bytes, schema: Dict[str, pl.DataType], select: List[str] = None) -> pl.DataFrame:
+    """Parse a buffer of complete tab-separated .pairs records into a DataFrame
+
+    Lines starting with '#' are skipped, so a buffer may include the header.
+    If select is given, only those columns are parsed.
+    """
+    return pl.read_csv(buffer,
+                       has_header = False,
+                       separator = "\t",
+                       schema = schema,
+                       # Without a header line, columns are selected by index
+                       columns = [i for i, col in enumerate(schema) if col in select] if select else None,
+                       quote_char = None,
+                       comment_prefix = "#",
+                       raise_if_empty = False)
+
+class PairsBatchReader:
+    """Stream a 4DN .pairs file as a sequence of Polars DataFrames
+
+    https://github.com/4dn-dcic/pairix/blob/master/pairs_format_specification.md
+
+    A single handle is opened (through smart_open, so .gz and other
+    compressed formats are decompressed on the fly) and kept open for the
+    lifetime of the reader. The header is read once. Each batch is collected
+    as up to batch_size raw newline-terminated lines, joined into a single
+    byte buffer and handed to Polars' native CSV parser, so no per-line
+    splitting happens in Python and the file is never rescanned from the top.
+
+    Columns default to pl.String to pass through verbatim on output. Use
+    schema_overrides to type specific columns, e.g. {"pos1": pl.Int64}.
+
+    Parquet files written by hich.parse.pairs_parquet.pairs_to_parquet are
+    read in batches of their row groups and cast to the same schema, so they
+    can be used in place of the text file. Only columns in select are read
+    from either format.
+    """
+
+    # Minimal columns given by the .pairs specification, used if the header
+    # contains no #columns: line
+    default_columns = ['readID', 'chrom1', 'pos1', 'chrom2', 'pos2', 'strand1', 'strand2']
+
+    def __init__(
+            self,
+            read_from: Union[str, PurePath, object],
+            batch_size: int = 1000000,
+            schema_overrides: Dict[str, pl.DataType] = None,
+            report_throughput: bool = False,
+            select: List[str] = None):
+        """Open the .pairs file and parse its header
+
+        Args:
+            read_from (Union[str, PurePath, object]): Path to open with smart_open, or an open binary handle such as sys.stdin.buffer
+            batch_size (int, optional): Maximum number of records per yielded DataFrame. Defaults to 1000000.
+            schema_overrides (Dict[str, pl.DataType], optional): Polars types for specific columns. Other columns are pl.String. Defaults to None.
+            report_throughput (bool, optional): Print records/sec for each batch to stderr. Defaults to False.
+            select (List[str], optional): Columns to include in each batch, in file order. Defaults to None (all columns).
+        """
+        assert batch_size > 0, f"PairsBatchReader batch_size must be positive but was {batch_size}"
+
+        self.read_from = read_from
+        self.batch_size = batch_size
+        self.schema_overrides = schema_overrides or {}
+        self.report_throughput = report_throughput
+        self.select = select
+        self.records_read = 0
+
+        is_path = isinstance(read_from, (str, PurePath))
+        self.parquet = None
+        if is_path and is_pairs_parquet(read_from):
+            import pyarrow.parquet as pq
+            self.parquet = pq.ParquetFile(read_from)
+            self.handle = None
+            self.owns_handle = False
+            self.read_parquet_header()
+        else:
+            self.handle = smart_open.open(read_from, "rb") if is_path else read_from
+            self.owns_handle = is_path
+            self.read_header()
+
+    def read_header(self) -> None:
+        """Read header lines up to the first data line
+
+        The first data line has already been consumed from the handle when
+        the header ends, so it is held in self.pending and emitted as the
+        first line of the first batch.
+        """
+        self.header_lines: List[str] = []
+        self.columns: List[str] = None
+        self.pending: List[bytes] = []
+
+        for line in self.handle:
+            if not line.startswith(b"#"):
+                if line.strip():
+                    self.pending.append(line)
+                break
+            line = line.decode("utf-8")
+            self.header_lines.append(line)
+            if line.startswith("#columns:"):
+                self.columns = line.split()[1:]
+
+        self.columns = self.columns or list(PairsBatchReader.default_columns)
+
+    def read_parquet_header(self) -> None:
+        """Read the .pairs header stored in Parquet metadata and the columns of the Parquet schema"""
+        self.header_lines = read_pairs_parquet_header(self.read_from).splitlines(keepends = True)
+        self.columns = self.parquet.schema_arrow.names
+        self.pending = []
+
+    def header(self, include_columns_line: bool = True) -> str:
+        """Return the raw header text
+
+        Args:
+            include_columns_line (bool, optional): If False, drop lines starting with #columns: so the caller can write a new one. Defaults to True.
+        """
+        return "".join(line for line in self.header_lines
+                       if include_columns_line or not line.startswith("#columns:"))
+
+    @property
+    def schema(self) -> Dict[str, pl.DataType]:
+        """Polars schema for each batch: pl.String unless overridden"""
+        return {col: self.schema_overrides.get(col, pl.String) for col in self.columns}
+
+    def parse_batch(self, buffer: bytes) -> pl.DataFrame:
+        """Parse a buffer of complete tab-separated .pairs records into a DataFrame"""
+        return read_pairs_buffer(buffer, self.schema, self.select)
+
+    def iter_parquet(self) -> Iterator[pl.DataFrame]:
+        """Yield batches from a Parquet file, cast to self.schema"""
+        schema = self.schema
+        if self.select:
+            schema = {col: dtype for col, dtype in schema.items() if col in self.select}
+        start = time.perf_counter()
+        for batch in self.parquet.iter_batches(batch_size = self.batch_size, columns = list(schema)):
+            df = pl.from_arrow(batch).cast(schema)
+            self.records_read += len(df)
+            if self.report_throughput:
+                elapsed = time.perf_counter() - start
+                rate = len(df) / elapsed if elapsed > 0 else float('inf')
+                print(f"Read {len(df)} records in {elapsed:.3f}s ({rate:,.0f} records/s, {self.records_read} total) from {self.read_from}",
+                      file = sys.stderr)
+            if not df.is_empty():
+                yield df
+            start = time.perf_counter()
+
+    def __iter__(self) -> Iterator[pl.DataFrame]:
+        if self.parquet is not None:
+            yield from self.iter_parquet()
+            return
+
+        while True:
+            start = time.perf_counter()
+
+            # Collect up to batch_size raw lines, including any line left
+            # pending from parsing the header
+            lines = self.pending + list(islice(self.handle, self.batch_size - len(self.pending)))
+            self.pending = []
+            if not lines:
+                break
+
+            # Guarantee the final record is newline-terminated before parsing
+            if not lines[-1].endswith(b"\n"):
+                lines[-1] += b"\n"
+            df = self.parse_batch(b"".join(lines))
+            self.records_read += len(df)
+
+            if self.report_throughput:
+                elapsed = time.perf_counter() - start
+                rate = len(df) / elapsed if elapsed > 0 else float('inf')
+                print(f"Read {len(df)} records in {elapsed:.3f}s ({rate:,.0f} records/s, {self.records_read} total) from {self.read_from}",
+                      file = sys.stderr)
+
+            if not df.is_empty():
+                yield df
+
+            if len(lines) < self.batch_size:
+                break
+
+    def close(self) -> None:
+        """Close the handle if this reader opened it"""
+        if self.owns_handle and not self.handle.closed:
+            self.handle.close()
+        if self.parquet is not None:
+            self.parquet.close()
+
+    def __enter__(self) -> "PairsBatchReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
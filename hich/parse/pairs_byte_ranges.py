@@ -0,0 +1,187 @@
+"""
+Split a .pairs file into byte ranges that can be parsed independently.
+
+Ranges are defined on the file as stored on disk: byte offsets for plaintext,
+or offsets of BGZF blocks for bgzip-compressed files, so that a reader can
+seek straight to its range without decompressing anything before it.
+
+Range boundaries generally fall in the middle of a record. Records are
+assigned to ranges with the following rule, which requires no lookbehind:
+the reader for range [start, end) discards everything up to and including
+the first newline at or after start (unless start is 0), then keeps reading
+past end until it has consumed the first newline at or after end. The
+discarded prefix of one range is therefore exactly the suffix read by the
+previous range, so every record is read exactly once.
+"""
+
+from hich.parse.pairs_parquet import parquet_magic
+from pathlib import Path, PurePath
+from typing import BinaryIO, Iterator, List, Tuple, Union
+import struct
+import zlib
+
+# See tests/test_pairs_byte_ranges.py for unit tests
+
+# BGZF is gzip with an extra field "BC" holding the compressed block size
+# https://samtools.github.io/hts-specs/SAMv1.pdf section 4.1
+gzip_magic = b"\x1f\x8b\x08"
+bgzf_magic = b"\x1f\x8b\x08\x04"
+compressed_magic = [gzip_magic[:2], b"BZh", b"\xfd7zXZ", b"\x28\xb5\x2f\xfd"]
+
+def read_bgzf_block(handle: BinaryIO) -> bytes | None:
+    """Read and decompress the BGZF block at the handle's position
+
+    Returns:
+        bytes | None: Decompressed block contents, or None at EOF or if no valid BGZF block starts here
+    """
+    fixed = handle.read(12)
+    if len(fixed) < 12 or not fixed.startswith(bgzf_magic):
+        return None
+    xlen = struct.unpack("<H", fixed[10:12])[0]
+    extra = handle.read(xlen)
+
+    # Find the BC subfield holding the total block size minus 1
+    bsize = None
+    i = 0
+    while i + 4 <= len(extra):
+        si, slen = extra[i:i+2], struct.unpack("<H", extra[i+2:i+4])[0]
+        if si == b"BC" and slen == 2:
+            bsize = struct.unpack("<H", extra[i+4:i+6])[0]
+        i += 4 + slen
+    if bsize is None:
+        return None
+
+    rest = handle.read(bsize + 1 - 12 - xlen)
+    if len(rest) < 8:
+        return None
+    cdata, crc, isize = rest[:-8], *struct.unpack("<II", rest[-8:])
+    try:
+        data = zlib.decompress(cdata, -15)
+    except zlib.error:
+        return None
+    if len(data) != isize or zlib.crc32(data) != crc:
+        return None
+    return data
+
+def is_bgzf(path: Union[str, PurePath]) -> bool:
+    """Whether the file starts with a valid BGZF block"""
+    with open(path, "rb") as handle:
+        return read_bgzf_block(handle) is not None
+
+def is_splittable(path: Union[str, PurePath]) -> bool:
+    """Whether byte ranges of the file can be read independently (plaintext or BGZF)"""
+    with open(path, "rb") as handle:
+        start = handle.read(4)
+    if start == parquet_magic:
+        return False
+    return is_bgzf(path) or not any(start.startswith(magic) for magic in compressed_magic)
+
+def next_bgzf_block(handle: BinaryIO, offset: int, window: int = 1 << 18) -> int:
+    """Offset of the first valid BGZF block starting at or after offset, or the file size if there is none
+
+    Candidate offsets are found by searching for the BGZF magic bytes and are
+    confirmed by decompressing the block and checking its CRC, so a match
+    inside compressed data is not mistaken for a block boundary.
+    """
+    size = handle.seek(0, 2)
+    while offset < size:
+        handle.seek(offset)
+        buffer = handle.read(window + len(bgzf_magic))
+        found = buffer.find(bgzf_magic)
+        while found != -1 and found < window:
+            handle.seek(offset + found)
+            if read_bgzf_block(handle) is not None:
+                return offset + found
+            found = buffer.find(bgzf_magic, found + 1)
+        offset += window
+    return size
+
+def pairs_byte_ranges(path: Union[str, PurePath], n_ranges: int) -> List[Tuple[int, int]]:
+    """Split a plaintext or BGZF file into up to n_ranges (start, end) byte ranges
+
+    For BGZF files every start and end is the offset of a block boundary.
+    """
+    size = Path(path).stat().st_size
+    approximate = [size * i // n_ranges for i in range(n_ranges)]
+    if is_bgzf(path):
+        with open(path, "rb") as handle:
+            starts = [next_bgzf_block(handle, offset) for offset in approximate]
+    else:
+        starts = approximate
+    boundaries = sorted(set(starts + [size]))
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def _plaintext_blocks(handle: BinaryIO, start: int, end: int, block_size: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, data) reads from start, never letting a read cross end"""
+    handle.seek(start)
+    offset = start
+    while True:
+        size = min(block_size, end - offset) if offset < end else block_size
+        data = handle.read(size)
+        if not data:
+            return
+        yield offset, data
+        offset += len(data)
+
+def _bgzf_blocks(handle: BinaryIO, start: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, decompressed data) for each BGZF block from start"""
+    handle.seek(start)
+    while True:
+        offset = handle.tell()
+        data = read_bgzf_block(handle)
+        if data is None:
+            return
+        yield offset, data
+
+def read_byte_range(path: Union[str, PurePath],
+                    start: int,
+                    end: int,
+                    bgzf: bool = None,
+                    buffer_size: int = 1 << 26) -> Iterator[bytes]:
+    """Yield newline-terminated buffers of the records assigned to the byte range [start, end)
+
+    Args:
+        path (Union[str, PurePath]): Plaintext or BGZF file
+        start (int): Start of the range; a BGZF block boundary for BGZF files
+        end (int): End of the range; a BGZF block boundary or the file size for BGZF files
+        bgzf (bool, optional): Whether the file is BGZF. Detected if None. Defaults to None.
+        buffer_size (int, optional): Approximate size in bytes of yielded buffers. Defaults to 64 MiB.
+
+    Header lines are not removed if start is 0.
+    """
+    bgzf = is_bgzf(path) if bgzf is None else bgzf
+    with open(path, "rb") as handle:
+        blocks = _bgzf_blocks(handle, start) if bgzf else _plaintext_blocks(handle, start, end, buffer_size)
+
+        # bytearray so that appending many small BGZF blocks stays linear
+        carry = bytearray()
+        skipping = start > 0
+        for offset, data in blocks:
+            if offset >= end:
+                # Past the end of the range: finish the final record
+                if skipping:
+                    break
+                newline = data.find(b"\n")
+                if newline != -1:
+                    carry += data[:newline + 1]
+                    break
+                carry += data
+                continue
+
+            if skipping:
+                # The partial record at the start belongs to the previous range
+                newline = data.find(b"\n")
+                if newline == -1:
+                    continue
+                data = data[newline + 1:]
+                skipping = False
+
+            carry += data
+            if len(carry) >= buffer_size:
+                cut = carry.rfind(b"\n") + 1
+                if cut:
+                    yield bytes(carry[:cut])
+                    del carry[:cut]
+
+        if carry:
+            yield bytes(carry) if carry.endswith(b"\n") else bytes(carry) + b"\n"
@@ -3,6 +3,8 @@ from smart_open import smart_open
 from hich.parse.pairs_header import PairsHeader
 from hich.parse.pairs_segment import PairsSegment
 from pathlib import PurePath, Path
+from typing import Iterable, List, Union
+import polars as pl
 
 @dataclass
 class PairsFile:
@@ -15,27 +17,35 @@ class PairsFile:
     filepath_or_object: str = None
     mode: str = None
     header: PairsHeader = PairsHeader()
+    write_buffer_size: int = 1 << 20
 
     def __init__(
             self, 
             filepath_or_object: Union[str, PurePath], 
             mode: str = "rt", 
-            header: PairsHeader = None):
+            header: PairsHeader = None,
+            write_buffer_size: int = 1 << 20):
         """Create a PairsFile object to facilitate parsing 4DN .pairs
 
         Args:
             filepath_or_object (Union[str, PurePath]): String or Path to parse
             mode (str, optional): open mode. Defaults to "rt".
             header (PairsHeader, optional): substitute a preconstructed PairsHeader; constructed from file if None. Defaults to None.
+            write_buffer_size (int, optional): Approximate number of characters of records to buffer before writing them to the file. Defaults to 1 MiB.
         """
+        self.write_buffer_size = write_buffer_size
+        self.write_buffer: List[str] = []
+        self.write_buffer_length = 0
         self.open(filepath_or_object, mode, header)
 
     def __del__(self) -> None:
         self.close()
 
     def close(self) -> None:
-        """Close any open file
+        """Write any buffered records and close any open file
         """
+        if not getattr(self.filepath_or_object, "closed", True):
+            self.flush()
         if hasattr(self.filepath_or_object, "close"):
             self.filepath_or_object.close()
 
@@ -72,12 +82,20 @@ class PairsFile:
             self.read_header(header)
         elif "w" in self.mode or "a" in self.mode:
             self.header = header
+            self.columns = tuple(header.columns) if header else ()
+            if header and not self.columns:
+                # Headers constructed from text alone, e.g. PairsHeader(text = ...), have no parsed columns
+                self.columns = next((tuple(line.split()[1:]) for line in header.to_string().splitlines() if line.startswith("#columns:")), ())
 
             # Write the header if the file is empty
             at_start = self.filepath_or_object.seekable() and self.filepath_or_object.tell() == 0
             file_is_empty = ("a" in self.mode and at_start) or "w" in self.mode
             if file_is_empty:
-                self.filepath_or_object.write(self.header.to_string())
+                # Records are newline-terminated, so the header must end with a newline
+                header_text = self.header.to_string()
+                if header_text and not header_text.endswith("\n"):
+                    header_text += "\n"
+                self.filepath_or_object.write(header_text)
 
     def read_header(self, header: PairsHeader = None) -> PairsHeader:
         """_summary_
@@ -135,13 +153,11 @@ class PairsFile:
             raise StopIteration
         fields = stripped.split()
 
-        # Map the values ("fields") to the column names ("self.indexed_columns")
-        field_vals = {self.indexed_columns[idx]: val for idx, val in enumerate(fields)}
-
-        return PairsSegment(**field_vals)
+        # Assign the values ("fields") to the columns of the file
+        return PairsSegment.from_fields(self.columns, fields)
 
     def __iter__(self):
-        self.indexed_columns = dict(enumerate(self.header.columns))
+        self.columns = tuple(self.header.columns)
         return self
 
     def __next__(self):
@@ -178,5 +194,46 @@ class PairsFile:
             if record_number == 0:
                 return line
 
-    def write(self, pairs_segment: PairsSegment):
-        self.filepath_or_object.write("\n" + pairs_segment.to_string())
+    def write(self, pairs_segment: PairsSegment) -> None:
+        """Buffer a record to be written to the file
+
+        Args:
+            pairs_segment (PairsSegment): Record to write as a newline-terminated line of the header's columns, or of all its columns if the header has none
+        """
+        self.buffer_text(pairs_segment.to_string(self.columns) + "\n")
+
+    def write_batch(self, records: Union[Iterable[PairsSegment], pl.DataFrame]) -> None:
+        """Buffer a batch of records to be written to the file
+
+        Args:
+            records (Union[Iterable[PairsSegment], pl.DataFrame]): PairsSegments, or a DataFrame. If the header
+                defines columns, the DataFrame's columns are written in the header's order and it must have all of them.
+                Otherwise they are written in the DataFrame's order.
+
+        Raises:
+            ValueError: If the DataFrame is missing columns of the header
+        """
+        if isinstance(records, pl.DataFrame):
+            if self.columns:
+                missing = [col for col in self.columns if col not in records.columns]
+                if missing:
+                    raise ValueError(f"PairsFile write_batch DataFrame is missing columns {missing} of the header columns {list(self.columns)}")
+                records = records.select(self.columns)
+            text = records.write_csv(separator = "\t", include_header = False, quote_style = "never")
+        else:
+            text = "".join([record.to_string(self.columns) + "\n" for record in records])
+        self.buffer_text(text)
+
+    def buffer_text(self, text: str) -> None:
+        """Buffer newline-terminated records, writing the buffer to the file once it is full"""
+        self.write_buffer.append(text)
+        self.write_buffer_length += len(text)
+        if self.write_buffer_length >= self.write_buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered records to the file in a single write"""
+        if self.write_buffer:
+            self.filepath_or_object.write("".join(self.write_buffer))
+            self.write_buffer.clear()
+            self.write_buffer_length = 0
@@ -0,0 +1,131 @@
+from pathlib import PurePath
+from typing import Union
+import polars as pl
+import shutil
+import smart_open
+import smart_open_with_pbgzip
+import subprocess
+
+# See tests/test_pairs_output.py for unit tests
+
+bgzf_suffixes = (".gz", ".gzip", ".bgz")
+
+class PairsOutput:
+    """Binary output stream for .pairs text, block-gzipped (BGZF) by file extension
+
+    Paths ending in .gz, .gzip or .bgz are written as BGZF, which gzip tools
+    read and pairix/tabix can index. Compression runs outside Python: in
+    bgzip -@ threads or pbgzip -n threads if either is on the PATH, and
+    otherwise in htslib's BGZF writer via pysam. Other paths are opened with
+    smart_open.
+
+    Batches are written with write_frame, which streams Polars' write_csv
+    output into the compressor without building an intermediate string.
+
+    If index is True, close builds a pairix index (.px2) if pairix is on the
+    PATH, and otherwise a tabix index (.tbi) on chrom1 and pos1. Either needs
+    BGZF output sorted by chrom1 and pos1.
+    """
+    def __init__(self,
+                 path: Union[str, PurePath],
+                 threads: int = 1,
+                 index: bool = False):
+        """Open the output
+
+        Args:
+            path (Union[str, PurePath]): Output path
+            threads (int, optional): Compression threads for BGZF output. Defaults to 1.
+            index (bool, optional): Index the output when closed. Defaults to False.
+        """
+        self.path = str(path)
+        self.threads = max(threads, 1)
+        self.index = index
+        self.process = None
+        self.stdout = None
+
+        if not self.path.endswith(bgzf_suffixes):
+            assert not index, f"Cannot index {self.path}: indexed .pairs output must be bgzipped (.gz)"
+            self.handle = smart_open.open(self.path, "wb")
+        elif command := PairsOutput.bgzip_command(self.threads):
+            self.stdout = open(self.path, "wb")
+            self.process = subprocess.Popen(command, stdin = subprocess.PIPE, stdout = self.stdout)
+            self.handle = self.process.stdin
+        else:
+            import pysam
+            self.handle = pysam.BGZFile(self.path, "wb")
+
+    @staticmethod
+    def bgzip_command(threads: int):
+        """Command for an external multi-threaded BGZF compressor writing stdin to stdout, or None"""
+        if shutil.which("bgzip"):
+            return ["bgzip", "-@", str(threads), "-c"]
+        if shutil.which("pbgzip"):
+            return ["pbgzip", "-n", str(threads), "-c"]
+        return None
+
+    def write(self, text: Union[str, bytes]) -> None:
+        self.handle.write(text.encode("utf-8") if isinstance(text, str) else text)
+
+    def write_frame(self, df: pl.DataFrame) -> None:
+        """Write the records of a DataFrame as tab-separated lines without a header"""
+        df.write_csv(self.handle,
+                     include_header = False,
+                     separator = "\t",
+                     quote_style = "never")
+
+    @property
+    def closed(self) -> bool:
+        return self.handle is None
+
+    def close(self) -> None:
+        """Finish writing, wait for the compressor to exit, and build the index if requested"""
+        if self.handle is None:
+            return
+        self.handle.close()
+        self.handle = None
+        if self.process is not None:
+            returncode = self.process.wait()
+            self.stdout.close()
+            if returncode != 0:
+                raise Exception(f"{self.process.args[0]} exited with code {returncode} while writing {self.path}")
+        if self.index:
+            index_pairs(self.path)
+
+    def __enter__(self) -> "PairsOutput":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+def index_pairs(path: Union[str, PurePath]) -> str:
+    """Index a bgzipped .pairs file sorted by chrom1 and pos1
+
+    Uses pairix if it is on the PATH, giving a 2D-queryable .px2 index, and
+    otherwise builds a tabix index on chrom1 and pos1 with pysam.
+
+    Args:
+        path (Union[str, PurePath]): Bgzipped .pairs file
+
+    Returns:
+        str: Path to the index
+    """
+    from hich.parse.pairs_batch_reader import PairsBatchReader
+
+    path = str(path)
+    if shutil.which("pairix"):
+        subprocess.run(["pairix", "-f", "-p", "pairs", path], check = True)
+        return path + ".px2"
+
+    import pysam
+    with PairsBatchReader(path) as reader:
+        columns = reader.columns
+    chrom1 = "chrom1" if "chrom1" in columns else "chr1"
+    try:
+        return pysam.tabix_index(path,
+                                 force = True,
+                                 seq_col = columns.index(chrom1),
+                                 start_col = columns.index("pos1"),
+                                 end_col = columns.index("pos1"),
+                                 meta_char = "#")
+    except OSError as e:
+        raise Exception(f"Could not index {path}, which must be bgzipped and sorted by chrom1 and pos1: {e}") from e
@@ -0,0 +1,91 @@
+"""
+Typed Parquet copies of 4DN .pairs files.
+
+A .pairs file converted with pairs_to_parquet stores chromosome, strand and
+pair_type columns dictionary-encoded (pl.Categorical), positions as Int64 and
+other columns as String, in row groups of up to row_group_size records. The
+raw .pairs header is kept in the Parquet key-value metadata under
+pairs_header, so the text file can be reproduced.
+
+PairsBatchReader reads these files like text .pairs files. pl.scan_parquet
+gives a LazyFrame for queries that benefit from projection and predicate
+pushdown, such as selecting a subset of columns or chromosomes.
+"""
+
+from pathlib import PurePath
+from typing import Dict, List, Union
+import polars as pl
+
+# See tests/test_pairs_parquet.py for unit tests
+
+parquet_magic = b"PAR1"
+header_metadata_key = b"pairs_header"
+
+# Columns stored with a type other than String
+categorical_columns = ["chrom1", "chrom2", "chr1", "chr2", "strand1", "strand2", "pair_type"]
+integer_columns = ["pos1", "pos2"]
+
+def is_pairs_parquet(path: Union[str, PurePath]) -> bool:
+    """Whether the path is a Parquet file (such as one written by pairs_to_parquet)"""
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(parquet_magic)) == parquet_magic
+    except (OSError, TypeError):
+        return False
+
+def pairs_parquet_schema(columns: List[str]) -> Dict[str, pl.DataType]:
+    """Polars types for each column of a .pairs file when stored as Parquet"""
+    return {col: pl.Categorical if col in categorical_columns
+                 else pl.Int64 if col in integer_columns
+                 else pl.String
+            for col in columns}
+
+def read_pairs_parquet_header(path: Union[str, PurePath]) -> str:
+    """Raw .pairs header stored in the metadata of a Parquet file, or "" if there is none"""
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(path).metadata or {}
+    return metadata.get(header_metadata_key, b"").decode("utf-8")
+
+def pairs_to_parquet(read_from: Union[str, PurePath, object],
+                     parquet_path: Union[str, PurePath],
+                     row_group_size: int = 1000000,
+                     report_throughput: bool = False) -> int:
+    """Convert a .pairs file to a typed Parquet file
+
+    Args:
+        read_from (Union[str, PurePath, object]): .pairs file to read with PairsBatchReader
+        parquet_path (Union[str, PurePath]): Parquet file to write
+        row_group_size (int, optional): Records per row group. Defaults to 1000000.
+        report_throughput (bool, optional): Print records/sec for each batch to stderr. Defaults to False.
+
+    Returns:
+        int: Number of records written
+    """
+    import pyarrow.parquet as pq
+    from hich.parse.pairs_batch_reader import PairsBatchReader
+
+    # A global string cache shares one categorical encoding across batches
+    with pl.StringCache(), PairsBatchReader(read_from,
+                                            batch_size = row_group_size,
+                                            schema_overrides = {col: pl.Int64 for col in integer_columns},
+                                            report_throughput = report_throughput) as reader:
+        schema = pairs_parquet_schema(reader.columns)
+        metadata = {header_metadata_key: reader.header().encode("utf-8")}
+        writer = None
+        try:
+            for df in reader:
+                table = df.cast(schema).to_arrow()
+                if writer is None:
+                    writer = pq.ParquetWriter(parquet_path, table.schema.with_metadata(metadata))
+                writer.write_table(table, row_group_size = row_group_size)
+
+            if writer is None:
+                # No records, but keep the columns and header
+                table = pl.DataFrame(schema = schema).to_arrow()
+                writer = pq.ParquetWriter(parquet_path, table.schema.with_metadata(metadata))
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return reader.records_read
@@ -8,11 +8,15 @@ import smart_open
 import smart_open_with_pbgzip
 import sys
 import warnings
+from hich.parse.pairs_batch_reader import PairsBatchReader, read_pairs_buffer
+from hich.parse.pairs_output import PairsOutput
+from hich.parse.pairs_schema import PairsSchema
 
 def read_pairs(read_from, 
 batch_size: int = 10000, 
 yield_columns_line: bool = True, 
-exception_on_4dn_violation: bool = True) -> Union[str, pl.DataFrame]:
+exception_on_4dn_violation: bool = True,
+typed: bool = False) -> Union[str, pl.DataFrame]:
     """
     Generator that reads 4DN .pairs format in batches.
     https://github.com/4dn-dcic/pairix/blob/master/pairs_format_specification.md
@@ -24,10 +28,21 @@ exception_on_4dn_violation: bool = True) -> Union[str, pl.DataFrame]:
 
     Subsequent yielded items are Polars DataFrames containing up to
     batch_size .pairs records. The fields will be named according to the
-    #columns: line, whether or not yield_columns_line is True or False. All
-    types will be strings.
+    #columns: line, whether or not yield_columns_line is True or False. By
+    default, all types will be strings.
+
+    If typed is True, each batch is instead parsed by read_pairs_buffer, as
+    PairsBatchReader does, with column types from PairsSchema.polars_schema:
+    pos1 and pos2 are Int64, chromosomes are Categorical and other columns
+    are String. Records must then be tab-separated, as the spec requires,
+    rather than separated by any whitespace. Wrap iteration in
+    pl.StringCache() to share one categorical encoding across batches.
+
+    The typed schema is opt-in rather than the default so that existing
+    callers keep getting all-String batches, split on any whitespace, and
+    don't need a string cache to concatenate batches.
     """
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    # See tests/test_read_pairs.py for unit tests
     # Used to accumulate header lines or records for a batch
     header_lines = []
     records = []
@@ -61,7 +76,7 @@ exception_on_4dn_violation: bool = True) -> Union[str, pl.DataFrame]:
             # whitespace-separated strings as column names, with String type
             # for the polars schema. Add the line to the header lines.
             columns = line.split()[1:]
-            schema = {col: pl.String for col in columns}
+            schema = PairsSchema.polars_schema(columns) if typed else {col: pl.String for col in columns}
 
             if yield_columns_line:
                 # We give the option not to add #columns: lines into the header
@@ -83,8 +98,9 @@ exception_on_4dn_violation: bool = True) -> Union[str, pl.DataFrame]:
                 ))
 
             # We are in the data entries now, so split the entries into individual
-            # fields and accumulate in the growing batch.
-            records.append(line.split())
+            # fields and accumulate in the growing batch. Typed batches keep
+            # the raw line for read_pairs_buffer to parse.
+            records.append(line if typed else line.split())
 
             if header_lines is not None:
                 # header_lines is a list prior to finding the first data entry.
@@ -99,13 +115,25 @@ exception_on_4dn_violation: bool = True) -> Union[str, pl.DataFrame]:
                 # We have reached the target batch size, so build a dataframe
                 # with the accumulated records and yield it as the latest batch.
                 # Then reset the records to start accumulating another batch.
-                result = pl.DataFrame(records, orient='row', schema=schema)
+                result = records_frame(records, schema, typed)
                 records = []
                 yield result
     if records:
         # If we have accumulated a partial batch when we run out of records,
         # yield them in a final partial batch.
-        yield pl.DataFrame(records, orient='row', schema=schema)
+        yield records_frame(records, schema, typed)
+
+def records_frame(records, schema, typed = False) -> pl.DataFrame:
+    """Build a batch DataFrame from records accumulated by read_pairs
+
+    Records are raw lines if typed is True, otherwise lists of fields.
+    """
+    if typed:
+        buffer = "".join(records)
+        if not buffer.endswith("\n"):
+            buffer += "\n"
+        return read_pairs_buffer(buffer.encode("utf-8"), schema)
+    return pl.DataFrame(records, orient='row', schema=schema)
 
 # !Warning: this class has no specific unit test as of 2024/10/20 - Ben Skubi
 class PairsParser:
@@ -143,46 +171,32 @@ class PairsParser:
     def header(self):
         """Returns list of all lines starting with '#' until but not including the first line not starting with '#'
         """
-        header = []
-        with smart_open.open(self.filename, "rt", encoding="utf-8") as file:
-            for line in file:
-                if line.startswith('#'):
-                    header.append(line)
-                else:
-                    break
-        return header
-
-    def batch_iter(self, n_rows):
-        def read_chunk(skip_rows, columns):
-            return pl.read_csv(self.filename,
-                             skip_rows = skip_rows,
-                             n_rows = n_rows,
-                             raise_if_empty = False,
-                             separator = '\t',
-                             has_header = False,
-                             new_columns = columns,
-                             dtypes = {"readID":pl.String,
-                                       "chrom1":pl.String,
-                                       "chrom2":pl.String})
-            
-        columns_row, columns = self.columns_row()
-
-        skip_rows = columns_row + 1
-        with open(self.filename) as file:
-            df = read_chunk(skip_rows, columns)
-            skip_rows += len(df)
-            yield df
-            while len(df) == n_rows:
-                df = read_chunk(skip_rows, columns)
-                skip_rows += len(df)
-                if not df.is_empty():
-                    yield df
-
-    def write_append(self, filename, df = None, header_end = None):
+        # PairsBatchReader also reads the header stored in Parquet copies of .pairs files
+        with PairsBatchReader(self.filename) as reader:
+            return list(reader.header_lines)
+
+    def batch_iter(self, n_rows, report_throughput = False):
+        """Yield DataFrames of up to n_rows records from a single pass over the file
+
+        pos1 and pos2 are parsed as Int64, all other columns are kept as String.
+        """
+        with PairsBatchReader(self.filename,
+                              batch_size = n_rows,
+                              schema_overrides = {"pos1": pl.Int64, "pos2": pl.Int64},
+                              report_throughput = report_throughput) as reader:
+            yield from reader
+
+    def write_append(self, filename, df = None, header_end = None, threads = 1, index = False):
+        """Append a batch to the output, writing the header first
+
+        Output to a .gz path is bgzipped outside Python (see PairsOutput),
+        using threads compression threads. If index is True, the output
+        is indexed when closed.
+        """
         warnings.filterwarnings("ignore", message="Polars found a filename")
 
         if self.write_file is None:
-            self.write_file = smart_open.open(filename, "w")
+            self.write_file = PairsOutput(filename, threads, index)
             header_no_columns = self.header()[:-1]
             final_header_line_fields = header_no_columns[-1].split()
             
@@ -200,13 +214,7 @@ class PairsParser:
             self.write_file.write(header)
 
         if df is not None:
-            buffer = io.StringIO()
-            df.write_csv(buffer,
-                        include_header = False,
-                        separator = '\t')
-            buffer.seek(0)
-            self.write_file.write(buffer.getvalue())
-            buffer.close()
+            self.write_file.write_frame(df)
 
     def close(self):
         if self.write_file is not None:
@@ -19,4 +19,22 @@ class PairsSchema:
 
     @classmethod
     def common_unofficial_colnames(cls):
-        return list(PairsSchema.synonyms.keys())
\ No newline at end of file
+        return list(PairsSchema.synonyms.keys())
+
+    @classmethod
+    def polars_schema(cls, column_names, categorical_chroms = True):
+        """Polars schema for .pairs columns: reserved int columns as Int64,
+        chromosomes as Categorical (or String), and all others as String
+        """
+        import polars as pl
+
+        schema = {}
+        for name in column_names:
+            official = PairsSchema.make_official(name)
+            if PairsSchema.reserved.get(official) is int:
+                schema[name] = pl.Int64
+            elif categorical_chroms and official in ["chr1", "chr2"]:
+                schema[name] = pl.Categorical
+            else:
+                schema[name] = pl.String
+        return schema
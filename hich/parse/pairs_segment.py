@@ -1,60 +1,134 @@
-import time
+from typing import List, Sequence
 
 # See tests/test_pairs_segment.py for unit tests
 
 class PairsSegment:
+    """A .pairs record with its columns accessible as attributes, e.g. record.chr1
+
+    The reserved .pairs columns are stored in slots, with chrom1/chrom2 and
+    chr1/chr2 sharing a slot rather than being stored twice. pos1 and pos2
+    are kept as parsed and converted to int on first access. Other columns,
+    and attributes set later (e.g. record.cellID = "A"), are stored in the
+    record's __dict__. Properties such as distance take precedence over
+    columns of the same name.
+    """
     reserved = {"readID": str, "chr1": str, "pos1": int,
                 "chr2": str, "pos2": int, "strand1": str, "strand2": str}
     required = {"chr1": str, "pos1": int, "chr2": str, "pos2": int}
     alt = {"chrom1":"chr1", "chrom2":"chr2"}
 
+    # Slot storing each reserved column
+    slot_names = {"readID": "readID", "chr1": "chr1", "chrom1": "chr1", "pos1": "_pos1",
+                  "chr2": "chr2", "chrom2": "chr2", "pos2": "_pos2", "strand1": "strand1", "strand2": "strand2"}
+
+    __slots__ = ("readID", "chr1", "_pos1", "chr2", "_pos2", "strand1", "strand2", "_columns", "__dict__")
+
     def __init__(self, **kwargs):
-        self.__dict__ = kwargs
-        self.cast_reserved()
-        self.alt_to_main()
-    
-    def cast_reserved(self):
-        self.pos1 = int(self.pos1) if "pos1" in self.__dict__ else 0
-        self.pos2 = int(self.pos2) if "pos2" in self.__dict__ else 0
-    
-    def alt_to_main(self):
-        for alt, main in PairsSegment.alt.items():
-            # Access self.__dict__ directly for faster lookups
-            alt_val = self.__dict__.get(alt)
-            main_val = self.__dict__.get(main)
-
-            if alt_val is None and main_val is not None:
-                self.__dict__[alt] = main_val
-            elif main_val is None and alt_val is not None:
-                self.__dict__[main] = alt_val
-    
+        self._set_fields(tuple(kwargs), list(kwargs.values()))
+
+    @classmethod
+    def from_fields(cls, columns: Sequence[str], fields: List) -> "PairsSegment":
+        """Construct a record from the column names of a .pairs file and the fields of one of its lines
+
+        Args:
+            columns (Sequence[str]): Column names, ideally one tuple shared by all records of the file
+            fields (List): Values of the columns. Columns without a value (on a truncated line) are left unset.
+
+        Returns:
+            PairsSegment: The record
+        """
+        segment = cls.__new__(cls)
+        segment._set_fields(columns, fields)
+        return segment
+
+    def _set_fields(self, columns: Sequence[str], fields: List) -> None:
+        self._columns = columns
+        extras = self.__dict__
+        slot_names = PairsSegment.slot_names
+        for column, field in zip(columns, fields):
+            slot = slot_names.get(column)
+            if slot:
+                setattr(self, slot, field)
+            else:
+                extras[column] = field
+
+    @property
+    def pos1(self):
+        try:
+            value = self._pos1
+        except AttributeError:
+            return 0
+        if type(value) is not int:
+            value = self._pos1 = int(value)
+        return value
+
+    @pos1.setter
+    def pos1(self, value):
+        self._pos1 = int(value)
+
+    @property
+    def pos2(self):
+        try:
+            value = self._pos2
+        except AttributeError:
+            return 0
+        if type(value) is not int:
+            value = self._pos2 = int(value)
+        return value
+
+    @pos2.setter
+    def pos2(self, value):
+        self._pos2 = int(value)
+
+    @property
+    def chrom1(self): return self.chr1
+
+    @chrom1.setter
+    def chrom1(self, value): self.chr1 = value
+
+    @property
+    def chrom2(self): return self.chr2
+
+    @chrom2.setter
+    def chrom2(self, value): self.chr2 = value
+
+    def _get(self, name: str):
+        """Value of a column, or _unset if the record has none"""
+        if name in ["pos1", "pos2"]:
+            return getattr(self, name)
+        slot = PairsSegment.slot_names.get(name)
+        if slot:
+            return getattr(self, slot, _unset)
+        return self.__dict__.get(name, _unset)
 
     def to_dict(self, columns = None):
         if columns:
-            return {c:self.__dict__[c] for c in columns if c in self.__dict__}
+            values = {c:self._get(c) for c in columns}
         else:
-            reserved = {k:self.__dict__[k] for k in PairsSegment.reserved
-                 if k in self.__dict__}
-            non_reserved = {k:v for k, v in self.__dict__.items()
-                    if k not in PairsSegment.alt
-                    and k not in reserved}
-            reserved.update(non_reserved)
-            return reserved
+            # Reserved columns in order using the names chr1/chr2, then the others.
+            # pos1 and pos2 are always included, defaulting to 0.
+            names = [PairsSegment.alt.get(c, c) for c in self._columns] + list(self.__dict__)
+            values = {k:self._get(k) for k in PairsSegment.reserved}
+            values.update({k:self._get(k) for k in names if k not in values})
+        return {k:v for k, v in values.items() if v is not _unset}
 
     def to_string(self, columns = None):
-        return "\t".join(str(v) for v in self.to_dict(columns).values())
+        if columns:
+            # Values of the given columns in order, skipping any the record has no value for
+            return "\t".join([str(v) for v in map(self._get, columns) if v is not _unset])
+        return "\t".join(str(v) for v in self.to_dict().values())
 
     @property
     def distance(self):
         return abs(self.pos1 - self.pos2) if hasattr(self, 'chr1') and self.is_cis else None
-    
+
     @property
     def meets_spec(self):
         return all([hasattr(self, requirement) for requirement in PairsSegment.required])
 
     @property
     def is_cis(self): return self.chr1 == self.chr2
-    
+
     @property
     def is_trans(self): return self.chr1 != self.chr2
 
@@ -67,4 +141,7 @@ class PairsSegment:
     @property
     def is_ur(self): return self.pair_type in ["UU", "RU", "UR"]
 
-    def __str__(self): return self.to_string()
\ No newline at end of file
+    def __str__(self): return self.to_string()
+
+# Marks columns that a record has no value for, e.g. on a truncated line
+_unset = object()
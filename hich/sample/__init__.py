@@ -1,3 +1,4 @@
+from hich.sample.reservoir_sampler import ReservoirSampler
 from hich.sample.selection_sampler import SelectionSampler
 
-__all__ = ['SelectionSampler']
\ No newline at end of file
+__all__ = ['ReservoirSampler', 'SelectionSampler']
\ No newline at end of file
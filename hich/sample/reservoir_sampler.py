@@ -0,0 +1,89 @@
+from hich.stats.discrete_distribution import DiscreteDistribution
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import polars as pl
+
+# See tests/test_reservoir_sampler.py for unit tests
+
+@dataclass
+class ReservoirSampler:
+    """One-pass stratified downsampling of a stream of DataFrame batches to a fixed size
+
+    Every row gets a uniform random key, and each outcome class keeps the rows
+    with the size smallest keys seen so far, which is a uniform sample of the
+    class. A class's reservoir is compacted to its size smallest keys only
+    once it holds more than 2 * size rows, so memory is bounded by about
+    2 * size rows per class plus one batch. Once the stream ends,
+    the full distribution of outcomes is known exactly, so the target
+    distribution is full.to_size(size), and each class contributes the rows
+    with its smallest keys. This gives the same per-class counts as
+    SelectionSampler with a precomputed full distribution, without a prior pass.
+
+    Rows are returned in the order they were added.
+    """
+    size: int = 0
+    full: DiscreteDistribution = field(default_factory = DiscreteDistribution)
+    rng: np.random.Generator = field(default_factory = np.random.default_rng)
+    reservoirs: Dict[object, List[pl.DataFrame]] = field(default_factory = dict)
+    reservoir_rows: Dict[object, int] = field(default_factory = dict)
+    thresholds: Dict[object, float] = field(default_factory = dict)
+    rows_added: int = 0
+
+    def add_batch(self, groups: Iterable[Tuple[object, Iterable[int]]], df: pl.DataFrame) -> None:
+        """Offer the rows of a batch to the reservoir of their outcome class
+
+        Args:
+            groups (Iterable[Tuple[object, Iterable[int]]]): (event, row indices) for each event in the batch, as from PairsClassifier.outcome_groups
+            df (pl.DataFrame): The batch
+        """
+        keys = self.rng.random(len(df))
+        df = df.with_columns(pl.Series("__key__", keys),
+                             pl.int_range(pl.len(), dtype = pl.UInt64).alias("__index__") + self.rows_added)
+        self.rows_added += len(df)
+
+        for event, rows in groups:
+            rows = np.asarray(rows)
+            self.full[event] += len(rows)
+            if self.size == 0:
+                continue
+
+            # Rows with keys above the largest key kept at the last compaction can never be kept
+            threshold = self.thresholds.get(event, 1.0)
+            rows = rows[keys[rows] < threshold]
+            if len(rows) == 0:
+                continue
+            self.reservoirs.setdefault(event, []).append(df[rows])
+            self.reservoir_rows[event] = self.reservoir_rows.get(event, 0) + len(rows)
+
+            # Compact lazily so the cost of adding rows stays linear in the number of rows added
+            if self.reservoir_rows[event] > 2 * self.size:
+                self.compact(event)
+
+    def compact(self, event) -> None:
+        """Keep only the size rows with the smallest keys in the reservoir for an event"""
+        reservoir = pl.concat(self.reservoirs[event]).sort("__key__").head(self.size)
+        self.reservoirs[event] = [reservoir]
+        self.reservoir_rows[event] = len(reservoir)
+        if len(reservoir) == self.size and self.size > 0:
+            self.thresholds[event] = reservoir["__key__"][-1]
+
+    def target(self) -> DiscreteDistribution:
+        """Distribution of counts to keep per outcome class, given the rows added so far"""
+        return self.full.to_size(self.size) if self.full.total() > self.size else self.full.copy()
+
+    def sample(self, target: DiscreteDistribution = None) -> pl.DataFrame | None:
+        """Rows kept for each outcome class, in the order they were added
+
+        Args:
+            target (DiscreteDistribution, optional): Counts to keep for each outcome class, at most size. Defaults to self.target().
+
+        Returns:
+            pl.DataFrame | None: Sampled rows, or None if no rows were added
+        """
+        target = self.target() if target is None else target
+        kept = [pl.concat(reservoir).sort("__key__").head(target[event])
+                for event, reservoir in self.reservoirs.items()]
+        if not kept:
+            return None
+        return pl.concat(kept).sort("__index__").drop("__key__", "__index__")
@@ -1,8 +1,10 @@
 from hich.stats.discrete_distribution import DiscreteDistribution
 from dataclasses import dataclass, field
 from random import random
+from typing import Iterable, Tuple
+import numpy as np
 
-# !Warning: this class has no specific unit test as of 2024/10/20 - Ben Skubi
+# See tests/test_selection_sampler.py for unit tests
 
 @dataclass
 class SelectionSampler:
@@ -10,6 +12,7 @@ class SelectionSampler:
     target: DiscreteDistribution = field(default_factory = DiscreteDistribution)
     viewed: DiscreteDistribution = field(default_factory = DiscreteDistribution)
     kept: DiscreteDistribution = field(default_factory = DiscreteDistribution)
+    rng: np.random.Generator = field(default_factory = np.random.default_rng)
 
     def count(self, event):
         self.full[event] += 1
@@ -22,4 +25,35 @@ class SelectionSampler:
         self.viewed[event] += 1
         return keep
 
-    
+    def sample_count(self, event, n: int) -> int:
+        """Number of the next n records of the event to keep
+
+        Calling sample n times keeps each subset of the remaining records of
+        the event with equal probability, so the number kept from the next n
+        is hypergeometric: drawn without replacement from the records left
+        to view, of which the records left to sample are successes.
+        """
+        # More records than expected are kept as long as any remain to be sampled, as by sample
+        to_view = max(self.full[event] - self.viewed[event], n)
+        to_sample = min(max(self.target[event] - self.kept[event], 0), to_view)
+        n_kept = int(self.rng.hypergeometric(to_sample, to_view - to_sample, n)) if n else 0
+        self.kept[event] += n_kept
+        self.viewed[event] += n
+        return n_kept
+
+    def sample_batch(self, groups: Iterable[Tuple[object, Iterable[int]]], n_rows: int) -> np.ndarray:
+        """Select rows of a batch to keep
+
+        Args:
+            groups (Iterable[Tuple[object, Iterable[int]]]): (event, row indices) for each event in the batch, as from PairsClassifier.outcome_groups
+            n_rows (int): Number of rows in the batch
+
+        Returns:
+            np.ndarray: Boolean mask of rows to keep
+        """
+        keep = np.zeros(n_rows, dtype = bool)
+        for event, rows in groups:
+            rows = np.asarray(rows)
+            n_kept = self.sample_count(event, len(rows))
+            keep[self.rng.choice(rows, n_kept, replace = False)] = True
+        return keep
@@ -1,26 +1,139 @@
 from multiprocessing import Pool
-from typing import Tuple
+from hich.parallel import ordered_bounded_map
+from typing import List, Tuple
 import polars as pl
 from polars import DataFrame
 from pathlib import Path
+import sys
+import time
 
-def compute_pairs_stats_on_path(data: Tuple["PairsClassifier", Path]) -> Tuple[str, "DiscreteDistribution"]:
+def count_pairs_stats_batched(classifier: "PairsClassifier", reader: "PairsBatchReader") -> "DiscreteDistribution":
+    """Count events in each DataFrame yielded by the reader with columnar classification"""
+    # See tests/test_compute_pairs_stats.py for unit tests
+    from hich.stats import DiscreteDistribution
+
+    stats = DiscreteDistribution()
+    for df in reader:
+        stats.update(classifier.count_batch(df))
+    return stats
+
+def compute_pairs_stats_on_byte_range(data: Tuple["PairsClassifier", Path, List[str], int, int, bool]) -> "DiscreteDistribution":
+    """Classify and count the records assigned to one byte range of a plaintext or BGZF .pairs file
+    data - a (PairsClassifier, Path, columns, start, end, is_bgzf) tuple. See hich.parse.pairs_byte_ranges
+    for how records are assigned to byte ranges.
+    """
+    # See tests/test_compute_pairs_stats.py for unit tests
+    from hich.stats import DiscreteDistribution
+    from hich.pairs import PairsSegment
+    from hich.parse.pairs_batch_reader import read_pairs_buffer
+    from hich.parse.pairs_byte_ranges import read_byte_range
+
+    classifier, pairs_path, columns, start, end, bgzf = data
+    schema = {col: pl.Int64 if col in ["pos1", "pos2"] else pl.String for col in columns}
+    columnar = classifier.can_count_batch(columns)
+    select = classifier.batch_columns(columns)
+
+    columns = tuple(columns)
+    stats = DiscreteDistribution()
+    for buffer in read_byte_range(pairs_path, start, end, bgzf):
+        if columnar:
+            stats.update(classifier.count_batch(read_pairs_buffer(buffer, schema, select)))
+        else:
+            for line in buffer.decode("utf-8").splitlines():
+                if not line.strip() or line.startswith("#"):
+                    continue
+                record = PairsSegment.from_fields(columns, line.split())
+                stats[classifier.classify(record)] += 1
+    return stats
+
+def compute_pairs_stats_on_path_parallel(data: Tuple["PairsClassifier", Path],
+                                         threads: int,
+                                         ranges_per_thread: int = 4,
+                                         report_throughput: bool = False) -> Tuple[str, "DiscreteDistribution"]:
+    """Classify records in a single .pairs file as events on multiple cores and return their counts
+    data - a (PairsClassifier, Path) tuple as for compute_pairs_stats_on_path
+
+    The file is split into threads * ranges_per_thread byte ranges aligned to
+    record boundaries (and to BGZF block boundaries for bgzipped files), which are
+    classified in a process pool. The per-range distributions are merged in file order,
+    so events are listed in the same order as compute_pairs_stats_on_path.
+
+    Files compressed other than with BGZF, and Parquet files, can't be split, and are classified on a single core.
+    """
+    # See tests/test_compute_pairs_stats.py for unit tests
+    from hich.stats import DiscreteDistribution
+    from hich.pairs import PairsBatchReader
+    from hich.parse.pairs_byte_ranges import is_bgzf, is_splittable, pairs_byte_ranges
+
+    classifier, pairs_path = data
+    if not is_splittable(pairs_path):
+        print(f"{pairs_path} is compressed but not with bgzip, or is Parquet, so it will be read on a single core", file = sys.stderr)
+        return compute_pairs_stats_on_path(data, report_throughput = report_throughput)
+
+    with PairsBatchReader(pairs_path) as reader:
+        columns = reader.columns
+    bgzf = is_bgzf(pairs_path)
+    ranges = pairs_byte_ranges(pairs_path, threads * ranges_per_thread)
+    range_data = [(classifier, pairs_path, columns, start, end, bgzf) for start, end in ranges]
+
+    stats = DiscreteDistribution()
+    start_time = time.perf_counter()
+    for i, range_stats in enumerate(ordered_bounded_map(compute_pairs_stats_on_byte_range, range_data, threads)):
+        stats.update(range_stats)
+        if report_throughput:
+            elapsed = time.perf_counter() - start_time
+            print(f"Classified byte range {i + 1}/{len(ranges)}: {stats.total()} records in {elapsed:.3f}s from {pairs_path}",
+                  file = sys.stderr)
+    return (pairs_path, stats)
+
+def compute_pairs_stats_on_path(data: Tuple["PairsClassifier", Path],
+                                batch_size: int = 1000000,
+                                report_throughput: bool = False,
+                                threads: int = 1) -> Tuple[str, "DiscreteDistribution"]:
     """Classify records in a PairsFile as events and return their counts
     data - a (PairsClassifier, Path) tuple for classifying PairsSegments from a PairsFile as events
     and counting the number of events.
+
+    If the classifier's conjuncts can all be computed as Polars expressions, the file is
+    read in batches of batch_size records and each batch is classified columnwise.
+    Otherwise, each record is parsed as a PairsSegment and classified individually.
+
+    If threads > 1, the file is split and classified with compute_pairs_stats_on_path_parallel.
     """
-    # !Warning: this method has no specific unit test as of 2024/10/20 - Ben Skubi
+    # See tests/test_compute_pairs_stats.py for unit tests
     from hich.stats import DiscreteDistribution
-    from hich.pairs import PairsClassifier, PairsFile, PairsSegment
+    from hich.pairs import PairsBatchReader, PairsClassifier, PairsFile, PairsSegment
+
+    if threads > 1:
+        return compute_pairs_stats_on_path_parallel(data, threads, report_throughput = report_throughput)
 
     classifier, pairs_path = data
-    pairs_file = PairsFile(pairs_path)
-    stats = DiscreteDistribution()
 
-    # Return a count of events in the pairs file
-    for record in pairs_file:        
-        outcome = classifier.classify(record)
-        stats[outcome] += 1
+    with PairsBatchReader(pairs_path,
+                          batch_size = batch_size,
+                          schema_overrides = {"pos1": pl.Int64, "pos2": pl.Int64},
+                          report_throughput = report_throughput) as reader:
+        columnar = classifier.can_count_batch(reader.columns)
+        if columnar:
+            # Only parse the columns the conjuncts read
+            reader.select = classifier.batch_columns(reader.columns)
+            stats = count_pairs_stats_batched(classifier, reader)
+        elif reader.parquet is not None:
+            # PairsFile reads text only, so classify rows of the Parquet batches
+            columns = tuple(reader.columns)
+            stats = DiscreteDistribution()
+            for df in reader:
+                for row in df.iter_rows():
+                    stats[classifier.classify(PairsSegment.from_fields(columns, list(row)))] += 1
+
+    if not columnar and reader.parquet is None:
+        pairs_file = PairsFile(pairs_path)
+        stats = DiscreteDistribution()
+
+        # Return a count of events in the pairs file
+        for record in pairs_file:        
+            outcome = classifier.classify(record)
+            stats[outcome] += 1
     result = (pairs_path, stats)
     return result
 
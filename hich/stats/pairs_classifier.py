@@ -2,7 +2,8 @@ from dataclasses import dataclass, field
 from hich.parse.pairs_segment import PairsSegment
 from hich.stats.discrete_distribution import DiscreteDistribution
 from polars import DataFrame
-from typing import Callable, List
+from typing import Callable, List, Tuple
+import polars as pl
 import time
 import bisect
 
@@ -106,6 +107,139 @@ class PairsClassifier:
         result = eval(self.compiled_classification_code)
         return result
     
+    def conjunct_expr(self, conjunct: str, columns: List[str]) -> pl.Expr | None:
+        """Translate a conjunct into a Polars expression over a batch of .pairs records
+
+        Supports columns of the batch (accepting chrom1/chr1 and chrom2/chr2 as
+        synonyms), the PairsSegment properties is_cis, is_trans, intrachr,
+        interchr, distance and is_ur, and 'stratum'. For 'stratum', the
+        expression yields the index into self.cis_strata, which
+        batch_outcome maps back to the stratum value.
+
+        Returns None if the conjunct is not a simple attribute that can be
+        computed columnwise, such as an arbitrary Python expression.
+        """
+        def col(name):
+            synonyms = {**PairsSegment.alt, **{main: alt for alt, main in PairsSegment.alt.items()}}
+            for candidate in [name, synonyms.get(name)]:
+                if candidate in columns:
+                    return pl.col(candidate)
+            return None
+
+        if conjunct == "strata":
+            # Evaluates to the list of strata, which is not hashable as part of an outcome
+            return None
+        if conjunct == "stratum":
+            if not self.cis_strata:
+                return pl.lit(None)
+            distance = self.conjunct_expr("distance", columns)
+            if distance is None:
+                return None
+            strata = pl.lit(pl.Series(self.cis_strata, dtype = pl.Float64))
+            # search_sorted does not propagate nulls, so trans pairs are masked explicitly
+            return pl.when(distance.is_not_null()) \
+                     .then(strata.search_sorted(distance.cast(pl.Float64), side = "left"))
+
+        name = conjunct.strip().removeprefix("record.")
+        if not name.isidentifier():
+            return None
+
+        chr1, chr2, pos1, pos2 = col("chr1"), col("chr2"), col("pos1"), col("pos2")
+        if name in ["pos1", "pos2"]:
+            # PairsSegment casts positions to int
+            return col(name).cast(pl.Int64) if col(name) is not None else None
+        if name in ["is_cis", "intrachr", "is_trans", "interchr", "distance"]:
+            # PairsSegment properties take precedence over columns of the same name
+            if chr1 is None or chr2 is None:
+                return None
+            if name in ["is_cis", "intrachr"]:
+                return chr1 == chr2
+            if name in ["is_trans", "interchr"]:
+                return chr1 != chr2
+            if pos1 is None or pos2 is None:
+                return None
+            return pl.when(chr1 == chr2).then((pos1.cast(pl.Int64) - pos2.cast(pl.Int64)).abs())
+        if name == "is_ur":
+            return col("pair_type").is_in(["UU", "RU", "UR"]) if col("pair_type") is not None else None
+        return col(name)
+
+    def polars_exprs(self, columns: List[str]) -> List[pl.Expr] | None:
+        """Polars expressions for all conjuncts, or None if any can't be computed columnwise"""
+        if not self.conjuncts:
+            return None
+        exprs = [self.conjunct_expr(conjunct, columns) for conjunct in self.conjuncts]
+        if any(expr is None for expr in exprs):
+            return None
+        return [expr.alias(f"__conjunct{i}__") for i, expr in enumerate(exprs)]
+
+    def can_count_batch(self, columns: List[str]) -> bool:
+        """Whether count_batch supports all conjuncts for a batch with these columns"""
+        return self.polars_exprs(columns) is not None
+
+    def batch_columns(self, columns: List[str]) -> List[str] | None:
+        """Columns that the conjuncts read from a batch with these columns, in the same order
+
+        Readers can parse only these columns. Returns None if the conjuncts can't be
+        computed columnwise or read no columns.
+        """
+        exprs = self.polars_exprs(columns)
+        if exprs is None:
+            return None
+        used = {name for expr in exprs for name in expr.meta.root_names()}
+        return [col for col in columns if col in used] or None
+
+    def batch_outcomes(self, df: DataFrame) -> DataFrame:
+        """Add a column for each conjunct to a DataFrame of .pairs records
+
+        Columns are named __conjunct0__, __conjunct1__, etc. For 'stratum', the
+        column holds the index into self.cis_strata (see batch_outcome).
+        """
+        exprs = self.polars_exprs(df.columns)
+        if exprs is None:
+            raise TypeError(f"Conjuncts {self.conjuncts} can't be computed columnwise from columns {df.columns}")
+        # with_columns rather than select so literal conjuncts broadcast to every row
+        return df.with_columns(exprs)
+
+    def batch_outcome(self, row: tuple) -> tuple:
+        """Convert a row of conjunct columns from batch_outcomes to the outcome returned by classify"""
+        outcome = list(row)
+        for i, conjunct in enumerate(self.conjuncts):
+            if conjunct == "stratum" and self.cis_strata and outcome[i] is not None:
+                outcome[i] = self.cis_strata[outcome[i]]
+        return tuple(outcome)
+
+    def count_batch(self, df: DataFrame) -> DiscreteDistribution:
+        """Classify a DataFrame of .pairs records and count the outcomes
+
+        Equivalent to calling classify on a PairsSegment for each row and
+        counting the outcomes, but the conjuncts are computed as Polars
+        expressions and counted with a single group-by. pos1 and pos2
+        should be integer columns.
+        """
+        keys = [f"__conjunct{i}__" for i in range(len(self.conjuncts))]
+        # maintain_order so outcomes are listed in the order they are first seen
+        counts = self.batch_outcomes(df).group_by(keys, maintain_order = True).len()
+
+        distribution = DiscreteDistribution()
+        for row in counts.iter_rows():
+            distribution[self.batch_outcome(row[:-1])] += row[-1]
+        return distribution
+
+    def outcome_groups(self, df: DataFrame) -> List[Tuple[tuple, pl.Series]]:
+        """Classify a DataFrame of .pairs records and group row indices by outcome
+
+        Returns:
+            List[Tuple[tuple, pl.Series]]: (outcome, row indices) for each outcome in the order they are first seen
+        """
+        keys = [f"__conjunct{i}__" for i in range(len(self.conjuncts))]
+        groups = (self.batch_outcomes(df)
+                      .select(keys)
+                      .with_row_index("__row__")
+                      .group_by(keys, maintain_order = True)
+                      .agg(pl.col("__row__")))
+        return [(self.batch_outcome(row), rows)
+                for row, rows in zip(groups.select(keys).iter_rows(), groups["__row__"])]
+
     def to_polars(self, distribution: DiscreteDistribution) -> DataFrame:
         """Output conjuncts plus 'count' as columns, rows as events + observed count
         
@@ -0,0 +1,70 @@
+from hich.fragtag.bedpe_pairs import BedpePairs
+from hich.fragtag.frag_index import FragIndex
+from hich.fragtag.tag_restriction_fragments import tag_batches_threaded
+from hypothesis import given, settings, strategies as st
+import bisect
+import polars as pl
+import pytest
+
+chroms = ["chr1", "chr2", "chrX", "chrM"]
+
+def make_index(chrom_cuts):
+    rows = []
+    for chrom, cuts in chrom_cuts.items():
+        ends = [0] + sorted(set(cuts)) + [max(cuts, default = 0) + 100]
+        rows.extend((chrom, start, end) for start, end in zip(ends[:-1], ends[1:]))
+    index = FragIndex()
+    index.load_frame(pl.DataFrame(rows, schema = ["chrom", "start", "end"], orient = "row"))
+    return index, {chrom: [row for row in rows if row[0] == chrom] for chrom in chrom_cuts}
+
+def expected_tag(frags, chrom, pos):
+    # Searching each chromosome's ends separately
+    ends = [end for _, _, end in frags.get(chrom, [])]
+    i = bisect.bisect_left(ends, pos)
+    if i == len(ends):
+        return (-1, 0, 0)
+    _, start, end = frags[chrom][i]
+    return (i, 0 if start == 0 else start + 1, end + 1)
+
+@settings(deadline = None, max_examples = 50)
+@given(st.dictionaries(st.sampled_from(chroms[:3]),
+                       st.lists(st.integers(min_value=1, max_value=5000), max_size=30)),
+       st.lists(st.tuples(st.sampled_from(chroms), st.integers(min_value=0, max_value=6000),
+                          st.sampled_from(chroms), st.integers(min_value=0, max_value=6000)),
+                max_size=60))
+def test_fragtag_matches_per_chrom_search(chrom_cuts, pairs):
+    index, frags = make_index(chrom_cuts)
+    df = pl.DataFrame([(f"r{i}", *pair) for i, pair in enumerate(pairs)],
+                      schema = {"readID": pl.String, "chrom1": pl.String, "pos1": pl.Int64,
+                                "chrom2": pl.String, "pos2": pl.Int64},
+                      orient = "row")
+    tagged = BedpePairs(df).fragtag(index)
+
+    assert tagged.columns == df.columns + ["rfrag1", "rfrag_start1", "rfrag_end1",
+                                           "rfrag2", "rfrag_start2", "rfrag_end2"]
+    assert tagged.select(df.columns).equals(df)
+    for row, (chrom1, pos1, chrom2, pos2) in zip(tagged.iter_rows(), pairs):
+        assert row[5:8] == expected_tag(frags, chrom1, pos1)
+        assert row[8:11] == expected_tag(frags, chrom2, pos2)
+
+@pytest.mark.parametrize("threads", [1, 2, 5])
+def test_threaded_tagging_keeps_order(threads):
+    index, _ = make_index({"chr1": [100, 200, 300], "chr2": [50]})
+    batches = [pl.DataFrame({"chrom1": ["chr1", "chr2"] * 5, "pos1": list(range(i, i + 10)),
+                             "chrom2": ["chr2"] * 10, "pos2": list(range(10 * i, 10 * i + 10))})
+               for i in range(0, 400, 10)]
+    expected = [BedpePairs(df).fragtag(index) for df in batches]
+    tagged = list(tag_batches_threaded(iter(batches), index, threads))
+    assert len(tagged) == len(expected)
+    assert all(a.equals(b) for a, b in zip(tagged, expected))
+
+def test_threaded_tagging_raises_reader_errors():
+    index, _ = make_index({"chr1": [100]})
+    def batches():
+        yield pl.DataFrame({"chrom1": ["chr1"], "pos1": [1], "chrom2": ["chr1"], "pos2": [2]})
+        raise ValueError("bad batch")
+
+    tagged = tag_batches_threaded(batches(), index, 2)
+    assert next(tagged)["rfrag1"].to_list() == [0]
+    with pytest.raises(ValueError, match = "bad batch"):
+        next(tagged)
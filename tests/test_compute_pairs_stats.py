@@ -0,0 +1,48 @@
+from hich.pairs import PairsClassifier, PairsFile
+from hich.parse.pairs_byte_ranges import pairs_byte_ranges
+from hich.stats import DiscreteDistribution
+from hich.stats.compute_pairs_stats import compute_pairs_stats_on_byte_range, compute_pairs_stats_on_path, compute_pairs_stats_on_path_parallel
+import pytest
+
+header = (
+    "## pairs format v1.0\n"
+    "#columns: readID chrom1 pos1 chrom2 pos2 strand1 strand2 pair_type\n"
+)
+
+@pytest.fixture
+def pairs_path(tmp_path):
+    path = tmp_path / "test.pairs"
+    records = [f"r{i}\tchr{i % 3 + 1}\t{i}\tchr{i % 2 + 1}\t{i * 7 + 10}\t{'+-'[i % 2]}\t-\t{['UU', 'RU', 'WW'][i % 3]}\n"
+               for i in range(500)]
+    path.write_text(header + "".join(records))
+    return path
+
+def classify_records(classifier, path):
+    stats = DiscreteDistribution()
+    for record in PairsFile(path):
+        stats[classifier.classify(record)] += 1
+    return stats
+
+# The first conjuncts can be counted columnwise, the second only record by record
+conjuncts = [["chr1", "chr2", "strand1", "pair_type"], ["record.chr1 + record.chr2", "pair_type"]]
+
+@pytest.mark.parametrize("conjuncts", conjuncts)
+def test_compute_pairs_stats_on_path(pairs_path, conjuncts):
+    classifier = PairsClassifier(conjuncts = conjuncts)
+    _, stats = compute_pairs_stats_on_path((classifier, pairs_path), batch_size = 64)
+    assert dict(stats) == dict(classify_records(classifier, pairs_path))
+
+@pytest.mark.parametrize("conjuncts", conjuncts)
+def test_byte_ranges_count_each_record_once(pairs_path, conjuncts):
+    classifier = PairsClassifier(conjuncts = conjuncts)
+    columns = header.split("\n")[1].split()[1:]
+    stats = DiscreteDistribution()
+    for start, end in pairs_byte_ranges(pairs_path, 7):
+        stats.update(compute_pairs_stats_on_byte_range((classifier, pairs_path, columns, start, end, False)))
+    assert dict(stats) == dict(classify_records(classifier, pairs_path))
+
+def test_parallel_matches_serial(pairs_path):
+    classifier = PairsClassifier(conjuncts = conjuncts[0])
+    _, parallel = compute_pairs_stats_on_path_parallel((classifier, pairs_path), 2)
+    _, serial = compute_pairs_stats_on_path((classifier, pairs_path))
+    assert list(parallel.items()) == list(serial.items())
@@ -0,0 +1,39 @@
+from Bio.Restriction import RestrictionBatch, AllEnzymes
+from Bio.Seq import Seq
+from hich.digest.cut_sites import cut_sites, read_fasta
+from hypothesis import given, settings, strategies as st
+import io
+import pytest
+import random
+
+# Palindromic, ambiguous, non-palindromic and two-cut enzymes
+enzyme_names = ["DpnII", "HinfI", "MluCI", "BsaI", "BaeI", "AloI", "BglI", "SfiI", "Hpy188I", "MboII"]
+
+def biopython_cut_sites(sequence, enzymes):
+    digest = RestrictionBatch(enzymes).search(Seq(sequence))
+    return sorted(set(site for sites in digest.values() for site in sites))
+
+@settings(deadline = None, max_examples = 100)
+@given(st.text(alphabet = "ACGTacgtN", max_size = 400),
+       st.lists(st.sampled_from(enzyme_names), min_size = 1, max_size = 4, unique = True))
+def test_cut_sites_match_biopython(sequence, enzymes):
+    # Seed with recognition sites so most examples contain cuts
+    rng = random.Random(sequence)
+    sites = [str(RestrictionBatch([name]).get(name).site).replace("N", "A") for name in enzymes]
+    parts = [sequence[:len(sequence) // 2], rng.choice(sites), sequence[len(sequence) // 2:], rng.choice(sites)]
+    sequence = "".join(parts)
+
+    assert cut_sites(sequence.encode(), RestrictionBatch(enzymes)).tolist() == biopython_cut_sites(sequence, enzymes)
+
+def test_cut_sites_match_biopython_for_all_enzymes():
+    rng = random.Random(0)
+    sequence = "".join(rng.choice("ACGT") for _ in range(5000))
+    for enzyme in AllEnzymes:
+        assert cut_sites(sequence.encode(), [enzyme]).tolist() == biopython_cut_sites(sequence, [enzyme]), str(enzyme)
+
+@pytest.mark.parametrize("block_size", [1, 3, 7, 1 << 24])
+def test_read_fasta(block_size):
+    text = ">chr1 description\nACGT\nac gt\n>chr2\n\n>chr3\r\nNNN"
+    expected = [("chr1", b"ACGTacgt"), ("chr2", b""), ("chr3", b"NNN")]
+    assert list(read_fasta(io.StringIO(text), block_size)) == expected
+    assert list(read_fasta(io.BytesIO(text.encode()), block_size)) == expected
@@ -0,0 +1,36 @@
+from hich.digest import make_frag_index
+from hich.fragtag.frag_index import FragIndex
+import pysam
+import pytest
+import random
+
+@pytest.fixture
+def reference(tmp_path):
+    rng = random.Random(0)
+    path = tmp_path / "ref.fa"
+    with open(path, "w") as file:
+        for chrom, length in [("chr2", 3000), ("chr1", 5000), ("chrM", 10)]:
+            sequence = "".join(rng.choice("ACGT") for _ in range(length))
+            file.write(f">{chrom} test\n" + "\n".join(sequence[i:i + 60] for i in range(0, length, 60)) + "\n")
+    return path
+
+def test_parallel_digest_matches_serial(tmp_path, reference):
+    serial = tmp_path / "serial.bed"
+    streamed = tmp_path / "streamed.bed"
+    fetched = tmp_path / "fetched.bed"
+    make_frag_index(reference, ["DpnII", "HinfI"], serial, startshift = 1, endshift = 2)
+    make_frag_index(reference, ["DpnII", "HinfI"], streamed, startshift = 1, endshift = 2, threads = 2)
+    pysam.faidx(str(reference))
+    make_frag_index(reference, ["DpnII", "HinfI"], fetched, startshift = 1, endshift = 2,
+                    threads = 2, index_file = tmp_path / "index.npz")
+
+    text = serial.read_text()
+    assert streamed.read_text() == fetched.read_text() == text
+
+    # Chromosomes are written in reference order
+    chroms = [line.split("\t")[0] for line in text.splitlines()]
+    assert list(dict.fromkeys(chroms)) == ["chr2", "chr1", "chrM"]
+    assert text.splitlines()[-1] == "chrM\t1\t12"
+
+    index = FragIndex(tmp_path / "index.npz")
+    assert index.ends("chr1").to_list() == [int(line.split("\t")[2]) for line in text.splitlines() if line.startswith("chr1\t")]
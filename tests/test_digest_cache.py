@@ -0,0 +1,63 @@
+from hich.digest import make_fragment_index
+from hich.digest.digest_cache import DigestCache, reference_fingerprint
+import os
+import time
+
+def write_reference(path, sequence = "ACGTGATCAAGATCTTGAATTC" * 20):
+    path.write_text(">chr1\n" + sequence + "\n")
+    return path
+
+def test_keys_depend_on_reference_contents_enzymes_and_shifts(tmp_path):
+    cache = DigestCache(tmp_path / "cache")
+    reference = write_reference(tmp_path / "ref.fa")
+    copy = write_reference(tmp_path / "copy.fa")
+    other = write_reference(tmp_path / "other.fa", "GATC" * 10)
+
+    key = DigestCache.key(cache.describe(reference, ["DpnII", "HinfI"]))
+    assert key == DigestCache.key(cache.describe(copy, ["HinfI", "DpnII"]))
+    assert key != DigestCache.key(cache.describe(other, ["DpnII", "HinfI"]))
+    assert key != DigestCache.key(cache.describe(reference, ["DpnII"]))
+    assert key != DigestCache.key(cache.describe(reference, ["DpnII", "HinfI"], cutshift = 0))
+
+    # Indexed references are identified by their .fai, size and modification time
+    (tmp_path / "ref.fa.fai").write_text("chr1\t440\t6\t440\t441\n")
+    assert reference_fingerprint(reference).startswith("fai:")
+    indexed_key = DigestCache.key(cache.describe(reference, ["DpnII", "HinfI"]))
+    os.utime(reference, ns = (0, 0))
+    assert indexed_key != DigestCache.key(cache.describe(reference, ["DpnII", "HinfI"]))
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DigestCache(tmp_path / "cache", max_bytes = 250)
+    for key in ["a", "b", "c"]:
+        bed = cache.temp_path()
+        bed.write_text("x" * 100)
+        cache.put(key, bed, {"enzymes": ["DpnII"]})
+        time.sleep(0.01)
+        if key == "b":
+            # Using "a" makes "b" the least recently used
+            assert cache.get("a") is not None
+
+    assert cache.get("b") is None
+    assert {entry["key"] for entry in cache.entries()} == {"a", "c"}
+    assert cache.total_bytes() == 200
+    assert cache.purge(["a"]) == ["a"]
+    assert cache.purge() == ["c"]
+    assert list(cache.cache_dir.iterdir()) == []
+
+def test_make_fragment_index_reuses_cached_digest(tmp_path, monkeypatch):
+    reference = write_reference(tmp_path / "ref.fa")
+    cache_dir = tmp_path / "cache"
+    first = tmp_path / "first.bed"
+    second = tmp_path / "second.bed"
+    make_fragment_index(first, 0, 0, 1, reference, ["Arima"], cache_dir = cache_dir)
+
+    # A cache hit doesn't digest
+    import hich.digest
+    def fail(*args, **kwargs):
+        raise AssertionError("digested a cached reference")
+    monkeypatch.setattr(hich.digest, "make_frag_index", fail)
+    make_fragment_index(second, 0, 0, 1, reference, ["Arima"], index = tmp_path / "index.npz", cache_dir = cache_dir)
+
+    assert first.read_text() == second.read_text() != ""
+    assert (tmp_path / "index.npz").exists()
+    assert len(DigestCache(cache_dir).entries()) == 1
@@ -0,0 +1,40 @@
+from hich.fragtag.frag_index import FragIndex, memmap_npz
+from hypothesis import given, settings, HealthCheck, strategies as st
+import numpy as np
+
+def write_bed(path, chrom_cuts):
+    lines = []
+    for chrom, cuts in chrom_cuts.items():
+        ends = [0] + sorted(set(cuts)) + [max(cuts, default = 0) + 100]
+        lines.extend(f"{chrom}\t{start}\t{end}\n" for start, end in zip(ends[:-1], ends[1:]))
+    path.write_text("".join(reversed(lines)))
+
+@settings(suppress_health_check=[HealthCheck.function_scoped_fixture], deadline = None, max_examples = 30)
+@given(st.dictionaries(st.sampled_from(["chr1", "chr2", "chrX", "chrM"]),
+                       st.lists(st.integers(min_value=1, max_value=10000), max_size=50),
+                       min_size=1),
+       st.lists(st.integers(min_value=0, max_value=11000), max_size=50))
+def test_npz_index_matches_bed(tmp_path, chrom_cuts, positions):
+    bed = tmp_path / "frags.bed"
+    npz = tmp_path / "frags.npz"
+    write_bed(bed, chrom_cuts)
+
+    from_bed = FragIndex(bed)
+    from_bed.save_npz(npz)
+    from_npz = FragIndex(npz)
+    assert isinstance(from_npz.end_array, np.memmap)
+
+    for chrom in chrom_cuts:
+        assert chrom in from_npz and (chrom,) in from_npz
+        assert from_npz.starts(chrom).to_list() == from_bed.starts(chrom).to_list()
+        assert from_npz.ends(chrom).to_list() == from_bed.ends(chrom).to_list()
+        assert list(from_npz.search((chrom,), positions)) == list(from_bed.search(chrom, positions))
+        assert from_bed.starts(chrom).is_sorted()
+    assert "chr3" not in from_npz
+
+def test_memmap_npz_reads_compressed_members(tmp_path):
+    path = tmp_path / "arrays.npz"
+    np.savez_compressed(path, a = np.arange(5), b = np.array([], dtype = np.int64))
+    arrays = memmap_npz(path)
+    assert list(arrays["a"]) == list(range(5))
+    assert len(arrays["b"]) == 0
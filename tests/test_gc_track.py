@@ -0,0 +1,80 @@
+from hich.compartments import gc_track
+from hich.compartments.gc_track import GCTrack, gc_fractions, track_fingerprint
+from hypothesis import given, strategies as st
+import numpy as np
+import os
+import pytest
+
+def naive_gc_fractions(sequence, resolution):
+    fractions = []
+    for start in range(0, len(sequence), resolution):
+        window = sequence[start:start + resolution].upper()
+        acgt = sum(window.count(base) for base in "ACGT")
+        fractions.append((window.count("G") + window.count("C")) / acgt if acgt else np.nan)
+    return np.array(fractions)
+
+@given(st.text(alphabet = "ACGTNacgtnRY", max_size = 300), st.integers(min_value = 1, max_value = 50))
+def test_gc_fractions_matches_naive(sequence, resolution):
+    fractions = gc_fractions(sequence.encode(), resolution)
+    assert np.allclose(fractions, naive_gc_fractions(sequence, resolution), equal_nan = True)
+
+def test_gc_fractions_across_chunks(monkeypatch):
+    monkeypatch.setattr(gc_track, "chunk_size", 20)
+    sequence = "GGCCAATTNN" * 7 + "GCA"
+    assert np.allclose(gc_fractions(sequence.encode(), 6), naive_gc_fractions(sequence, 6))
+
+def test_n_windows_are_nan():
+    fractions = gc_fractions(b"NNNNGCAT", 4)
+    assert np.isnan(fractions[0]) and fractions[1] == 0.5
+
+@pytest.fixture
+def reference(tmp_path):
+    path = tmp_path / "ref.fa"
+    path.write_text(">chr1 test\nGGGGAAAA\nCCNN\n>chr2\nATATGC\n")
+    return path
+
+def test_gc_track_from_fasta(reference):
+    track = GCTrack.from_fasta(reference, 4)
+    assert track.chromsizes() == [("chr1", 12), ("chr2", 6)]
+    assert np.allclose(track["chr1"], [1.0, 0.0, 1.0])
+    assert np.allclose(track["chr2"], [0.0, 1.0])
+    assert "chr2" in track and "chr3" not in track
+
+def test_gc_track_cache(tmp_path, reference, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    track = GCTrack.cached(reference, 4, cache_dir)
+    assert GCTrack.cache_path(reference, 4, cache_dir).exists()
+    assert GCTrack.cache_path(reference, 4, cache_dir) != GCTrack.cache_path(reference, 5, cache_dir)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Cached track should not read the reference")
+    monkeypatch.setattr(GCTrack, "from_fasta", fail)
+    cached = GCTrack.cached(reference, 4, cache_dir)
+    assert cached.chromsizes() == track.chromsizes()
+    assert cached.resolution == 4
+    assert np.array_equal(cached.offsets, track.offsets)
+    assert np.allclose(cached.fractions, track.fractions)
+
+def test_parallel_gc_track_matches_serial(tmp_path, reference):
+    import pysam
+    serial = GCTrack.from_fasta(reference, 4)
+    streamed = GCTrack.from_fasta(reference, 4, threads = 2)
+    pysam.faidx(str(reference))
+    fetched = GCTrack.from_fasta(reference, 4, threads = 2)
+    for track in [streamed, fetched]:
+        assert track.chromsizes() == serial.chromsizes()
+        assert np.array_equal(track.offsets, serial.offsets)
+        assert np.allclose(track.fractions, serial.fractions)
+
+def test_track_fingerprint_does_not_read_reference(reference, monkeypatch):
+    import builtins
+    fingerprint = track_fingerprint(reference)
+    def fail(*args, **kwargs):
+        raise AssertionError("Fingerprint should not read the reference")
+    monkeypatch.setattr(builtins, "open", fail)
+    assert track_fingerprint(reference) == fingerprint
+    monkeypatch.undo()
+
+    # Modified references get a new fingerprint
+    os.utime(reference, ns = (0, 0))
+    assert track_fingerprint(reference) != fingerprint
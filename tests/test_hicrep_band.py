@@ -0,0 +1,49 @@
+from hich.hicrep_combos import hicrep_band
+from hich.hicrep_combos.hicrep_band import band_mean_filter, downsample
+from hicrep.utils import meanFilterSparse, trimDiags, upperDiagCsr
+from hypothesis import given, settings, strategies as st
+import numpy as np
+import scipy.sparse as sp
+
+def random_contacts(seed, n_bins, density, scale = 1.0):
+    rng = np.random.default_rng(seed)
+    i, j = np.triu_indices(n_bins)
+    keep = rng.random(i.size) < density
+    return sp.coo_matrix((rng.poisson(3, keep.sum()) * scale, (i[keep], j[keep])), shape = (n_bins, n_bins))
+
+@settings(deadline = None)
+@given(st.integers(min_value = 0, max_value = 2**32 - 1),
+       st.integers(min_value = 2, max_value = 60),
+       st.floats(min_value = 0.05, max_value = 1.0),
+       st.integers(min_value = 1, max_value = 4),
+       st.integers(min_value = 2, max_value = 70),
+       st.sampled_from([1.0, 0.1]),
+       st.sampled_from([10, 200, 1 << 22]))
+def test_band_mean_filter_matches_mean_filter_sparse(seed, n_bins, density, h, dMax, scale, cells):
+    hicrep_band.strip_cells = cells
+    try:
+        nDiags = min(dMax, n_bins)
+        a = trimDiags(random_contacts(seed, n_bins, density, scale), nDiags, False)
+        expected = upperDiagCsr(meanFilterSparse(a, h), nDiags)
+        result = upperDiagCsr(band_mean_filter(a, h, nDiags), nDiags)
+        assert np.array_equal(result.indptr, expected.indptr)
+        assert np.array_equal(result.indices, expected.indices)
+        assert np.allclose(result.data, expected.data, rtol = 1e-12, atol = 0)
+    finally:
+        hicrep_band.strip_cells = 1 << 22
+
+def test_band_mean_filter_stays_in_band():
+    a = trimDiags(random_contacts(0, 40, 0.5), 5, False)
+    result = band_mean_filter(a, 2, 5)
+    diagonals = result.col - result.row
+    assert diagonals.min() >= 1 and diagonals.max() < 5
+
+def test_downsample():
+    np.random.seed(0)
+    m = random_contacts(0, 30, 0.5)
+    m.eliminate_zeros()
+    size = int(m.sum()) // 3
+    result = downsample(m, size)
+    assert result.sum() == size
+    assert result.shape == m.shape
+    assert set(zip(result.row, result.col)) <= set(zip(m.row, m.col))
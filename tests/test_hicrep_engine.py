@@ -0,0 +1,85 @@
+from hich.hicrep_combos import HicrepWriter, hicrep_callers, hicrep_frame, iter_parallel_hicrep
+from hich.hicrep_combos.hicrep_engine import MatrixKey, all_vs_all_scc, prepare_matrix, prepared_scc
+from hich.hicrep_combos.hicrep_wrapper import computeSCC
+from hicrep.utils import coolerInfo, getSubCoo, readMcool
+import cooler
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+@pytest.fixture(scope = "module")
+def mcools(tmp_path_factory):
+    """Three .mcool files with noisy copies of the same distance-decaying contacts"""
+    directory = tmp_path_factory.mktemp("mcools")
+    rng = np.random.default_rng(0)
+    bins = cooler.util.binnify(pd.Series({"chr1": 60000, "chr2": 45000}), 1000)
+    paths = []
+    for sample in range(3):
+        pixels = []
+        for chrom, group in bins.groupby("chrom", sort = False):
+            ids = group.index.to_numpy()
+            i, j = np.triu_indices(len(ids))
+            counts = rng.poisson(20 / (j - i + 1) * rng.uniform(0.5, 1.5))
+            keep = counts > 0
+            pixels.append(pd.DataFrame({"bin1_id": ids[i[keep]], "bin2_id": ids[j[keep]], "count": counts[keep]}))
+        cool = str(directory / f"s{sample}.cool")
+        cooler.create_cooler(cool, bins, pd.concat(pixels))
+        mcool = str(directory / f"s{sample}.mcool")
+        cooler.zoomify_cooler(cool, mcool, [1000, 3000], chunksize = 10**6)
+        paths.append(mcool)
+    return paths
+
+def reference_scc(file1, file2, resolution, chrom, h, dBPMax, bDownSample = False):
+    """SCC from loading and preparing both matrices for this comparison alone"""
+    cool1, _ = readMcool(file1, resolution)
+    cool2, _ = readMcool(file2, resolution)
+    dMax = coolerInfo(cool1, "nbins") if dBPMax == -1 else dBPMax // cool1.binsize + 1
+    pixels1 = cool1.matrix(as_pixels = True, balance = False, sparse = True)
+    pixels2 = cool2.matrix(as_pixels = True, balance = False, sparse = True)
+    m1 = getSubCoo(pixels1, cool1.bins(), chrom)
+    m2 = getSubCoo(pixels2, cool2.bins(), chrom)
+    return computeSCC(m1, m2, coolerInfo(cool1, "sum"), coolerInfo(cool2, "sum"), dMax, h, bDownSample)
+
+@pytest.mark.parametrize("resolution, chrom, h, dBPMax", [(1000, "chr1", 1, -1),
+                                                          (1000, "chr2", 2, 20000),
+                                                          (3000, "chr1", 0, 30000)])
+def test_prepared_scc_matches_compute_scc(mcools, resolution, chrom, h, dBPMax):
+    prepared = [prepare_matrix(MatrixKey(path, resolution, chrom, h, dBPMax, False)) for path in mcools]
+    for i in range(len(mcools)):
+        for j in range(i, len(mcools)):
+            expected = reference_scc(mcools[i], mcools[j], resolution, chrom, h, dBPMax)
+            assert prepared_scc(prepared[i], prepared[j], h) == pytest.approx(expected)
+
+def test_prepared_scc_downsampled(mcools):
+    prepared = [prepare_matrix(MatrixKey(path, 1000, "chr1", 1, -1, True)) for path in mcools]
+    assert not prepared[0].smoothed
+    # Matrices with equal totals are not resampled, so the result is deterministic
+    assert prepared_scc(prepared[0], prepared[0], 1) == pytest.approx(reference_scc(mcools[0], mcools[0], 1000, "chr1", 1, -1, True))
+    assert 0 < prepared_scc(prepared[0], prepared[1], 1) < 1
+
+@pytest.mark.parametrize("resolution, chrom, h, dBPMax", [(1000, "chr1", 1, -1),
+                                                          (1000, "chr2", 0, 10000),
+                                                          (3000, "chr2", 2, -1)])
+def test_all_vs_all_scc_matches_pairwise(mcools, resolution, chrom, h, dBPMax):
+    prepared = [prepare_matrix(MatrixKey(path, resolution, chrom, h, dBPMax, False)) for path in mcools]
+    scc = all_vs_all_scc(prepared)
+    expected = np.array([[prepared_scc(m1, m2, h) for m2 in prepared] for m1 in prepared])
+    assert np.allclose(scc, expected, rtol = 0, atol = 1e-12)
+
+@pytest.mark.parametrize("output", ["scc.tsv", "scc.parquet"])
+def test_streamed_hicrep_output(mcools, tmp_path, output):
+    callers = hicrep_callers(mcools, 1000, ["chr1", "chr2"], h = 1, dBPMax = 20000, bDownSample = False)
+    writer = HicrepWriter(str(tmp_path / output))
+    chunks = []
+    for finished in iter_parallel_hicrep(callers, max_workers = 2, chunksize = 1):
+        # Each chunk shares both files and the resolution
+        assert len({(call.file1, call.file2, call.resolution) for call in finished}) == 1
+        chunks.append(finished)
+        writer.write(hicrep_frame(finished))
+    writer.close()
+    assert [call for chunk in chunks for call in chunk] == callers
+
+    path = str(tmp_path / output)
+    df = pl.read_parquet(path) if output.endswith(".parquet") else pl.read_csv(path, separator = "\t")
+    assert df["scc"].to_list() == pytest.approx([reference_scc(call.file1, call.file2, 1000, call.chrom, 1, 20000) for call in callers])
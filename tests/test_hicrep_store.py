@@ -0,0 +1,35 @@
+from hich.hicrep_combos import SCC, HicrepCall, hicrep_callers
+from hich.hicrep_combos.hicrep_store import HicrepStore
+import os
+
+def test_store_fills_computed_comparisons(tmp_path):
+    files = []
+    for name in ["a.mcool", "b.mcool", "c.mcool"]:
+        path = tmp_path / name
+        path.write_text(name)
+        files.append(str(path))
+    store = HicrepStore(tmp_path / "store" / "scc.tsv")
+
+    callers = hicrep_callers(files[:2], 1000, ["chr1", "1"], h = 1, dBPMax = -1, bDownSample = False)
+    missing = store.fill(callers)
+    assert missing == callers
+    for i, call in enumerate(missing):
+        call.scc = i / 10
+    store.append(missing)
+
+    # Only comparisons involving the new file are missing
+    callers = hicrep_callers(files, 1000, ["chr1", "1"], h = 1, dBPMax = -1, bDownSample = False)
+    missing = store.fill(callers)
+    assert {(call.file1, call.file2) for call in missing} == {(files[0], files[2]), (files[1], files[2]), (files[2], files[2])}
+    found = [call for call in callers if call not in missing]
+    assert [call.scc for call in found] == [i / 10 for i in range(len(found))]
+    assert all(isinstance(call.chrom, str) for call in found)
+    assert all(isinstance(call.scc, SCC) for call in found)
+
+    # Comparisons are symmetric, and keyed by parameters
+    assert store.fill([HicrepCall(files[1], files[0], 1000, 1, -1, False, "chr1")]) == []
+    assert len(store.fill([HicrepCall(files[0], files[1], 1000, 2, -1, False, "chr1")])) == 1
+
+    # Modified files are compared again
+    os.utime(files[0], ns = (0, 0))
+    assert len(HicrepStore(store.path).fill([HicrepCall(files[0], files[1], 1000, 1, -1, False, "chr1")])) == 1
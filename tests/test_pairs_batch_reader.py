@@ -0,0 +1,49 @@
+from hich.pairs import PairsBatchReader
+from hypothesis import given, settings, HealthCheck, strategies as st
+import gzip
+import polars as pl
+import io
+
+header = (
+    "## pairs format v1.0\n"
+    "#chromsize: chr1 1000\n"
+    "#columns: readID chrom1 pos1 chrom2 pos2 strand1 strand2\n"
+)
+
+def make_records(n):
+    return [f"r{i}\tchr1\t{i}\tchr1\t{i + 10}\t+\t-\n" for i in range(n)]
+
+@settings(suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(st.integers(min_value=0, max_value=50), st.integers(min_value=1, max_value=20))
+def test_batches_cover_all_records_in_order(tmp_path, n_records, batch_size):
+    path = tmp_path / "test.pairs"
+    path.write_text(header + "".join(make_records(n_records)))
+
+    with PairsBatchReader(path, batch_size = batch_size, schema_overrides = {"pos1": pl.Int64}) as reader:
+        batches = list(reader)
+        assert reader.columns == ["readID", "chrom1", "pos1", "chrom2", "pos2", "strand1", "strand2"]
+        assert reader.header() == header
+        assert reader.records_read == n_records
+
+    assert all(0 < len(batch) <= batch_size for batch in batches)
+    pos1 = pl.concat(batches)["pos1"].to_list() if batches else []
+    assert pos1 == list(range(n_records))
+
+def test_gzip_and_header_without_columns_line(tmp_path):
+    path = tmp_path / "test.pairs.gz"
+    with gzip.open(path, "wt") as file:
+        file.write(header + "".join(make_records(5)))
+
+    reader = PairsBatchReader(path, batch_size = 2)
+    batches = list(reader)
+    reader.close()
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0].schema["pos1"] == pl.String
+    assert "#columns:" not in reader.header(include_columns_line = False)
+
+def test_unterminated_final_record():
+    handle = io.BytesIO((header + "".join(make_records(3))).rstrip("\n").encode())
+    batches = list(PairsBatchReader(handle, batch_size = 10))
+    assert len(batches) == 1
+    assert batches[0]["strand2"].to_list() == ["-", "-", "-"]
@@ -0,0 +1,50 @@
+from hich.parse.pairs_byte_ranges import is_bgzf, is_splittable, pairs_byte_ranges, read_byte_range
+from hypothesis import given, settings, HealthCheck, strategies as st
+import gzip
+import pysam
+
+header = (
+    "## pairs format v1.0\n"
+    "#columns: readID chrom1 pos1 chrom2 pos2 strand1 strand2\n"
+)
+
+def make_records(n):
+    return [f"r{i}\tchr1\t{i}\tchr1\t{i * 7 + 10}\t+\t-\n" for i in range(n)]
+
+def records_in_ranges(path, n_ranges, buffer_size):
+    text = b"".join(buffer
+                    for start, end in pairs_byte_ranges(path, n_ranges)
+                    for buffer in read_byte_range(path, start, end, buffer_size = buffer_size))
+    return [line for line in text.decode().splitlines(keepends = True) if not line.startswith("#")]
+
+@settings(suppress_health_check=[HealthCheck.function_scoped_fixture], deadline = None)
+@given(st.integers(min_value=0, max_value=300),
+       st.integers(min_value=1, max_value=40),
+       st.integers(min_value=1, max_value=500))
+def test_plaintext_ranges_read_each_record_once(tmp_path, n_records, n_ranges, buffer_size):
+    path = tmp_path / "test.pairs"
+    records = make_records(n_records)
+    path.write_text(header + "".join(records))
+
+    assert is_splittable(path) and not is_bgzf(path)
+    assert records_in_ranges(path, n_ranges, buffer_size) == records
+
+@settings(suppress_health_check=[HealthCheck.function_scoped_fixture], deadline = None, max_examples = 20)
+@given(st.integers(min_value=1, max_value=20))
+def test_bgzf_ranges_read_each_record_once(tmp_path, n_ranges):
+    # Enough records to span several 64 KiB BGZF blocks
+    plain = tmp_path / "test.pairs"
+    path = tmp_path / "test.pairs.gz"
+    records = make_records(20000)
+    plain.write_text(header + "".join(records))
+    pysam.tabix_compress(str(plain), str(path), force = True)
+
+    assert is_splittable(path) and is_bgzf(path)
+    assert records_in_ranges(path, n_ranges, 1 << 16) == records
+
+def test_gzip_is_not_splittable(tmp_path):
+    path = tmp_path / "test.pairs.gz"
+    with gzip.open(path, "wt") as file:
+        file.write(header + "".join(make_records(5)))
+    assert not is_bgzf(path)
+    assert not is_splittable(path)
@@ -132,4 +132,29 @@ def test_cis_stratum(chroms, pos1, difference):
     elif distance > 10000:
         assert c.classify(s) == (chrom1, chrom2, float('inf'))
     else:
-        assert False, "Weird Hypothesis test"
\ No newline at end of file
+        assert False, "Weird Hypothesis test"
+@given(st.lists(st.tuples(cis_or_trans_chroms(), st.integers(0, 10**9), st.integers(0, 10**9), st.sampled_from(["UU", "UR", "WW"])), min_size = 1),
+       st.sampled_from([[], [1000, 10000], [0, 5, 10**6]]),
+       st.sampled_from([["chrom1", "chrom2", "pair_type", "stratum"], ["record.is_cis", "record.distance"], ["is_trans", "is_ur", "stratum"]]))
+def test_count_batch_matches_classify(records, cis_strata, conjuncts):
+    c = PairsClassifier(conjuncts, cis_strata)
+    df = DataFrame([(chrom1, pos1, chrom2, pos2, pair_type) for (chrom1, chrom2), pos1, pos2, pair_type in records],
+                   schema = ["chrom1", "pos1", "chrom2", "pos2", "pair_type"], orient = "row")
+
+    expected = DiscreteDistribution()
+    for row in df.iter_rows(named = True):
+        expected[c.classify(PairsSegment(**row))] += 1
+
+    assert c.can_count_batch(df.columns)
+    assert c.count_batch(df) == expected
+
+    rows = df.iter_rows(named = True)
+    outcomes = [c.classify(PairsSegment(**row)) for row in rows]
+    groups = c.outcome_groups(df)
+    assert sorted(i for _, indices in groups for i in indices) == list(range(len(df)))
+    for outcome, indices in groups:
+        assert all(outcomes[i] == outcome for i in indices)
+
+def test_count_batch_unsupported_conjunct():
+    c = PairsClassifier(["record.chr1 + record.chr2"])
+    assert not c.can_count_batch(["chr1", "pos1", "chr2", "pos2"])
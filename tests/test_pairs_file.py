@@ -0,0 +1,44 @@
+from hich.pairs import PairsFile, PairsHeader, PairsSegment
+from hypothesis import given, settings, HealthCheck, strategies as st
+import polars as pl
+import pytest
+
+header_text = (
+    "## pairs format v1.0\n"
+    "#columns: readID chrom1 pos1 chrom2 pos2 strand1 strand2\n"
+)
+columns = ["readID", "chrom1", "pos1", "chrom2", "pos2", "strand1", "strand2"]
+
+def make_fields(n):
+    return [[f"r{i}", "chr1", str(i), "chr2", str(i + 10), "+", "-"] for i in range(n)]
+
+@settings(suppress_health_check=[HealthCheck.function_scoped_fixture], deadline = None)
+@given(st.integers(min_value=0, max_value=30), st.integers(min_value=1, max_value=200))
+def test_write_and_write_batch_round_trip(tmp_path, n_records, write_buffer_size):
+    path = tmp_path / "test.pairs"
+    fields = make_fields(n_records)
+    records = [PairsSegment.from_fields(columns, list(f)) for f in fields]
+    third = n_records // 3
+
+    output = PairsFile(path, mode = "w", header = PairsHeader(text = header_text.rstrip("\n")), write_buffer_size = write_buffer_size)
+    for record in records[:third]:
+        output.write(record)
+    output.write_batch(records[third:2 * third])
+    output.write_batch(pl.DataFrame(fields[2 * third:], schema = columns, orient = "row"))
+    output.close()
+
+    text = path.read_text()
+    assert text == header_text + "".join("\t".join(f) + "\n" for f in fields)
+    assert [record.to_string() for record in PairsFile(path)] == ["\t".join(f) for f in fields]
+
+def test_write_batch_uses_header_column_order(tmp_path):
+    path = tmp_path / "test.pairs"
+    fields = make_fields(3)
+    df = pl.DataFrame(fields, schema = columns, orient = "row")
+
+    output = PairsFile(path, mode = "w", header = PairsHeader(text = header_text.rstrip("\n")))
+    output.write_batch(df.select(reversed(columns)))
+    with pytest.raises(ValueError):
+        output.write_batch(df.drop("strand2"))
+    output.close()
+    assert path.read_text() == header_text + "".join("\t".join(f) + "\n" for f in fields)
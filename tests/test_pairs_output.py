@@ -0,0 +1,60 @@
+from hich.parse.pairs_byte_ranges import is_bgzf
+from hich.parse.pairs_output import PairsOutput
+import gzip
+import polars as pl
+import pysam
+import pytest
+
+header = (
+    "## pairs format v1.0\n"
+    "#columns: readID chrom1 pos1 chrom2 pos2 strand1 strand2\n"
+)
+
+def make_df(n, offset = 0):
+    return pl.DataFrame({"readID": [f"r{i}" for i in range(offset, offset + n)],
+                         "chrom1": ["chr1"] * n,
+                         "pos1": list(range(offset, offset + n)),
+                         "chrom2": ["chr2"] * n,
+                         "pos2": list(range(offset * 2, offset * 2 + 2 * n, 2)),
+                         "strand1": ["+"] * n,
+                         "strand2": ["-"] * n})
+
+def write(path, batches, **kwargs):
+    with PairsOutput(path, **kwargs) as output:
+        output.write(header)
+        for df in batches:
+            output.write_frame(df)
+
+def expected_text(batches):
+    return header + "".join("\t".join(str(v) for v in row) + "\n" for df in batches for row in df.iter_rows())
+
+@pytest.mark.parametrize("external", [True, False])
+def test_bgzf_output(tmp_path, monkeypatch, external):
+    if not external:
+        # Use the in-process pysam writer even if bgzip or pbgzip are installed
+        monkeypatch.setattr(PairsOutput, "bgzip_command", staticmethod(lambda threads: None))
+    elif PairsOutput.bgzip_command(2) is None:
+        pytest.skip("Neither bgzip nor pbgzip is installed")
+
+    path = tmp_path / "test.pairs.gz"
+    batches = [make_df(1000, i * 1000) for i in range(5)]
+    write(path, batches, threads = 2)
+
+    assert is_bgzf(path)
+    with gzip.open(path, "rt") as file:
+        assert file.read() == expected_text(batches)
+
+def test_plain_output(tmp_path):
+    path = tmp_path / "test.pairs"
+    batches = [make_df(3), make_df(0), make_df(4, 3)]
+    write(path, batches)
+    assert path.read_text() == expected_text(batches)
+
+def test_indexed_output(tmp_path):
+    path = tmp_path / "test.pairs.gz"
+    write(path, [make_df(100), make_df(100, 100)], index = True)
+
+    with pysam.TabixFile(str(path)) as tabix:
+        records = list(tabix.fetch("chr1", 10, 20))
+    # Tabix regions are 0-based and half-open, and pos1 is 1-based
+    assert [record.split("\t")[2] for record in records] == [str(pos) for pos in range(11, 21)]
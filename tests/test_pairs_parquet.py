@@ -0,0 +1,57 @@
+from hich.parse.pairs_batch_reader import PairsBatchReader
+from hich.parse.pairs_byte_ranges import is_splittable
+from hich.parse.pairs_parquet import is_pairs_parquet, pairs_to_parquet, read_pairs_parquet_header
+from hypothesis import given, settings, HealthCheck, strategies as st
+import polars as pl
+
+header = (
+    "## pairs format v1.0\n"
+    "#chromsize: chr1 1000\n"
+    "#columns: readID chrom1 pos1 chrom2 pos2 strand1 strand2 pair_type\n"
+)
+
+def make_records(n):
+    return [f"r{i}\tchr{i % 3 + 1}\t{i}\tchr1\t{i * 7 + 10}\t+\t-\tUU\n" for i in range(n)]
+
+def read_all(path, **kwargs):
+    with PairsBatchReader(path, **kwargs) as reader:
+        batches = list(reader)
+        return reader.header(), pl.concat(batches) if batches else None
+
+@settings(suppress_health_check=[HealthCheck.function_scoped_fixture], deadline = None, max_examples = 30)
+@given(st.integers(min_value=0, max_value=100),
+       st.integers(min_value=1, max_value=40),
+       st.integers(min_value=1, max_value=40))
+def test_parquet_round_trip(tmp_path, n_records, row_group_size, batch_size):
+    text_path = tmp_path / "test.pairs"
+    parquet_path = tmp_path / "test.parquet"
+    text_path.write_text(header + "".join(make_records(n_records)))
+
+    assert pairs_to_parquet(text_path, parquet_path, row_group_size = row_group_size) == n_records
+    assert is_pairs_parquet(parquet_path) and not is_pairs_parquet(text_path)
+    assert not is_splittable(parquet_path)
+    assert read_pairs_parquet_header(parquet_path) == header
+
+    overrides = {"pos1": pl.Int64, "pos2": pl.Int64}
+    text_header, text_df = read_all(text_path, batch_size = batch_size, schema_overrides = overrides)
+    parquet_header, parquet_df = read_all(parquet_path, batch_size = batch_size, schema_overrides = overrides)
+    assert parquet_header == text_header
+    if n_records == 0:
+        assert parquet_df is None
+    else:
+        assert parquet_df.equals(text_df)
+        assert parquet_df.schema == text_df.schema
+
+def test_parquet_select_and_scan(tmp_path):
+    text_path = tmp_path / "test.pairs"
+    parquet_path = tmp_path / "test.parquet"
+    text_path.write_text(header + "".join(make_records(50)))
+    pairs_to_parquet(text_path, parquet_path, row_group_size = 7)
+
+    _, df = read_all(parquet_path, select = ["pos1", "chrom1"])
+    assert df.columns == ["chrom1", "pos1"]
+    assert df["pos1"].to_list() == [str(i) for i in range(50)]
+
+    scanned = pl.scan_parquet(parquet_path).filter(pl.col("chrom1") == "chr2").select("pos1").collect()
+    assert scanned["pos1"].to_list() == list(range(1, 50, 3))
+    assert pl.scan_parquet(parquet_path).collect_schema()["chrom1"] == pl.Categorical
@@ -1,3 +1,4 @@
+import pickle
 from hypothesis import given, example, assume, target
 from hypothesis import strategies as st
 from hich.pairs import PairsSegment
@@ -14,3 +15,40 @@ def test_pairs_segment_computed_correctly(chroms, pos1, pos2):
     chrom1, chrom2 = chroms
     s = PairsSegment(chrom1 = chrom1, chrom2 = chrom2, pos1 = pos1, pos2 = pos2)
     assert s.is_trans or s.distance == abs(pos1 - pos2)
+
+@given(cis_or_trans_chroms(), st.integers(0, 10**9), st.integers(0, 10**9))
+def test_pairs_segment_from_fields_matches_kwargs(chroms, pos1, pos2):
+    chrom1, chrom2 = chroms
+    columns = ["readID", "chrom1", "pos1", "chrom2", "pos2", "pair_type"]
+    fields = ["r1", chrom1, str(pos1), chrom2, str(pos2), "UU"]
+    s = PairsSegment.from_fields(columns, fields)
+    kwargs = PairsSegment(**dict(zip(columns, fields)))
+
+    assert (s.chr1, s.chr2, s.chrom1, s.chrom2) == (chrom1, chrom2, chrom1, chrom2)
+    assert (s.pos1, s.pos2) == (pos1, pos2)
+    assert s.distance == kwargs.distance and s.is_cis == (chrom1 == chrom2)
+    assert s.is_ur
+    assert s.to_dict() == kwargs.to_dict()
+    assert s.to_string() == f"r1\t{chrom1}\t{pos1}\t{chrom2}\t{pos2}\tUU"
+    assert s.to_string(["pair_type", "chrom2", "pos2"]) == f"UU\t{chrom2}\t{pos2}"
+
+def test_pairs_segment_set_attributes_and_pickle():
+    columns = ("chr1", "pos1", "chr2", "pos2")
+    s = PairsSegment.from_fields(columns, ["chr1", "10", "chr1", "30"])
+    other = PairsSegment.from_fields(columns, ["chr2", "10", "chr2", "30"])
+    s.cellID = "A"
+    s.chrom2 = "chr3"
+    s.pos1 = "5"
+
+    assert s.to_dict() == {"chr1": "chr1", "pos1": 5, "chr2": "chr3", "pos2": 30, "cellID": "A"}
+    assert s.distance is None and s.is_trans
+    assert not hasattr(other, "cellID")
+    assert pickle.loads(pickle.dumps(s)).to_dict() == s.to_dict()
+    assert PairsSegment().to_dict() == {"pos1": 0, "pos2": 0}
+
+def test_pairs_segment_truncated_line_and_shadowed_column():
+    columns = ("chr1", "pos1", "chr2", "pos2", "distance", "pair_type")
+    s = PairsSegment.from_fields(columns, ["chr1", "10", "chr1", "30", "-1"])
+    assert s.distance == 20
+    assert not hasattr(s, "pair_type")
+    assert s.to_dict() == {"chr1": "chr1", "pos1": 10, "chr2": "chr1", "pos2": 30, "distance": "-1"}
@@ -0,0 +1,18 @@
+from hich.parallel import ordered_bounded_map
+import operator
+import pytest
+
+@pytest.mark.parametrize("threads, window, chunksize", [(1, None, 1), (2, None, 1), (2, 3, 1), (2, 3, 4)])
+def test_ordered_bounded_map(threads, window, chunksize):
+    drawn = []
+    def tasks():
+        for i in range(20):
+            drawn.append(i)
+            yield i
+
+    results = []
+    for result in ordered_bounded_map(operator.neg, tasks(), threads, window, chunksize):
+        # Tasks are drawn only as results are yielded
+        assert len(drawn) - len(results) <= (window or threads) * chunksize
+        results.append(result)
+    assert results == [-i for i in range(20)]
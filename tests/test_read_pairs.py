@@ -0,0 +1,45 @@
+from hich.parse.pairs_parser import read_pairs
+from hich.parse.pairs_schema import PairsSchema
+from hypothesis import given, settings, strategies as st
+import polars as pl
+
+header = (
+    "## pairs format v1.0\n"
+    "#columns: readID chrom1 pos1 chrom2 pos2 strand1 strand2 pair_type\n"
+)
+
+def make_lines(n):
+    return [f"r{i}\tchr{i % 3 + 1}\t{i}\tchr1\t{i * 7 + 10}\t+\t-\tUU\n" for i in range(n)]
+
+def test_polars_schema():
+    columns = ["readID", "chrom1", "pos1", "chr2", "pos2", "strand1", "mapq1"]
+    assert PairsSchema.polars_schema(columns) == {
+        "readID": pl.String, "chrom1": pl.Categorical, "pos1": pl.Int64,
+        "chr2": pl.Categorical, "pos2": pl.Int64, "strand1": pl.String, "mapq1": pl.String
+    }
+    assert PairsSchema.polars_schema(columns, categorical_chroms = False)["chrom1"] == pl.String
+
+@settings(deadline = None, max_examples = 30)
+@given(st.integers(min_value=1, max_value=60), st.integers(min_value=1, max_value=20))
+def test_read_pairs_typed_matches_untyped(n_records, batch_size):
+    lines = header.splitlines(keepends = True) + make_lines(n_records)
+    with pl.StringCache():
+        typed = list(read_pairs(lines, batch_size = batch_size, typed = True))
+        untyped = list(read_pairs(lines, batch_size = batch_size))
+
+    assert typed[0] == untyped[0] == header
+    assert len(typed) == len(untyped)
+    for typed_df, untyped_df in zip(typed[1:], untyped[1:]):
+        assert typed_df.schema == PairsSchema.polars_schema(typed_df.columns)
+        assert all(dtype == pl.String for dtype in untyped_df.dtypes)
+        assert typed_df.cast(pl.String).equals(untyped_df)
+
+    df = pl.concat(typed[1:])
+    assert df["pos2"].to_list() == [i * 7 + 10 for i in range(n_records)]
+
+def test_read_pairs_default_is_untyped():
+    lines = header.splitlines(keepends = True) + make_lines(5)
+    header_text, df = list(read_pairs(lines))
+    assert header_text == header
+    assert df.schema == {col: pl.String for col in header.split("\n")[1].split()[1:]}
+    assert df["pos1"].to_list() == [str(i) for i in range(5)]
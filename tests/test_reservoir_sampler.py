@@ -0,0 +1,31 @@
+from hich.sample import ReservoirSampler
+from hypothesis import given, strategies as st
+import numpy as np
+import polars as pl
+
+@given(st.lists(st.sampled_from(["a", "b", "c"]), max_size = 300),
+       st.integers(min_value = 1, max_value = 60),
+       st.integers(min_value = 0, max_value = 100),
+       st.integers(min_value = 0))
+def test_sample_matches_target_in_input_order(events, batch_size, size, seed):
+    sampler = ReservoirSampler(size = size, rng = np.random.default_rng(seed))
+    for start in range(0, len(events), batch_size):
+        batch = events[start:start + batch_size]
+        df = pl.DataFrame({"event": batch, "position": list(range(start, start + len(batch)))})
+        groups = [(event, [i for i, e in enumerate(batch) if e == event]) for event in set(batch)]
+        sampler.add_batch(groups, df)
+
+    target = sampler.target()
+    sampled = sampler.sample(target)
+
+    assert sampler.full.total() == len(events)
+    assert sum(target.values()) <= max(size, len(target))
+    if sampled is None:
+        assert size == 0 or not events
+        return
+    assert sampled.columns == ["event", "position"]
+    positions = sampled["position"].to_list()
+    assert positions == sorted(set(positions))
+    assert all(events[position] == event for event, position in sampled.iter_rows())
+    for event in sampler.full:
+        assert sampled["event"].to_list().count(event) == min(target[event], size)
@@ -0,0 +1,32 @@
+from hich.sample import SelectionSampler
+from hich.stats import DiscreteDistribution
+from hypothesis import given, strategies as st
+import numpy as np
+
+@given(st.lists(st.sampled_from(["a", "b", "c"]), min_size = 1, max_size = 200),
+       st.integers(min_value = 1, max_value = 50),
+       st.floats(min_value = 0, max_value = 1),
+       st.integers(min_value = 0))
+def test_sample_batch_keeps_target_counts(events, batch_size, fraction, seed):
+    full = DiscreteDistribution()
+    for event in events:
+        full[event] += 1
+    target = full.to_size(fraction)
+    sampler = SelectionSampler(full = full, target = target, rng = np.random.default_rng(seed))
+
+    kept = DiscreteDistribution()
+    for start in range(0, len(events), batch_size):
+        batch = events[start:start + batch_size]
+        groups = [(event, [i for i, e in enumerate(batch) if e == event]) for event in set(batch)]
+        keep = sampler.sample_batch(groups, len(batch))
+        for event, is_kept in zip(batch, keep):
+            kept[event] += is_kept
+
+    for event in full:
+        assert kept[event] == target[event]
+        assert sampler.viewed[event] == full[event]
+
+def test_sample_count_keeps_extra_records_while_target_remains():
+    sampler = SelectionSampler(full = DiscreteDistribution({"a": 2}), target = DiscreteDistribution({"a": 3}))
+    assert sampler.sample_count("a", 5) == 3
+    assert sampler.sample_count("a", 5) == 0
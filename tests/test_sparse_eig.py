@@ -0,0 +1,41 @@
+from cooltools.api.eigdecomp import cis_eig
+from hich.compartments.sparse_eig import sparse_cis_eig
+import numpy as np
+import pytest
+import scipy.sparse
+
+def contact_matrix(n_bins, seed, empty_bins = ()):
+    """Symmetric Poisson counts with distance decay and two alternating compartments"""
+    rng = np.random.default_rng(seed)
+    compartment = np.where((np.arange(n_bins) // 15) % 2 == 0, 1, -1)
+    distance = np.abs(np.subtract.outer(np.arange(n_bins), np.arange(n_bins)))
+    expected = 100 / (distance + 1) * (1 + 0.5 * np.outer(compartment, compartment))
+    upper = np.triu(rng.poisson(expected)).astype(np.float64)
+    A = upper + np.triu(upper, 1).T
+    A[list(empty_bins), :] = 0
+    A[:, list(empty_bins)] = 0
+    return A
+
+@pytest.mark.parametrize("n_bins, seed, empty_bins, ignore_diags",
+                         [(200, 0, (), 2),
+                          (300, 1, (0, 7, 150, 151, 299), 2),
+                          (120, 2, (3,), 3)])
+def test_sparse_cis_eig_matches_cis_eig(n_bins, seed, empty_bins, ignore_diags):
+    A = contact_matrix(n_bins, seed, empty_bins)
+    dense_vals, dense_vecs = cis_eig(A, n_eigs = 3, ignore_diags = ignore_diags)
+    sparse_vals, sparse_vecs = sparse_cis_eig(scipy.sparse.coo_matrix(A), n_eigs = 3, ignore_diags = ignore_diags)
+
+    assert np.allclose(sparse_vals, dense_vals)
+    for dense_vec, sparse_vec in zip(dense_vecs, sparse_vecs):
+        valid = np.isfinite(dense_vec)
+        assert np.array_equal(valid, np.isfinite(sparse_vec))
+        assert not valid[list(empty_bins)].any()
+        # Eigenvector signs are arbitrary
+        sign = np.sign(np.dot(dense_vec[valid], sparse_vec[valid]))
+        assert np.allclose(sparse_vec[valid] * sign, dense_vec[valid])
+
+def test_sparse_cis_eig_too_few_bins():
+    A = contact_matrix(4, 0)
+    vals, vecs = sparse_cis_eig(scipy.sparse.coo_matrix(A), n_eigs = 2)
+    assert vals.shape == (2,) and vecs.shape == (2, 4)
+    assert np.isnan(vals).all() and np.isnan(vecs).all()